@@ -0,0 +1,34 @@
+"""generation jobs: layout_image_url is empty until the job finishes
+
+Revision ID: 3f1c2a7d9b10
+Revises: 
+Create Date: 2026-10-17 17:50:53.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('generations', 'layout_image_url',
+                    existing_type=sa.String(length=255),
+                    nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Jobs that never finished have no image to keep
+    op.execute("DELETE FROM generations WHERE layout_image_url IS NULL")
+    op.alter_column('generations', 'layout_image_url',
+                    existing_type=sa.String(length=255),
+                    nullable=False)
@@ -0,0 +1,32 @@
+"""generation quality tier and seed
+
+Revision ID: 8b4e6d2c1a55
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-17 18:05:20.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e6d2c1a55'
+down_revision: Union[str, None] = '3f1c2a7d9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows were rendered at what is now the "standard" tier
+    op.add_column('generations', sa.Column('quality', sa.String(length=20), nullable=False,
+                                           server_default='standard'))
+    op.add_column('generations', sa.Column('seed', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('generations', 'seed')
+    op.drop_column('generations', 'quality')
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.schemas.generation import GenerationRequest, GenerationResponse
-from app.services.generation_service import generate_floorplan, get_all_floorplans
+import json
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import StreamingResponse
+from app.schemas.generation import GenerationRequest, GenerationResponse, GenerationJobResponse, RefineRequest
+from app.services.generation_service import (generate_floorplan, get_all_floorplans, enqueue_floorplan,
+                                             refine_floorplan, get_floorplan_job, job_manager)
+from app.services.job_service import TERMINAL_STATUSES
+from app.services.worker_pool import WorkerPoolSaturated, WorkerPoolUnavailable
 from app.db.session import get_db
 from app.api.deps import get_current_user
 import logging
@@ -8,22 +14,108 @@ import logging
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/", response_model=GenerationResponse, tags=["Generation"])
+def _backpressure(e: Exception) -> HTTPException:
+    """429 when the generation queue is full, 503 when the workers are unavailable."""
+    code = 429 if isinstance(e, WorkerPoolSaturated) else 503
+    return HTTPException(status_code=code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@router.post("/", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Generation"])
 def generate_floorplan_endpoint(
     req: GenerationRequest,
     db = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
-    Generate a floor plan from a prompt.
+    Queue a floor plan generation from a prompt.
+
+    Returns immediately with the job (status "queued"). Poll
+    `GET /generate/jobs/{id}` or follow `events_url` (server-sent events) for
+    stage-by-stage progress until the status is "success" or "failed".
+    Responds 429 with Retry-After when the generation queue is full.
+
+    `quality` picks the SD render tier; "draft" is a fast preview that can be
+    re-rendered later with `POST /generate/jobs/{id}/refine`.
     """
     try:
-        result = generate_floorplan(db, current_user.id, req.prompt)
-        return result
+        return enqueue_floorplan(db, current_user.id, req.prompt, req.quality, req.seed)
+    except (WorkerPoolSaturated, WorkerPoolUnavailable) as e:
+        raise _backpressure(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in generate endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs/{job_id}", response_model=GenerationJobResponse, tags=["Generation"])
+def get_job(
+    job_id: int,
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Get the status of a generation job.
+    """
+    job = get_floorplan_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return job
+
+@router.post("/jobs/{job_id}/refine", response_model=GenerationJobResponse,
+             status_code=status.HTTP_202_ACCEPTED, tags=["Generation"])
+def refine_job(
+    job_id: int,
+    req: RefineRequest,
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Queue a re-render of a finished generation at another quality tier (by
+    default "high"), with the same prompt and seed, so the layout is the same.
+    """
+    try:
+        job = refine_floorplan(db, current_user.id, job_id, req.quality)
+    except (WorkerPoolSaturated, WorkerPoolUnavailable) as e:
+        raise _backpressure(e)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events", tags=["Generation"])
+async def stream_job_events(
+    job_id: int,
+    request: Request,
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Server-sent events with the progress of a generation job: one "progress"
+    event per pipeline stage start/end and a final "status" event once the job
+    has succeeded or failed.
+    """
+    job = get_floorplan_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+
+    async def events():
+        if job_manager.get_state(job_id) is None:
+            # Not tracked by this process (finished long ago): report the stored status
+            yield f"event: status\ndata: {job.model_dump_json()}\n\n"
+            return
+        index = 0
+        while not await request.is_disconnected():
+            for event in job_manager.events_since(job_id, index):
+                index += 1
+                kind = "status" if "event" not in event else "progress"
+                yield f"event: {kind}\ndata: {json.dumps(event)}\n\n"
+                if kind == "status" and event["status"] in TERMINAL_STATUSES:
+                    return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/history", response_model=list[GenerationResponse], tags=["Generation"])
 def get_history(
     db = Depends(get_db),
@@ -50,8 +142,10 @@ def generate_floorplan_test(
     """
     try:
         # Using a default user ID of 1 for testing
-        result = generate_floorplan(db, 1, req.prompt)
+        result = generate_floorplan(db, 1, req.prompt, req.quality, req.seed)
         return result
+    except (WorkerPoolSaturated, WorkerPoolUnavailable) as e:
+        raise _backpressure(e)
     except Exception as e:
         logger.error(f"Error in test generate endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,7 @@
 import os
 import secrets
 from dotenv import load_dotenv
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 from pydantic import AnyHttpUrl, PostgresDsn, validator
 from pydantic_settings import BaseSettings
 
@@ -32,6 +32,33 @@ class Settings(BaseSettings):
     # Configuración de la carpeta de uploads
     UPLOAD_DIRECTORY: str = "uploads"
 
+    # Caché de layouts y renders para prompts repetidos
+    LAYOUT_CACHE_MEMORY_ENTRIES: int = 128
+    LAYOUT_CACHE_DIR: Optional[str] = "output/cache"
+    LAYOUT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # total del directorio, compartido por los workers
+    LAYOUT_CACHE_PIN_UNSEEDED: bool = False  # sin semilla, el mismo prompt devuelve siempre el mismo plano
+
+    # Trabajos de generación: procesos worker, cada uno con su propio pipeline
+    GENERATION_WORKERS: int = 1
+    GENERATION_QUEUE_SIZE: int = 8  # trabajos en espera antes de responder 429
+    GENERATION_WORKER_MAX_RSS_MB: int = 16384  # reciclar el worker por encima de esta memoria (0 = nunca)
+    GENERATION_JOB_HISTORY: int = 1000  # trabajos terminados cuyos eventos se guardan en memoria
+    GENERATION_WARM_UP: bool = True  # cargar los modelos al arrancar cada worker (False = en el primer uso)
+    GENERATION_WORKER_THREADS: int = 1  # generaciones simultáneas por worker, con los modelos compartidos
+    SD_BATCH_SIZE: int = 4  # renders SD de un mismo worker agrupados en una pasada
+    SD_BATCH_WAIT_MS: float = 50.0  # espera máxima para completar un lote
+
+    # Inferencia SD en CPU (sin GPU): "fp32", "bf16" (autocast) o "int8" (cuantización dinámica)
+    SD_CPU_PRECISION: Literal["fp32", "bf16", "int8"] = "fp32"
+    # Channels-last acelera las convoluciones pero copia los pesos de cada modelo convertido
+    # en cada worker, perdiendo la copia compartida por mmap; solo se aplica a los no mapeados
+    SD_CPU_CHANNELS_LAST: bool = False
+    SD_CPU_COMPILE: bool = False  # torch.compile: el primer render es mucho más lento
+    SD_CPU_THREADS: Optional[int] = None  # hilos por worker (por defecto, núcleos / GENERATION_WORKERS)
+
+    # Sinks de tracing por etapa: "logging", "prometheus" (expuesto en /metrics), "otel"
+    TRACING_SINKS: List[str] = ["logging", "prometheus"]
+
     # Configuración del superusuario inicial
     FIRST_SUPERUSER: Optional[str] = None
     FIRST_SUPERUSER_PASSWORD: Optional[str] = None
@@ -0,0 +1,202 @@
+import abc
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name!r} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional["_Metric"]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class _Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[MetricsRegistry] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], object]] = None
+        if registry is not None:
+            registry.register(self)
+
+    def set_function(self, function: Callable[[], object]) -> None:
+        """
+        Read the value at scrape time instead, e.g. from cache statistics. The
+        function returns a number, or for labelled metrics a dict from label
+        value (a tuple when there are several labels) to number.
+        """
+        self._function = function
+
+    def _current(self) -> List[Tuple[LabelValues, float]]:
+        if self._function is None:
+            with self._lock:
+                return sorted(self._values.items())
+        result = self._function()
+        if not self.labelnames:
+            return [((), float(result))]
+        return sorted(((key if isinstance(key, tuple) else (key,)), float(value))
+                      for key, value in result.items())
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+
+class _ScalarMetric(_Metric):
+    """One number per label set."""
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}" for key, value in self._current()]
+
+
+class Counter(_ScalarMetric):
+    """Monotonic count per label set."""
+
+    type = "counter"
+
+
+class Gauge(_ScalarMetric):
+    """Current value per label set."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set."""
+
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts, sum, count]
+        self._histograms: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._histograms.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total, count))
+                            for key, (counts, total, count) in self._histograms.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = self._format_labels(key, (("le", _number(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# Process-wide registry served on /metrics
+REGISTRY = MetricsRegistry()
+
+# HTTP traffic, recorded by the middleware in app.main
+HTTP_REQUESTS = Counter("floorplan_http_requests_total", "HTTP requests by route, method and status code.",
+                        ("route", "method", "status"), registry=REGISTRY)
+HTTP_ERRORS = Counter("floorplan_http_errors_total", "HTTP requests that failed with a 5xx status or raised.",
+                      ("route", "method"), registry=REGISTRY)
+HTTP_LATENCY = Histogram("floorplan_http_request_duration_seconds", "HTTP request latency by route.",
+                         ("route", "method"), registry=REGISTRY)
+
+# Generation work, recorded by the generation service
+GENERATIONS_IN_FLIGHT = Gauge("floorplan_generations_in_flight", "Floor plan generations currently running.",
+                              registry=REGISTRY)
+GENERATION_QUEUE_DEPTH = Gauge("floorplan_generation_queue_depth", "Generation jobs waiting for a worker.",
+                               registry=REGISTRY)
+GENERATIONS = Counter("floorplan_generations_total", "Finished floor plan generations by outcome.",
+                      ("outcome",), registry=REGISTRY)
+
+# Layout cache, read from LayoutCache.stats() at scrape time by the generation service
+LAYOUT_CACHE_LOOKUPS = Counter("floorplan_layout_cache_lookups_total", "Layout cache lookups by result.",
+                               ("result",), registry=REGISTRY)
+LAYOUT_CACHE_HIT_RATIO = Gauge("floorplan_layout_cache_hit_ratio", "Share of layout cache lookups that hit.",
+                               registry=REGISTRY)
+
+# Pipeline stages, recorded from finished tracing spans by tracing.PrometheusSink
+STAGE_DURATIONS = Histogram("floorplan_stage_duration_seconds", "Duration of pipeline stages.",
+                            ("stage",), registry=REGISTRY)
+STAGE_ERRORS = Counter("floorplan_stage_errors_total", "Pipeline stages that raised.",
+                       ("stage",), registry=REGISTRY)
+
+# Stable Diffusion model, recorded when the pipeline is created
+SD_MODEL_LOAD_SECONDS = Gauge("floorplan_sd_model_load_seconds", "Time taken to load the SD + ControlNet model.",
+                              registry=REGISTRY)
+SD_MODEL_INFO = Gauge("floorplan_sd_model_info", "Device and compute precision of the loaded SD model (value is 1).",
+                      ("device", "dtype", "enabled"), registry=REGISTRY)
@@ -0,0 +1,252 @@
+import abc
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Any, Iterator, Optional, Sequence, Tuple
+
+from .metrics import REGISTRY, STAGE_DURATIONS, STAGE_ERRORS, Counter, Histogram, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """One timed operation. Child spans are attached to their parent when they end."""
+    name: str
+    trace_id: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    parent: Optional["Span"] = field(default=None, repr=False)
+    children: List["Span"] = field(default_factory=list, repr=False)
+    start_time_ns: int = field(default_factory=time.time_ns)
+    start: float = field(default_factory=time.perf_counter)
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def end_time_ns(self) -> int:
+        return self.start_time_ns + int((self.duration_ms or 0.0) * 1e6)
+
+    def walk(self, depth: int = 0) -> Iterator[Tuple["Span", int]]:
+        """This span and its descendants, depth-first, with their depth."""
+        yield self, depth
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def timings(self) -> Dict[str, float]:
+        """
+        Milliseconds per descendant span name (repeated names are summed),
+        plus "total" for this span. Only valid once the span has ended.
+        """
+        timings: Dict[str, float] = {}
+        for span, depth in self.walk():
+            if depth > 0:
+                timings[span.name] = round(timings.get(span.name, 0.0) + span.duration_ms, 3)
+        timings["total"] = round(self.duration_ms, 3)
+        return timings
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+            "children": [child.to_dict() for child in self.children]
+        }
+
+
+class SpanSink(abc.ABC):
+    """Receives every finished top-level span together with its descendants."""
+
+    @abc.abstractmethod
+    def export(self, root: Span) -> None:
+        ...
+
+
+class LoggingSink(SpanSink):
+    """Logs each finished trace as an indented tree, one line per span."""
+
+    def __init__(self, log: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.log = log or logger
+        self.level = level
+
+    def export(self, root: Span) -> None:
+        if not self.log.isEnabledFor(self.level):
+            return
+        lines = []
+        for span, depth in root.walk():
+            parts = [f"{'  ' * depth}{span.name} {span.duration_ms:.1f} ms"]
+            parts += [f"{key}={value}" for key, value in span.attributes.items()]
+            if span.error:
+                parts.append(f"ERROR {span.error}")
+            lines.append(" ".join(parts))
+        self.log.log(self.level, "trace %s\n%s", root.trace_id, "\n".join(lines))
+
+
+class PrometheusSink(SpanSink):
+    """
+    Records span durations in a Prometheus histogram labelled by stage (the
+    span name), plus an error counter, in a `MetricsRegistry` served on /metrics.
+
+    By default it records into the process-wide stage metrics of `REGISTRY`,
+    so any number of sinks can be created (e.g. one per app); with a separate
+    `registry` it creates its own metrics there.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None, namespace: str = "floorplan",
+                 buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS):
+        if registry is None:
+            self.registry, self.durations, self.errors = REGISTRY, STAGE_DURATIONS, STAGE_ERRORS
+            return
+        self.registry = registry
+        self.durations = Histogram(f"{namespace}_stage_duration_seconds", "Duration of pipeline stages.",
+                                   ("stage",), registry=registry, buckets=buckets)
+        self.errors = Counter(f"{namespace}_stage_errors_total", "Pipeline stages that raised.",
+                              ("stage",), registry=registry)
+
+    def export(self, root: Span) -> None:
+        for span, _ in root.walk():
+            self.durations.observe(span.duration_ms / 1000, stage=span.name)
+            if span.error:
+                self.errors.inc(stage=span.name)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class OpenTelemetrySink(SpanSink):
+    """
+    Re-emits finished spans through the OpenTelemetry API, keeping their
+    original timestamps and nesting. Needs the `opentelemetry-api` package; the
+    exporter is whatever tracer provider the application configured.
+    """
+
+    def __init__(self, tracer_provider=None, instrumentation_name: str = "archiatect.pipeline"):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetrySink requires the 'opentelemetry-api' package") from e
+        self._trace = trace
+        self._tracer = trace.get_tracer(instrumentation_name, tracer_provider=tracer_provider)
+
+    def export(self, root: Span) -> None:
+        self._emit(root, None)
+
+    def _emit(self, span: Span, parent_context) -> None:
+        otel_span = self._tracer.start_span(
+            span.name,
+            context=parent_context,
+            start_time=span.start_time_ns,
+            attributes={key: _otel_value(value) for key, value in span.attributes.items()}
+        )
+        if span.error:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        context = self._trace.set_span_in_context(otel_span)
+        for child in span.children:
+            self._emit(child, context)
+        otel_span.end(end_time=span.end_time_ns)
+
+
+class Tracer:
+    """
+    Creates nested spans and hands every finished top-level span to the sinks.
+
+    The current span is kept in a context variable, so nesting follows the
+    call stack within a thread or task and concurrent requests do not mix.
+    Sink failures are logged and never reach the traced code.
+
+    `observe` additionally reports every span start and end, as it happens,
+    to a callback in the current context (e.g. progress of a background job).
+    """
+
+    def __init__(self, sinks: Optional[List[SpanSink]] = None):
+        self.sinks: List[SpanSink] = list(sinks or [])
+        self._current: ContextVar[Optional[Span]] = ContextVar(f"current_span_{id(self)}", default=None)
+        self._observer: ContextVar[Optional[Callable[[str, Span], None]]] = ContextVar(
+            f"span_observer_{id(self)}", default=None)
+
+    def add_sink(self, sink: SpanSink) -> SpanSink:
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink: SpanSink) -> None:
+        self.sinks.remove(sink)
+
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    @contextmanager
+    def observe(self, callback: Callable[[str, Span], None]) -> Iterator[None]:
+        """Call `callback("start" | "end", span)` for spans opened in this context."""
+        token = self._observer.set(callback)
+        try:
+            yield
+        finally:
+            self._observer.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        parent = self._current.get()
+        span = Span(name=name,
+                    trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+                    attributes=attributes,
+                    parent=parent)
+        token = self._current.set(span)
+        observer = self._observer.get()
+        self._notify(observer, "start", span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - span.start) * 1000
+            self._current.reset(token)
+            self._notify(observer, "end", span)
+            if parent is not None:
+                parent.children.append(span)
+            else:
+                self.export(span)
+
+    @staticmethod
+    def _notify(observer: Optional[Callable[[str, Span], None]], event: str, span: Span) -> None:
+        if observer is None:
+            return
+        try:
+            observer(event, span)
+        except Exception as e:
+            logger.warning(f"Span observer failed: {e}")
+
+    def export(self, root: Span) -> None:
+        """Hand a finished top-level span to the sinks (also used for spans from worker processes)."""
+        for sink in self.sinks:
+            try:
+                sink.export(root)
+            except Exception as e:
+                logger.warning(f"Span sink {type(sink).__name__} failed: {e}")
+
+
+def _otel_value(value: Any) -> Any:
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(v, (str, bool, int, float)) for v in value):
+        return list(value)
+    return str(value)
+
+
+SINKS = {
+    "logging": LoggingSink,
+    "prometheus": PrometheusSink,
+    "otel": OpenTelemetrySink,
+}
+
+# Process-wide tracer used by the pipeline and the services
+tracer = Tracer()
@@ -2,7 +2,8 @@ from sqlalchemy.orm import Session
 from app.models.generation import Generation
 from datetime import datetime
 
-def save_generation_to_db(db: Session, user_id: int, prompt: str, layout_url: str, sd_url: str = None) -> Generation:
+def save_generation_to_db(db: Session, user_id: int, prompt: str, layout_url: str, sd_url: str = None,
+                          quality: str = "standard", seed: int = None) -> Generation:
     """
     Guarda una nueva generación en la base de datos.
     
@@ -12,6 +13,8 @@ def save_generation_to_db(db: Session, user_id: int, prompt: str, layout_url: st
         prompt: El prompt usado para la generación
         layout_url: URL de la imagen del layout
         sd_url: URL de la imagen de Stable Diffusion (opcional)
+        quality: Nivel de calidad del render SD
+        seed: Semilla usada para el layout y el render SD
         
     Returns:
         Generation: El objeto de generación creado
@@ -22,13 +25,55 @@ def save_generation_to_db(db: Session, user_id: int, prompt: str, layout_url: st
         layout_image_url=layout_url,
         sd_image_url=sd_url,
         created_at=datetime.utcnow(),
-        status="success"
+        status="success",
+        quality=quality,
+        seed=seed
     )
     db.add(new_generation)
     db.commit()
     db.refresh(new_generation)
     return new_generation
 
+def create_generation_job(db: Session, user_id: int, prompt: str, quality: str = "standard",
+                          seed: int = None) -> Generation:
+    """
+    Crea una generación en estado "queued", sin imágenes todavía.
+    """
+    new_generation = Generation(
+        user_id=user_id,
+        prompt=prompt,
+        created_at=datetime.utcnow(),
+        status="queued",
+        quality=quality,
+        seed=seed
+    )
+    db.add(new_generation)
+    db.commit()
+    db.refresh(new_generation)
+    return new_generation
+
+def update_generation_status(db: Session, generation_id: int, status: str,
+                             error_message: str = None, layout_url: str = None,
+                             sd_url: str = None, seed: int = None) -> Generation:
+    """
+    Actualiza el estado de una generación y, si se dan, las URLs de las imágenes y la semilla.
+    """
+    generation = db.query(Generation).filter(Generation.id == generation_id).first()
+    generation.status = status
+    generation.error_message = error_message
+    if layout_url is not None:
+        generation.layout_image_url = layout_url
+    if sd_url is not None:
+        generation.sd_image_url = sd_url
+    if seed is not None:
+        generation.seed = seed
+    db.commit()
+    db.refresh(generation)
+    return generation
+
+def get_generation(db: Session, generation_id: int) -> Generation:
+    return db.query(Generation).filter(Generation.id == generation_id).first()
+
 def get_all_generations(db: Session):
     """
     Devuelve todas las generaciones ordenadas por fecha de creación.
@@ -1,13 +1,18 @@
 import os
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from app.api.v1.api import api_router
 from app.core.config import settings
+from app.core.tracing import tracer, SINKS
+from app.core import metrics
 from app.db.session import get_db
 from app.db.init_db import init_db
+from app.services.generation_service import job_manager
 
 #"La aplicación backend sigue las buenas prácticas recomendadas por FastAPI, separando la creación de la app mediante create_app(), usando lifespan para gestionar eventos de inicio/cierre y manteniendo una estructura modular escalable con routers y middlewares separados."
 @asynccontextmanager
@@ -18,9 +23,13 @@ async def lifespan(app: FastAPI):
     db = next(get_db())
     init_db(db)
     print("✅ Database initialized.")
+    # Workers load the models in the background; /health/ready reports when they are done
+    job_manager.start()
+    print(f"✅ Started {job_manager.pool.workers} generation worker process(es).")
     yield
     # Shutdown actions (if any)
     print("🛑 Shutting down...")
+    job_manager.stop(timeout=5)
 
 def create_app() -> FastAPI:
     app = FastAPI(
@@ -52,6 +61,33 @@ def create_app() -> FastAPI:
     # API routers
     app.include_router(api_router, prefix="/api/v1")
 
+    # Tracing sinks for the pipeline stages ("prometheus" feeds the stage histograms on /metrics)
+    for name in settings.TRACING_SINKS:
+        if name not in SINKS:
+            raise ValueError(f"Unknown tracing sink: {name!r} (expected one of {', '.join(SINKS)})")
+        tracer.add_sink(SINKS[name]())
+
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Route template rather than the raw path, to keep label cardinality bounded
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            metrics.HTTP_REQUESTS.inc(route=path, method=request.method, status=str(status))
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - start, route=path, method=request.method)
+            if status >= 500:
+                metrics.HTTP_ERRORS.inc(route=path, method=request.method)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
     return app
 
 app = create_app()
@@ -61,6 +97,12 @@ app = create_app()
 async def root():
     return {"status": "online", "message": f"{settings.PROJECT_NAME} API is running"}
 
+# Readiness check: 503 until a generation worker is up with its models loaded
+@app.get("/health/ready")
+async def readiness():
+    status = job_manager.pool.readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 # Uvicorn entrypoint
 if __name__ == "__main__":
     import uvicorn
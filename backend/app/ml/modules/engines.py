@@ -0,0 +1,213 @@
+import abc
+import math
+import time
+import random
+from typing import List, Optional, Tuple
+
+from .layout_state import LayoutState
+from .occupancy import SummedAreaOccupancy, BitsetOccupancy
+
+
+class PlacementEngine(abc.ABC):
+    """
+    Interface for layout placement engines.
+
+    An engine receives the array-backed state of the rooms and the grid size
+    from `LayoutGenerationModule._calculate_grid_size`, and must place rooms via
+    `state.place` and leave the placed rooms shifted to start at (0, 0).
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def place(self, module, state: LayoutState, grid_size: Tuple[int, int], rng: random.Random) -> None:
+        ...
+
+
+class GreedyEngine(PlacementEngine):
+    """The original greedy placer (`LayoutGenerationModule._place_rooms`)."""
+
+    name = "greedy"
+
+    def __init__(self, occupancy_cls: type = SummedAreaOccupancy):
+        self.occupancy_cls = occupancy_cls
+
+    def place(self, module, state: LayoutState, grid_size: Tuple[int, int], rng: random.Random) -> None:
+        module._place_rooms(state, grid_size, rng, self.occupancy_cls)
+
+
+class _SearchLimitReached(Exception):
+    pass
+
+
+class BranchAndBoundEngine(PlacementEngine):
+    """
+    Rectangle packing with adjacency rewards, solved by bounded branch-and-bound.
+
+    Rooms are placed one at a time on a tight grid (total room area plus
+    `slack`), always touching an already placed neighbor. The objective rewards
+    every weighted pair that shares a wall and penalizes bounding-box area;
+    branches whose optimistic bound (all undecided pairs satisfied, area no
+    larger than now) cannot beat the best layout are pruned. Occupancy is a
+    `BitsetOccupancy`, so a fit test is one AND per room row and backtracking
+    clears the same bits again. The search keeps only the `branch_limit` most promising
+    positions per room and stops at `node_limit` nodes or `time_limit` seconds,
+    returning the best complete layout found; a grid with no complete layout
+    is retried one cell larger. Positions of equal value are tried in an order
+    drawn from `rng`, so differently seeded attempts explore different layouts
+    within the budget. If the budget runs out before any layout is found, it
+    falls back to the greedy engine.
+    """
+
+    name = "solver"
+
+    def __init__(self,
+                 branch_limit: int = 6,
+                 node_limit: int = 20000,
+                 time_limit: float = 2.0,
+                 contact_reward: float = 15.0,
+                 area_weight: float = 1.0,
+                 slack: float = 1.15):
+        self.branch_limit = branch_limit
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.contact_reward = contact_reward
+        self.area_weight = area_weight
+        self.slack = slack
+
+    def place(self, module, state: LayoutState, grid_size: Tuple[int, int], rng: random.Random) -> None:
+        deadline = time.perf_counter() + self.time_limit
+        total_cells = int(state.grid_cells.sum())
+        side = math.ceil(math.sqrt(total_cells * self.slack))
+        width = max(side, int(state.width.max()))
+        height = max(side, int(state.height.max()))
+
+        # The result grid is cropped to the placed rooms, so the search may
+        # grow past `grid_size` by up to the largest room dimension
+        max_width = max(grid_size[0], width) + int(state.width.max())
+        max_height = max(grid_size[1], height) + int(state.height.max())
+
+        solution = None
+        while solution is None and width <= max_width and height <= max_height:
+            solution = self._solve(state, width, height, deadline, rng)
+            width, height = width + 1, height + 1
+            if time.perf_counter() >= deadline:
+                break
+
+        if solution is None:
+            GreedyEngine().place(module, state, grid_size, rng)
+            return
+
+        for room, x, y in solution:
+            state.place(room, x, y)
+        placed = state.placed
+        state.x[placed] -= state.x[placed].min()
+        state.y[placed] -= state.y[placed].min()
+
+    def _solve(self, state: LayoutState, width: int, height: int, deadline: float,
+               rng: random.Random) -> Optional[List[Tuple[int, int, int]]]:
+        """Search one grid size; returns [(room, x, y), ...] in placement order or None."""
+        n = len(state)
+        room_w = state.width.tolist()
+        room_h = state.height.tolist()
+        weights = state.weights.tolist()
+        neighbors = [[j for j in range(n) if weights[i][j] > 0] for i in range(n)]
+        total_weight = float(state.weights.sum()) / 2
+
+        occupancy = BitsetOccupancy(width, height)
+
+        importance = {"living room": 100, "kitchen": 90, "hallway": 88, "master bedroom": 85,
+                      "bedroom": 80, "dining room": 75, "bathroom": 50}
+        priority = [importance.get(state.types[i], 0) + room_w[i] * room_h[i] for i in range(n)]
+
+        xs: List[Optional[int]] = [None] * n
+        ys: List[Optional[int]] = [None] * n
+        order: List[int] = []
+        best = {"score": -math.inf, "solution": None}
+        nodes = [0]
+
+        def touching(r: int, x: int, y: int, p: int) -> bool:
+            px, py, pw, ph = xs[p], ys[p], room_w[p], room_h[p]
+            w, h = room_w[r], room_h[r]
+            if y < py + ph and y + h > py and (x + w == px or px + pw == x):
+                return True
+            return x < px + pw and x + w > px and (y + h == py or py + ph == y)
+
+        def candidates(r: int, anchors: List[int]) -> List[Tuple[int, int]]:
+            """Positions where `r` is flush against a side and corner of an anchor room."""
+            w, h = room_w[r], room_h[r]
+            positions = set()
+            for p in anchors:
+                px, py, pw, ph = xs[p], ys[p], room_w[p], room_h[p]
+                for y in (py, py + ph - h):
+                    positions.add((px - w, y))
+                    positions.add((px + pw, y))
+                for x in (px, px + pw - w):
+                    positions.add((x, py - h))
+                    positions.add((x, py + ph))
+            return [(x, y) for x, y in positions if 0 <= x <= width - w and 0 <= y <= height - h]
+
+        def search(contact: float, undecided: float, bbox: Tuple[int, int, int, int]) -> None:
+            nodes[0] += 1
+            if nodes[0] > self.node_limit or time.perf_counter() > deadline:
+                raise _SearchLimitReached()
+
+            x0, y0, x1, y1 = bbox
+            area = (x1 - x0) * (y1 - y0)
+            if len(order) == n:
+                score = contact * self.contact_reward - self.area_weight * area
+                if score > best["score"]:
+                    best["score"] = score
+                    best["solution"] = [(room, xs[room], ys[room]) for room in order]
+                return
+
+            # Optimistic bound: every undecided pair ends up sharing a wall
+            bound = (contact + undecided) * self.contact_reward - self.area_weight * area
+            if bound <= best["score"]:
+                return
+
+            # Next room: the one most strongly tied to the placed rooms
+            unplaced = [i for i in range(n) if xs[i] is None]
+            r = max(unplaced, key=lambda i: (sum(weights[i][p] for p in order), priority[i], -i))
+            w, h = room_w[r], room_h[r]
+            decided = sum(weights[r][p] for p in order)
+
+            # Try slots next to placed neighbors first, then next to any placed room
+            placed_neighbors = [p for p in neighbors[r] if xs[p] is not None]
+            options = []
+            for anchors in (placed_neighbors, order):
+                for x, y in candidates(r, anchors):
+                    if not occupancy.is_free(x, y, w, h):
+                        continue
+                    gain = sum(weights[r][p] for p in placed_neighbors if touching(r, x, y, p))
+                    new_bbox = (min(x0, x), min(y0, y), max(x1, x + w), max(y1, y + h))
+                    new_area = (new_bbox[2] - new_bbox[0]) * (new_bbox[3] - new_bbox[1])
+                    value = gain * self.contact_reward - self.area_weight * (new_area - area)
+                    options.append((value, rng.random(), x, y, gain, new_bbox))
+                if options:
+                    break
+
+            options.sort(reverse=True)
+            for _, _, x, y, gain, new_bbox in options[:self.branch_limit]:
+                xs[r], ys[r] = x, y
+                order.append(r)
+                occupancy.place(x, y, w, h)
+                search(contact + gain, undecided - decided, new_bbox)
+                occupancy.remove(x, y, w, h)
+                order.pop()
+                xs[r], ys[r] = None, None
+
+        # First room: highest priority, in the middle of the grid
+        first = max(range(n), key=lambda i: (priority[i], -i))
+        fx = (width - room_w[first]) // 2
+        fy = (height - room_h[first]) // 2
+        xs[first], ys[first] = fx, fy
+        order.append(first)
+        occupancy.place(fx, fy, room_w[first], room_h[first])
+
+        try:
+            search(0.0, total_weight, (fx, fy, fx + room_w[first], fy + room_h[first]))
+        except _SearchLimitReached:
+            pass
+
+        return best["solution"]
@@ -0,0 +1,267 @@
+import random
+import numpy as np
+import networkx as nx
+from typing import Dict, List, Any, Optional, Tuple
+from concurrent.futures.process import BrokenProcessPool
+from networkx.algorithms.community import louvain_communities
+
+from .layout_state import LayoutState
+from .process_pool import shared_pool, discard_pool
+
+# Vertical circulation core shared by every floor: stairs above an elevator
+CORE_ROOMS = (
+    {"type": "stairs", "width": 2, "height": 3},
+    {"type": "elevator", "width": 2, "height": 2},
+)
+
+
+class HierarchicalLayoutPlanner:
+    """
+    Layouts for large buildings (tens to hundreds of rooms), optionally on several floors.
+
+    The adjacency graph is clustered into zones of at most `max_zone_rooms`
+    rooms with Louvain community detection (oversized communities are split
+    again). Zones are spread over the floors by area. Each zone is laid out on
+    its own with the selected placement engine, in parallel. Then each zone is
+    placed as a single block, around the stair/elevator core when there are
+    several floors. The core sits at the same position on every floor. The
+    placer's O(n^2) work is bounded by the zone size, so total work grows
+    roughly linearly with the number of rooms.
+    """
+
+    def __init__(self, max_zone_rooms: int = 12, core_weight: int = 5):
+        self.max_zone_rooms = max_zone_rooms
+        # Edge weight from the core to every block/room, so zones gather around it
+        self.core_weight = core_weight
+
+    def generate(self, module, requirements: Dict[str, Any], rng: random.Random,
+                 num_floors: int = 1, engine: str = "greedy",
+                 max_workers: Optional[int] = None) -> Dict[str, Any]:
+        rooms_data = module._preprocess_rooms(requirements["rooms"])
+        graph = module._create_adjacency_graph(rooms_data, requirements.get("adjacency", []), rng)
+        num_floors = max(1, min(num_floors, len(rooms_data)))
+
+        zones = self._cluster(graph, rng)
+        floor_of_zone = self._assign_floors(zones, rooms_data, num_floors)
+        zone_states = self._layout_zones(module, rooms_data, graph, zones, rng, engine, max_workers)
+
+        # Block placement per floor, with the core at (0, 0) when there is one
+        with_core = num_floors > 1
+        offsets: Dict[int, Tuple[int, int]] = {}
+        for floor in range(num_floors):
+            floor_zones = [z for z in range(len(zones)) if floor_of_zone[z] == floor]
+            offsets.update(self._place_blocks(module, graph, zones, zone_states, floor_zones, with_core))
+
+        # Shift every floor by the same amount so the core lines up vertically
+        min_x = min([ox for ox, _ in offsets.values()] + [0])
+        min_y = min([oy for _, oy in offsets.values()] + [0])
+        offsets = {z: (ox - min_x, oy - min_y) for z, (ox, oy) in offsets.items()}
+        core_x, core_y = -min_x, -min_y
+
+        # Common footprint for all floors
+        extents = [(ox + self._block_size(zone_states[z])[0], oy + self._block_size(zone_states[z])[1])
+                   for z, (ox, oy) in offsets.items()]
+        if with_core:
+            extents.append((core_x + max(r["width"] for r in CORE_ROOMS),
+                            core_y + sum(r["height"] for r in CORE_ROOMS)))
+        footprint = (max(x for x, _ in extents), max(y for _, y in extents))
+
+        floors = []
+        for floor in range(num_floors):
+            floor_zones = [z for z in range(len(zones)) if floor_of_zone[z] == floor]
+            layout = self._compose_floor(module, rooms_data, graph, zones, zone_states, offsets,
+                                         floor_zones, (core_x, core_y) if with_core else None, footprint)
+            layout["floor"] = floor
+            floors.append(layout)
+
+        anchors = []
+        if with_core:
+            y = core_y
+            for core_room in CORE_ROOMS:
+                anchors.append({"type": core_room["type"], "x": core_x, "y": y,
+                                "width": core_room["width"], "height": core_room["height"]})
+                y += core_room["height"]
+
+        return {
+            "floors": floors,
+            "zones": [
+                {
+                    "id": z,
+                    "floor": floor_of_zone[z],
+                    "rooms": zones[z],
+                    "x": offsets[z][0],
+                    "y": offsets[z][1],
+                    "width": self._block_size(zone_states[z])[0],
+                    "height": self._block_size(zone_states[z])[1]
+                } for z in range(len(zones))
+            ],
+            "anchors": anchors,
+            "grid_size": footprint,
+            "cell_size": module.grid_cell_size,
+            "num_rooms": len(rooms_data),
+            "unplaced_rooms": sum(int((~state.placed).sum()) for state in zone_states)
+        }
+
+    def _cluster(self, graph: nx.Graph, rng: random.Random) -> List[List[int]]:
+        """Split the room graph into zones of at most `max_zone_rooms` rooms."""
+        zones = []
+        pending = [set(graph.nodes)]
+        while pending:
+            nodes = pending.pop()
+            if len(nodes) <= self.max_zone_rooms:
+                zones.append(sorted(nodes))
+                continue
+            # Copying the subgraph view avoids its per-access node filtering inside Louvain
+            communities = louvain_communities(graph.subgraph(nodes).copy(), weight="weight",
+                                              seed=rng.getrandbits(32))
+            if len(communities) > 1:
+                pending.extend(communities)
+            else:
+                # Louvain found no split: cut the breadth-first order into chunks
+                order = list(nx.bfs_tree(graph.subgraph(nodes), min(nodes)))
+                order += sorted(nodes - set(order))
+                for i in range(0, len(order), self.max_zone_rooms):
+                    zones.append(sorted(order[i:i + self.max_zone_rooms]))
+        return sorted(zones)
+
+    @staticmethod
+    def _assign_floors(zones: List[List[int]], rooms_data: List[Dict[str, Any]], num_floors: int) -> List[int]:
+        """Spread zones over floors, largest first onto the floor with the least area."""
+        area = [sum(rooms_data[room]["grid_cells"] for room in zone) for zone in zones]
+        floor_area = [0] * num_floors
+        floor_of_zone = [0] * len(zones)
+        for z in sorted(range(len(zones)), key=lambda z: (-area[z], z)):
+            floor = min(range(num_floors), key=lambda f: (floor_area[f], f))
+            floor_of_zone[z] = floor
+            floor_area[floor] += area[z]
+        return floor_of_zone
+
+    @staticmethod
+    def _layout_zones(module, rooms_data: List[Dict[str, Any]], graph: nx.Graph, zones: List[List[int]],
+                      rng: random.Random, engine: str, max_workers: Optional[int]) -> List[LayoutState]:
+        """Lay out the rooms inside every zone, in the shared process pool."""
+        jobs = []
+        for zone in zones:
+            local = {room: i for i, room in enumerate(zone)}
+            zone_rooms = [dict(rooms_data[room], id=local[room]) for room in zone]
+            zone_graph = nx.relabel_nodes(graph.subgraph(zone), local)
+            state = LayoutState(zone_rooms, zone_graph)
+            grid_size = module._calculate_grid_size(int(state.grid_cells.sum()))
+            jobs.append((state, grid_size, rng.getrandbits(32)))
+
+        if max_workers == 1 or len(jobs) == 1:
+            return [_place_zone(module, state, grid_size, seed, engine) for state, grid_size, seed in jobs]
+
+        executor = shared_pool(max_workers)
+        try:
+            futures = [executor.submit(_place_zone, module, state, grid_size, seed, engine)
+                       for state, grid_size, seed in jobs]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            discard_pool(max_workers, executor)
+            raise
+
+    @staticmethod
+    def _block_size(state: LayoutState) -> Tuple[int, int]:
+        placed = state.placed
+        if not placed.any():
+            return 0, 0
+        return (int((state.x[placed] + state.width[placed]).max()),
+                int((state.y[placed] + state.height[placed]).max()))
+
+    def _place_blocks(self, module, graph: nx.Graph, zones: List[List[int]], zone_states: List[LayoutState],
+                      floor_zones: List[int], with_core: bool) -> Dict[int, Tuple[int, int]]:
+        """Offsets of the zones on one floor, placed as blocks like rooms; the core is at (0, 0)."""
+        # Largest zone first, so it anchors the floor when there is no core
+        floor_zones = sorted((z for z in floor_zones if zone_states[z].placed.any()),
+                             key=lambda z: (-int(zone_states[z].grid_cells.sum()), z))
+        if not floor_zones:
+            return {}
+
+        blocks = []
+        if with_core:
+            blocks.append({"id": 0, "name": "core", "type": "core",
+                           "width": max(r["width"] for r in CORE_ROOMS),
+                           "height": sum(r["height"] for r in CORE_ROOMS)})
+        first_zone = len(blocks)
+        for z in floor_zones:
+            width, height = self._block_size(zone_states[z])
+            blocks.append({"id": len(blocks), "name": f"zone {z}", "type": "zone",
+                           "width": width, "height": height})
+
+        # Block edges: summed room weights between zones, plus the core to every zone
+        zone_block = {z: first_zone + i for i, z in enumerate(floor_zones)}
+        room_block = {room: zone_block[z] for z in floor_zones for room in zones[z]}
+        block_graph = nx.Graph()
+        block_graph.add_nodes_from(range(len(blocks)))
+        for u, v, weight in graph.edges(data="weight"):
+            a, b = room_block.get(u), room_block.get(v)
+            if a is not None and b is not None and a != b:
+                previous = block_graph.get_edge_data(a, b, {"weight": 0})["weight"]
+                block_graph.add_edge(a, b, weight=previous + weight)
+        if with_core:
+            for block in range(first_zone, len(blocks)):
+                block_graph.add_edge(0, block, weight=self.core_weight)
+
+        state = LayoutState(blocks, block_graph)
+        state.place(0, 0, 0)
+        while not state.placed.all():
+            # Next block: most strongly tied to the placed ones, larger first on ties
+            unplaced = np.nonzero(~state.placed)[0]
+            ties = state.weights[np.ix_(unplaced, np.nonzero(state.placed)[0])].sum(axis=1)
+            order = np.lexsort((unplaced, -state.grid_cells[unplaced], -ties))
+            module._place_single_room(state, int(unplaced[order[0]]))
+
+        return {z: (int(state.x[zone_block[z]]), int(state.y[zone_block[z]])) for z in floor_zones}
+
+    def _compose_floor(self, module, rooms_data: List[Dict[str, Any]], graph: nx.Graph,
+                       zones: List[List[int]], zone_states: List[LayoutState],
+                       offsets: Dict[int, Tuple[int, int]], floor_zones: List[int],
+                       core: Optional[Tuple[int, int]], footprint: Tuple[int, int]) -> Dict[str, Any]:
+        """Single-floor layout result with every zone's rooms at their block offsets."""
+        floor_rooms: List[Dict[str, Any]] = []
+        positions: List[Optional[Tuple[int, int, int, int]]] = []
+        local: Dict[int, int] = {}
+        for z in floor_zones:
+            state = zone_states[z]
+            ox, oy = offsets.get(z, (0, 0))
+            for i, room in enumerate(zones[z]):
+                local[room] = len(floor_rooms)
+                floor_rooms.append(dict(rooms_data[room], id=len(floor_rooms), global_id=room))
+                if state.placed[i]:
+                    positions.append((ox + int(state.x[i]), oy + int(state.y[i]),
+                                      int(state.width[i]), int(state.height[i])))
+                else:
+                    positions.append(None)
+
+        floor_graph = nx.relabel_nodes(graph.subgraph(list(local)), local)
+        if core is not None:
+            y = core[1]
+            for core_room in CORE_ROOMS:
+                room_id = len(floor_rooms)
+                floor_rooms.append({"id": room_id, "name": core_room["type"], "type": core_room["type"],
+                                    "width": core_room["width"], "height": core_room["height"],
+                                    "grid_cells": core_room["width"] * core_room["height"]})
+                positions.append((core[0], y, core_room["width"], core_room["height"]))
+                y += core_room["height"]
+                floor_graph.add_node(room_id)
+                for other in range(room_id):
+                    floor_graph.add_edge(other, room_id, weight=self.core_weight)
+
+        state = LayoutState(floor_rooms, floor_graph)
+        grid = np.zeros((footprint[1], footprint[0]), dtype=int)
+        for room, position in enumerate(positions):
+            if position is None:
+                continue
+            x, y, w, h = position
+            state.width[room], state.height[room] = w, h
+            state.place(room, x, y)
+            grid[y:y+h, x:x+w] = room + 1
+
+        return module._build_layout_result(state, floor_rooms, grid)
+
+
+def _place_zone(module, state: LayoutState, grid_size: Tuple[int, int], seed: int, engine: str) -> LayoutState:
+    """Lay out one zone (process pool entry point)."""
+    module._get_engine(engine).place(module, state, grid_size, random.Random(seed))
+    return state
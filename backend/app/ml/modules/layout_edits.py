@@ -0,0 +1,285 @@
+import random
+import numpy as np
+import networkx as nx
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+from .layout_state import LayoutState, extract_doors
+
+EDIT_OPERATIONS = ("move", "resize", "add", "remove")
+
+Rect = Tuple[int, int, int, int]
+
+
+class LayoutEditor:
+    """
+    Applies one edit operation to an existing layout result.
+
+    Supported operations (`edit["op"]`):
+        move:   {"room", "x", "y"}, the target must not overlap another room
+        resize: {"room", "width", "height"} in cells, or {"room", "approximate_sqft"}
+        add:    {"type", "approximate_sqft"?, "name"?, "adjacent_to"?}
+        remove: {"room"}
+    Rooms are referenced by ID, name or (when unique) type.
+
+    Only the edited room is (re)placed; every other room keeps its position. A
+    resized room stays put if it still fits and otherwise moves to the best
+    free spot near where it was. The doorless grid is patched in place when its
+    shape does not change, and the door pass is rerun on it so the doors match
+    what a full build would give. The new layout carries an "edit" report with
+    the changed rooms, the dirty grid region and which artifacts changed, so
+    callers can skip re-rendering and re-uploading the others. Rooms in the
+    report are IDs: "changed_rooms" in the new layout's numbering (removing a
+    room renumbers the ones after it), "removed_rooms" in the original one.
+    """
+
+    def apply(self, module, layout_result: Dict[str, Any], edit: Dict[str, Any],
+              rng: random.Random) -> Dict[str, Any]:
+        op = edit.get("op")
+        if op not in EDIT_OPERATIONS:
+            raise ValueError(f"Unknown edit operation: {op!r} (expected one of {', '.join(EDIT_OPERATIONS)})")
+
+        rooms = [dict(room) for room in layout_result["rooms"]]
+        old_rects: Dict[int, Rect] = {room_id: (pos["x"], pos["y"], pos["width"], pos["height"])
+                                      for room_id, pos in layout_result["room_positions"].items()}
+        rects = dict(old_rects)
+        order = list(layout_result["room_positions"])
+        edges = self._layout_edges(module, layout_result, rooms, rng)
+
+        # New room index -> room ID in the original layout (None for added rooms)
+        origin: List[Optional[int]] = list(range(len(rooms)))
+        removed: List[int] = []
+        to_place: List[int] = []
+
+        if op == "move":
+            room = self._resolve(rooms, edit["room"])
+            _, _, w, h = rects.get(room, (0, 0, rooms[room]["width"], rooms[room]["height"]))
+            target = (int(edit["x"]), int(edit["y"]), w, h)
+            blocking = self._overlapping(rects, room, target)
+            if blocking is not None:
+                raise ValueError(f"Cannot move {rooms[room]['name']!r}: it would overlap "
+                                 f"{rooms[blocking]['name']!r}")
+            rects[room] = target
+            if room not in order:
+                order.append(room)
+
+        elif op == "resize":
+            room = self._resolve(rooms, edit["room"])
+            w, h = self._edit_size(module, rooms[room], edit)
+            rooms[room].update(width=w, height=h, grid_cells=w * h)
+            if room in rects:
+                x, y, _, _ = rects[room]
+                rects[room] = (x, y, w, h)
+            if room not in rects or self._overlapping(rects, room, rects[room]) is not None:
+                to_place.append(room)
+            if room not in order:
+                order.append(room)
+
+        elif op == "add":
+            room = len(rooms)
+            rooms.append(self._new_room(module, rooms, edit))
+            origin.append(None)
+            edges = self._edges_with_new_room(module, rooms, edges, edit, rng)
+            order.append(room)
+            to_place.append(room)
+
+        else:  # remove
+            room = self._resolve(rooms, edit["room"])
+            if len(rooms) == 1:
+                raise ValueError("Cannot remove the only room of a layout")
+            removed.append(room)
+            keep = [i for i in range(len(rooms)) if i != room]
+            remap = {old: new for new, old in enumerate(keep)}
+            rooms = [dict(rooms[i], id=remap[i]) for i in keep]
+            rects = {remap[i]: rect for i, rect in rects.items() if i != room}
+            order = [remap[i] for i in order if i != room]
+            edges = [[remap[u], remap[v], w] for u, v, w in edges if room not in (u, v)]
+            origin = keep
+
+        state = self._build_state(rooms, edges, rects, order, to_place)
+        for room in to_place:
+            near = rects.get(room)
+            module._place_single_room(state, room, near[:2] if near else None)
+        state.placement_order = [room for room in order if state.placed[room]]
+
+        # Keep the layout starting at (0, 0)
+        placed = state.placed
+        shift = (int(state.x[placed].min()), int(state.y[placed].min()))
+        state.x[placed] -= shift[0]
+        state.y[placed] -= shift[1]
+
+        old_grid = np.asarray(layout_result["grid"])
+        new_shape = (int((state.y[placed] + state.height[placed]).max()),
+                     int((state.x[placed] + state.width[placed]).max()))
+        grid_resized = new_shape != old_grid.shape or shift != (0, 0)
+
+        # Patch the doorless grid when room IDs and the grid frame are unchanged
+        new_rects = {i: self._state_rect(state, i) for i in state.placement_order}
+        changed = [i for i in range(len(rooms))
+                   if origin[i] is None or new_rects.get(i) != old_rects.get(origin[i])]
+        grid = None
+        if not grid_resized and not removed:
+            grid = self._patch_grid(layout_result, old_rects, new_rects, changed)
+
+        new_layout = module._build_layout_result(state, rooms, grid)
+        new_layout["seed"] = layout_result.get("seed")
+
+        # Dirty region: old and new footprints of changed rooms plus doors that moved
+        old_doors = layout_result.get("doors")
+        if old_doors is None:
+            old_doors = extract_doors(old_grid)
+        old_door_cells = {(d["x"], d["y"], d["orientation"]) for d in old_doors}
+        new_door_cells = {(d["x"], d["y"], d["orientation"]) for d in new_layout["doors"]}
+        door_changes = old_door_cells ^ new_door_cells
+
+        dirty = [old_rects[origin[i]] for i in changed if origin[i] in old_rects]
+        dirty += [new_rects[i] for i in changed if i in new_rects]
+        dirty += [old_rects[i] for i in removed if i in old_rects]
+        dirty += [(x, y, 1, 1) for x, y, _ in door_changes]
+
+        geometry_changed = bool(changed or removed)
+        region = None
+        if grid_resized:
+            region = [0, 0, new_shape[1], new_shape[0]]
+        elif dirty:
+            region = [max(0, min(x for x, _, _, _ in dirty) - 1),
+                      max(0, min(y for _, y, _, _ in dirty) - 1),
+                      min(new_shape[1], max(x + w for x, _, w, _ in dirty) + 1),
+                      min(new_shape[0], max(y + h for _, y, _, h in dirty) + 1)]
+
+        new_layout["edit"] = {
+            "op": op,
+            "changed_rooms": changed,
+            "removed_rooms": sorted(removed),
+            "dirty_region": region,
+            "grid_resized": grid_resized,
+            "artifacts": {
+                "layout": geometry_changed or bool(door_changes),
+                "controlnet_input": geometry_changed,
+                "labeled_layout": geometry_changed or bool(door_changes)
+            }
+        }
+        return new_layout
+
+    @staticmethod
+    def _resolve(rooms: List[Dict[str, Any]], ref: Union[int, str]) -> int:
+        """Room index for an ID, a name or a room type that occurs once."""
+        if isinstance(ref, int):
+            if 0 <= ref < len(rooms):
+                return ref
+            raise ValueError(f"No room with ID {ref}")
+        key = str(ref).strip().lower()
+        for room in rooms:
+            if room["name"].lower() == key:
+                return room["id"]
+        matches = [room["id"] for room in rooms if room["type"] == key]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise ValueError(f"{ref!r} is ambiguous; use one of: "
+                             f"{', '.join(rooms[i]['name'] for i in matches)}")
+        raise ValueError(f"No room named {ref!r}")
+
+    @staticmethod
+    def _overlapping(rects: Dict[int, Rect], room: int, rect: Rect) -> Optional[int]:
+        """First other room overlapping `rect`, or None."""
+        x, y, w, h = rect
+        for other, (ox, oy, ow, oh) in rects.items():
+            if other != room and x < ox + ow and x + w > ox and y < oy + oh and y + h > oy:
+                return other
+        return None
+
+    @staticmethod
+    def _edit_size(module, room: Dict[str, Any], edit: Dict[str, Any]) -> Tuple[int, int]:
+        if "width" in edit and "height" in edit:
+            return max(1, int(edit["width"])), max(1, int(edit["height"]))
+        if "approximate_sqft" in edit:
+            sized = module._preprocess_rooms([{"type": room["type"], "count": 1,
+                                               "approximate_sqft": edit["approximate_sqft"]}])[0]
+            return sized["width"], sized["height"]
+        raise ValueError("resize needs 'width' and 'height' or 'approximate_sqft'")
+
+    @staticmethod
+    def _new_room(module, rooms: List[Dict[str, Any]], edit: Dict[str, Any]) -> Dict[str, Any]:
+        room_type = edit["type"].strip().lower()
+        sqft = edit.get("approximate_sqft")
+        if sqft is None:
+            default_w, default_h = module.default_room_dimensions.get(room_type, (3, 3))
+            sqft = default_w * default_h * module.grid_cell_size
+        room = module._preprocess_rooms([{"type": room_type, "count": 1, "approximate_sqft": sqft}])[0]
+
+        same_type = sum(r["type"] == room_type for r in rooms)
+        room["id"] = len(rooms)
+        room["name"] = edit.get("name") or (f"{room_type} {same_type + 1}" if same_type else room_type)
+        return room
+
+    @staticmethod
+    def _layout_edges(module, layout_result: Dict[str, Any], rooms: List[Dict[str, Any]],
+                      rng: random.Random) -> List[List[int]]:
+        """Adjacency edges stored with the layout, or rebuilt from room types for older layouts."""
+        if layout_result.get("adjacency") is not None:
+            return [list(edge) for edge in layout_result["adjacency"]]
+        graph = module._create_adjacency_graph(rooms, [], rng)
+        return [[u, v, weight] for u, v, weight in graph.edges(data="weight")]
+
+    def _edges_with_new_room(self, module, rooms: List[Dict[str, Any]], edges: List[List[int]],
+                             edit: Dict[str, Any], rng: random.Random) -> List[List[int]]:
+        """Existing edges plus the new (last) room's edges from the usual adjacency rules."""
+        new = len(rooms) - 1
+        explicit = [self._resolve(rooms[:-1], ref) for ref in edit.get("adjacent_to", [])]
+
+        graph = module._create_adjacency_graph(rooms, [], rng)
+        new_edges = {v if u == new else u: weight
+                     for u, v, weight in graph.edges(new, data="weight")}
+        for other in explicit:
+            new_edges[other] = max(new_edges.get(other, 0), 10)
+        return edges + [[other, new, weight] for other, weight in new_edges.items()]
+
+    @staticmethod
+    def _build_state(rooms: List[Dict[str, Any]], edges: List[List[int]], rects: Dict[int, Rect],
+                     order: List[int], to_place: List[int]) -> LayoutState:
+        graph = nx.Graph()
+        graph.add_nodes_from(range(len(rooms)))
+        graph.add_weighted_edges_from(edges)
+        state = LayoutState(rooms, graph)
+        # Keep the stored edge order, which decides door tie-breaks
+        state.edges = np.array(edges, dtype=np.int64).reshape(-1, 3)
+
+        for room in order:
+            if room in to_place or room not in rects:
+                continue
+            x, y, w, h = rects[room]
+            state.width[room], state.height[room] = w, h
+            state.place(room, x, y)
+        state.grid_cells = state.width * state.height
+        return state
+
+    @staticmethod
+    def _state_rect(state: LayoutState, room: int) -> Rect:
+        return int(state.x[room]), int(state.y[room]), int(state.width[room]), int(state.height[room])
+
+    @staticmethod
+    def _patch_grid(layout_result: Dict[str, Any], old_rects: Dict[int, Rect],
+                    new_rects: Dict[int, Rect], changed: List[int]) -> np.ndarray:
+        """Doorless copy of the old grid with only the changed rooms redrawn."""
+        grid = np.array(layout_result["grid"])
+
+        # Door cells go back to the room they were cut from
+        doors = layout_result.get("doors")
+        if doors is None:
+            doors = extract_doors(grid)
+        for door in doors:
+            x, y = door["x"], door["y"]
+            for room in door["rooms"]:
+                rx, ry, rw, rh = old_rects[room]
+                if rx <= x < rx + rw and ry <= y < ry + rh:
+                    grid[y, x] = room + 1
+
+        for room in changed:
+            if room in old_rects:
+                x, y, w, h = old_rects[room]
+                grid[y:y+h, x:x+w] = 0
+        for room in changed:
+            if room in new_rects:
+                x, y, w, h = new_rects[room]
+                grid[y:y+h, x:x+w] = room + 1
+        return grid
@@ -0,0 +1,76 @@
+import io
+import json
+import base64
+import numpy as np
+from typing import Dict, Any, IO, Union
+
+# Version 1 is the original format with the grid as nested lists
+LAYOUT_FORMAT_VERSION = 2
+
+
+def encode_grid(grid: np.ndarray) -> Dict[str, Any]:
+    """
+    Pack a layout grid as base64 little-endian integers.
+
+    Uses int8 when every value fits (layouts with fewer than 127 rooms),
+    int16 otherwise.
+    """
+    grid = np.asarray(grid)
+    fits_int8 = grid.size == 0 or (grid.min() >= -128 and grid.max() <= 127)
+    dtype = np.dtype("<i1") if fits_int8 else np.dtype("<i2")
+    return {
+        "shape": list(grid.shape),
+        "dtype": "int8" if fits_int8 else "int16",
+        "encoding": "base64",
+        "data": base64.b64encode(np.ascontiguousarray(grid, dtype=dtype).tobytes()).decode("ascii")
+    }
+
+
+def decode_grid(encoded: Dict[str, Any]) -> np.ndarray:
+    """Inverse of `encode_grid`; returns an int64 array."""
+    dtype = {"int8": "<i1", "int16": "<i2"}[encoded["dtype"]]
+    data = np.frombuffer(base64.b64decode(encoded["data"]), dtype=dtype)
+    return data.reshape(encoded["shape"]).astype(np.int64)
+
+
+def write_layout_json(layout_result: Dict[str, Any], fp: IO[str]) -> None:
+    """Stream a layout result to `fp` in the compact, versioned layout format."""
+    serializable_result = {
+        "version": LAYOUT_FORMAT_VERSION,
+        "grid": encode_grid(layout_result["grid"]),
+        "room_positions": layout_result["room_positions"],
+        "doors": layout_result.get("doors"),
+        "grid_size": layout_result["grid_size"],
+        "cell_size": layout_result["cell_size"],
+        "rooms": layout_result["rooms"],
+        "adjacency": layout_result.get("adjacency"),
+        "seed": layout_result.get("seed")
+    }
+    json.dump(serializable_result, fp, separators=(",", ":"))
+
+
+def read_layout_json(source: Union[str, IO[str]]) -> Dict[str, Any]:
+    """
+    Load a layout written by `write_layout_json` (or a version 1 layout).
+
+    Restores the grid as a NumPy array, room IDs as ints and grid_size as a tuple.
+    """
+    data = json.load(source) if hasattr(source, "read") else json.loads(source)
+
+    version = data.pop("version", 1)
+    if version > LAYOUT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported layout format version: {version}")
+
+    if version == 1:
+        data["grid"] = np.array(data["grid"], dtype=np.int64)
+    else:
+        data["grid"] = decode_grid(data["grid"])
+    data["room_positions"] = {int(k): v for k, v in data["room_positions"].items()}
+    data["grid_size"] = tuple(data["grid_size"])
+    return data
+
+
+def dumps_layout_json(layout_result: Dict[str, Any]) -> str:
+    buffer = io.StringIO()
+    write_layout_json(layout_result, buffer)
+    return buffer.getvalue()
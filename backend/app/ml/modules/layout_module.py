@@ -1,10 +1,26 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from typing import Dict, List, Tuple, Any, Optional
+from PIL import Image
+from typing import Dict, List, Tuple, Any, Optional, IO, Union
+import io
 import random
+from xml.sax.saxutils import escape
 import networkx as nx
 import math
 import time
+import copy
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+
+from .occupancy import SummedAreaOccupancy, BitsetOccupancy
+from .layout_state import LayoutState, extract_doors
+from .shared_walls import SharedWallIndex
+from .refinement import LayoutRefiner
+from .layout_edits import LayoutEditor
+from .hierarchical import HierarchicalLayoutPlanner
+from .engines import PlacementEngine, GreedyEngine, BranchAndBoundEngine
+from .rasterizer import LayoutRasterizer
+from .layout_io import dumps_layout_json, write_layout_json, read_layout_json
+from .process_pool import shared_pool, discard_pool
 
 class LayoutGenerationModule:
     def __init__(self):
@@ -28,6 +44,8 @@ class LayoutGenerationModule:
             "garage": "#DADADA",         # Light gray
             "laundry room": "#D4F0F0",   # Light cyan
             "entryway": "#FFE4B5",      # Light goldenrod
+            "stairs": "#E6E0F8",         # Light lavender
+            "elevator": "#E6E0F8",       # Light lavender
         }
         
         # Default room dimensions (in grid cells)
@@ -42,75 +60,345 @@ class LayoutGenerationModule:
             "laundry room": (2, 2),    # 4 cells * 20 sq ft = 80 sq ft
             "entryway": (3, 3),      # 9 cells * 20 sq ft = 180 sq ft
         }
+        
+        # Renders layouts to in-memory images
+        self.rasterizer = LayoutRasterizer()
+        
+        # Optional local-search stage after greedy placement
+        self.refiner = LayoutRefiner()
+        
+        # Incremental edits of existing layouts
+        self.editor = LayoutEditor()
+        
+        # Zoned layouts for large and multi-floor buildings
+        self.hierarchical = HierarchicalLayoutPlanner()
+        
+        # Placement engines selectable per call by name
+        self.engines: Dict[str, PlacementEngine] = {}
+        self.register_engine(GreedyEngine())
+        self.register_engine(BranchAndBoundEngine())
     
-    def generate_layout(self, requirements: Dict[str, Any]) -> Dict[str, Any]:
+    def register_engine(self, engine: PlacementEngine) -> None:
+        """Make a placement engine selectable by its `name`."""
+        self.engines[engine.name] = engine
+    
+    def _get_engine(self, name: str) -> PlacementEngine:
+        if name not in self.engines:
+            raise ValueError(f"Unknown layout engine: {name!r} (available: {', '.join(self.engines)})")
+        return self.engines[name]
+    
+    def generate_layout(self, requirements: Dict[str, Any],
+                        seed: Optional[int] = None,
+                        num_candidates: int = 1,
+                        time_budget: Optional[float] = None,
+                        max_workers: Optional[int] = None,
+                        refine_iterations: int = 0,
+                        refine_time_budget: Optional[float] = None,
+                        engine: str = "greedy") -> Dict[str, Any]:
         """
         Generate a layout based on the requirements from the text understanding module.
         
         Args:
             requirements: Structured data about the floor plan requirements
+            seed: Seed for this call's random streams; the same requirements and
+                seed always give the same layout. A fresh seed is drawn if None
+            num_candidates: Number of independently seeded placement attempts;
+                the best one by `_score_layout` is returned
+            time_budget: Wall-clock limit in seconds for the candidate search
+            max_workers: Worker processes for the candidate search (default: one per core)
+            refine_iterations: Moves tried by the annealing refinement after greedy
+                placement (0 disables refinement)
+            refine_time_budget: Wall-clock limit in seconds for the refinement
+            engine: Placement engine name ("greedy" or "solver")
+            
+        Returns:
+            Dictionary containing the generated layout and the seed used
+        """
+        if num_candidates > 1:
+            return self.generate_layout_candidates(
+                requirements, num_candidates, top_k=1, seed=seed,
+                time_budget=time_budget, max_workers=max_workers,
+                refine_iterations=refine_iterations, refine_time_budget=refine_time_budget,
+                engine=engine)[0]
+        
+        placement_engine = self._get_engine(engine)
+        
+        # Per-call random stream, so concurrent calls never share RNG state
+        if seed is None:
+            seed = _new_seed()
+        rng = random.Random(seed)
+        
+        rooms_data, state, grid_size = self._prepare_layout(requirements, rng)
+        
+        # Place rooms with the selected engine
+        placement_engine.place(self, state, grid_size, rng)
+        
+        # Optionally improve the greedy placement with local search
+        refinement = None
+        if refine_iterations > 0:
+            refinement = self.refiner.refine(state, rng, refine_iterations, refine_time_budget)
+        
+        layout_result = self._build_layout_result(state, rooms_data)
+        layout_result["seed"] = seed
+        if refinement is not None:
+            layout_result["refinement"] = refinement
+        return layout_result
+    
+    def generate_layout_candidates(self, requirements: Dict[str, Any],
+                                   num_candidates: int = 8,
+                                   top_k: int = 1,
+                                   seed: Optional[int] = None,
+                                   time_budget: Optional[float] = None,
+                                   max_workers: Optional[int] = None,
+                                   refine_iterations: int = 0,
+                                   refine_time_budget: Optional[float] = None,
+                                   engine: str = "greedy") -> List[Dict[str, Any]]:
+        """
+        Run several independently seeded placement attempts and keep the best.
+        
+        Attempts run in the process pool shared by the layout calls (see
+        `process_pool`) so that all cores are used. Attempts that have not
+        finished when `time_budget` expires are dropped: queued ones are cancelled or skipped, and running ones cut their
+        refinement short, so they do not hold the pool. The first attempt is
+        never skipped and is waited for when nothing else finished, so results
+        are only reproducible from `seed` when every attempt finishes within the
+        budget.
+        
+        Args:
+            requirements: Structured data about the floor plan requirements
+            num_candidates: Number of placement attempts
+            top_k: Number of layouts to return
+            seed: Seed for the search; attempt seeds are drawn from it
+            time_budget: Wall-clock limit in seconds (None waits for all attempts)
+            max_workers: Worker processes (1 runs the attempts in this process)
+            refine_iterations: Annealing moves per attempt (0 disables refinement)
+            refine_time_budget: Wall-clock limit in seconds for each attempt's refinement
+            engine: Placement engine name ("greedy" or "solver")
+            
+        Returns:
+            Up to `top_k` layout results, best first, each with a "quality" entry
+        """
+        self._get_engine(engine)
+        if seed is None:
+            seed = _new_seed()
+        rng = random.Random(seed)
+        
+        rooms_data, state, grid_size = self._prepare_layout(requirements, rng)
+        seeds = [rng.getrandbits(32) for _ in range(num_candidates)]
+        
+        # Wall-clock time, comparable across processes; only the first attempt is
+        # required, so there is always a result
+        deadline = None if time_budget is None else time.time() + time_budget
+        attempts = [(self, state, grid_size, attempt_seed, refine_iterations, refine_time_budget, engine,
+                     deadline, i > 0)
+                    for i, attempt_seed in enumerate(seeds)]
+        placed_states = []
+        if max_workers == 1:
+            for attempt in attempts:
+                placed_states.append(_run_placement_attempt(*attempt))
+                if deadline is not None and time.time() >= deadline:
+                    break
+        else:
+            executor = shared_pool(max_workers)
+            try:
+                futures = [executor.submit(_run_placement_attempt, *attempt) for attempt in attempts]
+                done, _ = wait(futures, timeout=time_budget)
+                for future in futures[1:]:
+                    future.cancel()
+                # Keep submission order so results do not depend on completion order
+                placed_states = [f.result() for f in futures if f in done]
+                if not done:
+                    placed_states = [futures[0].result()]
+            except BrokenProcessPool:
+                discard_pool(max_workers, executor)
+                raise
+        placed_states = [placed for placed in placed_states if placed is not None]
+        
+        scored = [(self._score_layout(placed), placed) for placed in placed_states]
+        scored.sort(key=lambda item: item[0]["score"], reverse=True)
+        
+        results = []
+        for quality, placed in scored[:top_k]:
+            layout_result = self._build_layout_result(placed, rooms_data)
+            layout_result["quality"] = quality
+            layout_result["seed"] = seed
+            results.append(layout_result)
+        return results
+    
+    def generate_building_layout(self, requirements: Dict[str, Any],
+                                 seed: Optional[int] = None,
+                                 num_floors: int = 1,
+                                 max_zone_rooms: Optional[int] = None,
+                                 engine: str = "greedy",
+                                 max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Hierarchical layout for large buildings (tens to hundreds of rooms).
+        
+        Rooms are clustered into zones, each zone is laid out separately (in
+        parallel) and the zones are then arranged per floor; see
+        `HierarchicalLayoutPlanner`. With more than one floor, a stair/elevator
+        core is placed at the same position on every floor.
+        
+        Args:
+            requirements: Structured data about the floor plan requirements
+            seed: Seed for this call's random streams (a fresh one is drawn if None)
+            num_floors: Number of floors to spread the zones over
+            max_zone_rooms: Largest zone size (default: the planner's setting)
+            engine: Placement engine for the rooms inside each zone
+            max_workers: Worker processes for the zone layouts (1 runs them in this process)
             
         Returns:
-            Dictionary containing the generated layout
+            Dictionary with one regular layout result per floor ("floors"), the zones,
+            the core "anchors", the shared grid size and the seed used
+        """
+        self._get_engine(engine)
+        if seed is None:
+            seed = _new_seed()
+        rng = random.Random(seed)
+        
+        planner = self.hierarchical
+        if max_zone_rooms is not None:
+            planner = HierarchicalLayoutPlanner(max_zone_rooms, planner.core_weight)
+        
+        building = planner.generate(self, requirements, rng, num_floors, engine, max_workers)
+        building["seed"] = seed
+        for floor in building["floors"]:
+            floor["seed"] = seed
+        return building
+    
+    def edit_layout(self, layout_result: Dict[str, Any], edit: Dict[str, Any],
+                    seed: Optional[int] = None) -> Dict[str, Any]:
         """
-        # Add randomness to ensure different layouts on each run
-        random.seed(int(time.time()))
+        Apply one edit (move, resize, add or remove a room) without regenerating the layout.
         
+        Args:
+            layout_result: The layout generated by generate_layout() (or a previous edit)
+            edit: Operation dict, e.g. {"op": "resize", "room": "kitchen", "approximate_sqft": 180};
+                see `LayoutEditor` for the operations
+            seed: Seed for the new room's connectivity edge, if any (default: the layout's seed)
+            
+        Returns:
+            New layout result (the input is not modified) with an "edit" report of the
+            changed rooms, the dirty grid region and which artifacts changed
+        """
+        if seed is None:
+            seed = layout_result.get("seed")
+        rng = random.Random(seed if seed is not None else _new_seed())
+        return self.editor.apply(self, layout_result, edit, rng)
+    
+    def refresh_controlnet_input(self, layout_result: Dict[str, Any], image: Image.Image) -> Image.Image:
+        """
+        Bring a ControlNet input rendered before an edit up to date with `layout_result`.
+        
+        Returns `image` itself when the edit did not change it, redraws only the
+        dirty region when the grid kept its shape, and renders from scratch otherwise.
+        """
+        edit = layout_result.get("edit")
+        if edit is not None and not edit["artifacts"]["controlnet_input"]:
+            return image
+        if edit is None or edit["grid_resized"]:
+            return self.generate_controlnet_input(layout_result)
+        return self.rasterizer.update_controlnet_input(image, layout_result, edit["dirty_region"])
+    
+    def refresh_visualization(self, layout_result: Dict[str, Any], image: Image.Image,
+                              show_labels: bool = True) -> Image.Image:
+        """Same as `refresh_controlnet_input` for the labeled render from `visualize_layout`."""
+        edit = layout_result.get("edit")
+        if edit is not None and not edit["artifacts"]["labeled_layout"]:
+            return image
+        if edit is None or edit["grid_resized"]:
+            return self.visualize_layout(layout_result, show_labels=show_labels)
+        return self.rasterizer.update_layout(image, layout_result, edit["dirty_region"], show_labels)
+    
+    def _prepare_layout(self, requirements: Dict[str, Any],
+                        rng: random.Random) -> Tuple[List[Dict[str, Any]], LayoutState, Tuple[int, int]]:
+        """Build the room list, the array-backed state and the placement grid size."""
         # Extract room data
         rooms_data = self._preprocess_rooms(requirements["rooms"])
         
         # Create room adjacency graph
-        adjacency_graph = self._create_adjacency_graph(rooms_data, requirements.get("adjacency", []))
+        adjacency_graph = self._create_adjacency_graph(rooms_data, requirements.get("adjacency", []), rng)
         
         # Determine grid size based on total area
         total_cells = sum(room["grid_cells"] for room in rooms_data)
         grid_size = self._calculate_grid_size(total_cells)
         
-        # Place rooms using a graph-based approach with randomization
-        room_placements = self._place_rooms(rooms_data, adjacency_graph, grid_size)
+        # Array-backed room state used by the placement passes
+        state = LayoutState(rooms_data, adjacency_graph)
         
-        # Get actual size needed after placing all rooms
-        max_x = max(r["x"] + r["width"] for r in room_placements)
-        max_y = max(r["y"] + r["height"] for r in room_placements)
-        actual_grid_size = (max_x, max_y)
+        return rooms_data, state, grid_size
+    
+    def _build_layout_result(self, state: LayoutState, rooms_data: List[Dict[str, Any]],
+                             grid: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Rasterize a placed state, add doorways and package the layout result.
         
-        # Create grid representation with the actual size needed
-        grid = np.zeros((max_y, max_x), dtype=int)
-        for room in room_placements:
-            room_id = room["id"]
-            x, y = room["x"], room["y"]
-            room_width, room_height = room["width"], room["height"]
-            grid[y:y+room_height, x:x+room_width] = room_id + 1
-        
-        # Create room positions dict
-        room_positions = {
-            room["id"]: {
-                "id": room["id"],
-                "name": room["name"],
-                "type": room["type"],
-                "x": room["x"],
-                "y": room["y"],
-                "width": room["width"],
-                "height": room["height"],
-                "color": self.room_colors.get(room["type"], "#FFFFFF")
-            } for room in room_placements
-        }
+        `grid` may be passed in (without doors) when the caller has already
+        built or patched it.
+        """
+        # Create grid representation with the actual size needed after placing all rooms
+        if grid is None:
+            grid = self._create_grid(state)
+        actual_grid_size = (grid.shape[1], grid.shape[0])
         
         # Create doorways between adjacent rooms
-        grid = self._add_doorways(grid, room_positions, adjacency_graph)
+        walls = SharedWallIndex.from_state(state)
+        grid, doors = self._add_doorways(grid, state, walls)
         
         # Package results
         layout_result = {
-            "grid": grid.tolist(),  # Convert numpy array to list for JSON serialization
-            "room_positions": room_positions,
+            "grid": grid,  # Kept as a NumPy array; serializers pack it (see layout_io)
+            "room_positions": state.to_room_positions(self.room_colors),
+            "doors": doors,
             "grid_size": actual_grid_size,
             "cell_size": self.grid_cell_size,
-            "rooms": rooms_data
+            "rooms": rooms_data,
+            "adjacency": state.edges.tolist()  # [room1, room2, weight], needed to edit the layout later
         }
         
         return layout_result
+    
+    def evaluate_layout(self, layout_result: Dict[str, Any]) -> Dict[str, float]:
+        """Quality metrics of a finished layout (the same ones `generate_layout_candidates` ranks by)."""
+        return self._score_layout(LayoutState.from_layout_result(layout_result))
+    
+    def _score_layout(self, state: LayoutState) -> Dict[str, float]:
+        """
+        Global objective for comparing finished layouts.
+        
+        Combines the share of required (weight >= 10) adjacencies whose rooms
+        share a wall, the squareness of the bounding box and the share of the
+        bounding box left empty. Rooms that could not be placed are penalized.
+        """
+        placed = state.placed
+        xs, ys = state.x, state.y
+        ws, hs = state.width, state.height
+        
+        # Required adjacencies with both rooms placed
+        edges = state.edges[state.edges[:, 2] >= 10]
+        edges = edges[placed[edges[:, 0]] & placed[edges[:, 1]]]
+        walls = SharedWallIndex.from_state(state)
+        satisfied = sum(walls.get(u, v) is not None for u, v in edges[:, :2].tolist())
+        adjacency_satisfaction = satisfied / len(edges) if len(edges) else 1.0
+        
+        # Bounding box of the placed rooms
+        bbox_w = int((xs[placed] + ws[placed]).max() - xs[placed].min())
+        bbox_h = int((ys[placed] + hs[placed]).max() - ys[placed].min())
+        compactness = min(bbox_w, bbox_h) / max(bbox_w, bbox_h)
+        empty_ratio = 1.0 - float(state.grid_cells[placed].sum()) / (bbox_w * bbox_h)
+        unplaced = int((~placed).sum())
+        
+        score = 100 * adjacency_satisfaction + 20 * compactness - 50 * empty_ratio - 100 * unplaced
+        return {
+            "score": score,
+            "adjacency_satisfaction": adjacency_satisfaction,
+            "compactness": compactness,
+            "empty_ratio": empty_ratio,
+            "unplaced_rooms": unplaced
+        }
 
-    def generate_controlnet_input(self, layout_result: Dict[str, Any], save_path: Optional[str] = None) -> plt.Figure:
+    def generate_controlnet_input(self, layout_result: Dict[str, Any], save_path: Optional[str] = None,
+                                  size: Optional[Tuple[int, int]] = None) -> Image.Image:
         """
         Generate a clean black & white binary layout image suitable for ControlNet input.
         - Black walls
@@ -118,33 +406,21 @@ class LayoutGenerationModule:
         - No doors
         - No labels
         - No colors
+        
+        Args:
+            layout_result: The layout generated by generate_layout()
+            save_path: Optional path to also write the image to
+            size: Optional (width, height) in pixels
+            
+        Returns:
+            Grayscale PIL image
         """
-
-        grid = np.array(layout_result["grid"])
-        room_positions = layout_result["room_positions"]
-
-        fig, ax = plt.subplots(figsize=(12, 10))
-        ax.set_facecolor('white')  # Background white
-
-        # Draw rooms (white)
-        for room_id, room_info in room_positions.items():
-            x, y = room_info["x"], room_info["y"]
-            width, height = room_info["width"], room_info["height"]
-
-            rect = plt.Rectangle((x, y), width, height, facecolor='white', edgecolor='black', linewidth=2.0)
-            ax.add_patch(rect)
-
-        ax.set_xlim(-1, grid.shape[1] + 1)
-        ax.set_ylim(grid.shape[0] + 1, -1)
-        ax.set_aspect('equal')
-        ax.axis('off')
-
-        # No gridlines, no labels, no doors
-
+        image = self.rasterizer.render_controlnet_input(layout_result, size=size)
+        
         if save_path:
-            plt.savefig(save_path, dpi=150, bbox_inches='tight', pad_inches=0, facecolor='white')
-
-        return fig
+            image.save(save_path)
+        
+        return image
     
     def _preprocess_rooms(self, rooms_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Process room data to include dimensions and IDs."""
@@ -202,7 +478,8 @@ class LayoutGenerationModule:
         return processed_rooms
     
     def _create_adjacency_graph(self, rooms: List[Dict[str, Any]], 
-                            adjacency_info: List[Dict[str, str]]) -> nx.Graph:
+                            adjacency_info: List[Dict[str, str]],
+                            rng: random.Random) -> nx.Graph:
         """Create a graph representing room adjacencies."""
         graph = nx.Graph()
         
@@ -283,8 +560,8 @@ class LayoutGenerationModule:
             
             for component in other_components:
                 # Find a random node from each component
-                node1 = random.choice(list(component))
-                node2 = random.choice(list(largest_component))
+                node1 = rng.choice(list(component))
+                node2 = rng.choice(list(largest_component))
                 graph.add_edge(node1, node2, weight=1)  # Low weight for connectivity edges
         
         return graph
@@ -308,97 +585,94 @@ class LayoutGenerationModule:
         
         return (width, height)
     
-    def _place_rooms(self, rooms: List[Dict[str, Any]], 
-                    graph: nx.Graph, grid_size: Tuple[int, int]) -> List[Dict[str, Any]]:
-        """Place rooms on the grid based on adjacency requirements."""
+    def _place_rooms(self, state: LayoutState, grid_size: Tuple[int, int], rng: random.Random,
+                     occupancy_cls: type = SummedAreaOccupancy) -> None:
+        """
+        Place rooms on the grid based on adjacency requirements, updating `state` in place.
+        
+        `occupancy_cls` is the free-space structure (`SummedAreaOccupancy` or
+        `BitsetOccupancy`); both give the same layouts.
+        """
         width, height = grid_size
+        num_rooms = len(state)
         
         # Sort rooms by size (largest first) and importance
-        def room_priority(room):
-            # Important rooms get higher priority
-            importance = {
-                "living room": 100,
-                "kitchen": 90,
-                "hallway": 88,
-                "master bedroom": 85,
-                "bedroom": 80,
-                "dining room": 75,
-                "bathroom": 50
-            }
-            return importance.get(room["type"], 0) + room["grid_cells"]
-            
-        sorted_rooms = sorted(rooms, key=room_priority, reverse=True)
-        
-        # Initialize grid for placement check
-        placement_grid = np.zeros((height, width), dtype=int)
-        room_placements = []
+        importance = {
+            "living room": 100,
+            "kitchen": 90,
+            "hallway": 88,
+            "master bedroom": 85,
+            "bedroom": 80,
+            "dining room": 75,
+            "bathroom": 50
+        }
+        # Important rooms get higher priority
+        priority = [importance.get(state.types[i], 0) + int(state.grid_cells[i]) for i in range(num_rooms)]
+        sorted_rooms = sorted(range(num_rooms), key=lambda i: priority[i], reverse=True)
+        
+        # Initialize occupancy for placement check
+        occupancy = occupancy_cls(width, height)
         
         # Place first (most important) room near the center
         first_room = sorted_rooms[0]
-        center_x = width // 2 - first_room["width"] // 2
-        center_y = height // 2 - first_room["height"] // 2
+        center_x = width // 2 - int(state.width[first_room]) // 2
+        center_y = height // 2 - int(state.height[first_room]) // 2
         
-        room_placements.append({
-            **first_room,
-            "x": center_x,
-            "y": center_y
-        })
+        state.place(first_room, center_x, center_y)
         
         # Mark grid as occupied
-        placement_grid[center_y:center_y+first_room["height"], 
-                    center_x:center_x+first_room["width"]] = first_room["id"] + 1
+        occupancy.place(center_x, center_y, int(state.width[first_room]), int(state.height[first_room]),
+                        first_room + 1)
         
         # Place remaining rooms
         remaining_rooms = sorted_rooms[1:]
-        placed_room_ids = {first_room["id"]}
         
         # Add randomization factor to create variation in layouts
-        random_seed = random.randint(1, 1000)
-        random.seed(random_seed)
+        np_rng = np.random.default_rng(rng.getrandbits(64))
         
         while remaining_rooms:
             best_score = -float('inf')
             best_placement = None
             best_room_idx = 0
+            num_placed = len(state.placement_order)
             
             # Try each remaining room
             for i, room in enumerate(remaining_rooms):
-                # Find adjacent rooms already placed
-                adjacent_rooms = []
-                for adj_id in graph.neighbors(room["id"]):
-                    if adj_id in placed_room_ids:
-                        adjacent_rooms.append(adj_id)
+                room_w, room_h = int(state.width[room]), int(state.height[room])
                 
                 # If no adjacent rooms placed yet, skip for now
-                if not adjacent_rooms and len(placed_room_ids) < len(rooms) // 2:
+                has_placed_neighbor = np.any((state.weights[room] > 0) & state.placed)
+                if not has_placed_neighbor and num_placed < num_rooms // 2:
                     continue
                 
                 # Add some randomness to the search pattern
-                start_y = random.randint(0, min(3, height - room["height"]))
-                start_x = random.randint(0, min(3, width - room["width"]))
+                start_y = rng.randint(0, min(3, height - room_h))
+                start_x = rng.randint(0, min(3, width - room_w))
                 
-                # Try all possible positions in a slightly randomized order
-                for y_offset in range(height - room["height"] + 1):
-                    y = (start_y + y_offset) % (height - room["height"] + 1)
-                    for x_offset in range(width - room["width"] + 1):
-                        x = (start_x + x_offset) % (width - room["width"] + 1)
-                        
-                        # Check if area is free
-                        area = placement_grid[y:y+room["height"], x:x+room["width"]]
-                        if np.any(area > 0):
-                            continue
-                        
-                        # Calculate score based on adjacency and position
-                        score = self._calculate_placement_score(
-                            room, x, y, placement_grid, room_placements, graph)
-                        
-                        # Add small random variation to score to prevent identical layouts
-                        score += random.uniform(-0.5, 0.5)
-                        
-                        if score > best_score:
-                            best_score = score
-                            best_placement = (x, y)
-                            best_room_idx = i
+                # Free positions, visited in the same slightly randomized order
+                # as a row-major scan starting at (start_x, start_y)
+                fits = occupancy.fits_mask(room_w, room_h)
+                rows, cols = fits.shape
+                scan = np.roll(fits, shift=(-start_y, -start_x), axis=(0, 1))
+                scan_ys, scan_xs = np.nonzero(scan)
+                candidate_ys = (scan_ys + start_y) % rows
+                candidate_xs = (scan_xs + start_x) % cols
+                
+                if not len(candidate_xs):
+                    continue
+                
+                # Calculate score based on adjacency and position
+                scores = self._calculate_placement_scores(
+                    state, room, candidate_xs, candidate_ys, (height, width))
+                
+                # Add small random variation to score to prevent identical layouts
+                scores += np_rng.uniform(-0.5, 0.5, size=len(scores))
+                
+                best_idx = int(np.argmax(scores))
+                if scores[best_idx] > best_score:
+                    best_score = scores[best_idx]
+                    best_placement = (int(candidate_xs[best_idx]), int(candidate_ys[best_idx]))
+                    best_room_idx = i
             
             # If found a valid placement
             if best_placement:
@@ -406,13 +680,8 @@ class LayoutGenerationModule:
                 room = remaining_rooms[best_room_idx]
                 
                 # Place the room
-                room_placements.append({
-                    **room,
-                    "x": x,
-                    "y": y
-                })
-                placement_grid[y:y+room["height"], x:x+room["width"]] = room["id"] + 1
-                placed_room_ids.add(room["id"])
+                state.place(room, x, y)
+                occupancy.place(x, y, int(state.width[room]), int(state.height[room]), room + 1)
                 
                 # Remove from remaining rooms
                 remaining_rooms.pop(best_room_idx)
@@ -420,190 +689,179 @@ class LayoutGenerationModule:
                 # If no valid placement found, take the first remaining room
                 # and place it at the first available position
                 room = remaining_rooms[0]
+                room_w, room_h = int(state.width[room]), int(state.height[room])
                 
-                for y in range(height - room["height"] + 1):
-                    placed = False
-                    for x in range(width - room["width"] + 1):
-                        area = placement_grid[y:y+room["height"], x:x+room["width"]]
-                        if not np.any(area > 0):
-                            room_placements.append({
-                                **room,
-                                "x": x,
-                                "y": y
-                            })
-                            placement_grid[y:y+room["height"], x:x+room["width"]] = room["id"] + 1
-                            placed_room_ids.add(room["id"])
-                            placed = True
-                            break
-                    if placed:
-                        break
+                free_ys, free_xs = np.nonzero(occupancy.fits_mask(room_w, room_h))
+                if len(free_ys):
+                    x, y = int(free_xs[0]), int(free_ys[0])
+                    state.place(room, x, y)
+                    occupancy.place(x, y, room_w, room_h, room + 1)
                         
                 remaining_rooms.pop(0)
         
         # Compress layout by removing empty rows and columns
-        min_x = width
-        min_y = height
-        max_x = 0
-        max_y = 0
-        
-        # Find the actual bounds of the placed rooms
-        for room in room_placements:
-            min_x = min(min_x, room["x"])
-            min_y = min(min_y, room["y"])
-            max_x = max(max_x, room["x"] + room["width"])
-            max_y = max(max_y, room["y"] + room["height"])
-            
-        # Adjust all room positions to remove empty space
-        for room in room_placements:
-            room["x"] -= min_x
-            room["y"] -= min_y
-        
-        return room_placements
+        placed = state.placed
+        state.x[placed] -= state.x[placed].min()
+        state.y[placed] -= state.y[placed].min()
     
-    def _calculate_placement_score(self, room: Dict[str, Any], x: int, y: int,
-                                grid: np.ndarray, placed_rooms: List[Dict[str, Any]],
-                                graph: nx.Graph) -> float:
+    def _place_single_room(self, state: LayoutState, room: int,
+                           near: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Place one room at the best free position around the placed rooms, scored
+        like `_place_rooms` and, if `near` is given, kept close to that position.
+        The room may land left of or above the placed rooms; callers shift the layout.
+        """
+        others = np.array(state.placement_order, dtype=np.int64)
+        w, h = int(state.width[room]), int(state.height[room])
+        if len(others):
+            min_x, min_y = int(state.x[others].min()), int(state.y[others].min())
+            extent_x = int((state.x[others] + state.width[others]).max()) - min_x
+            extent_y = int((state.y[others] + state.height[others]).max()) - min_y
+        else:
+            min_x = min_y = extent_x = extent_y = 0
+        
+        # Search a grid around the placed rooms with a room-sized margin on every side
+        shift_x, shift_y = w - min_x, h - min_y
+        width, height = extent_x + 2 * w, extent_y + 2 * h
+        occupancy = BitsetOccupancy(width, height)
+        for other in others.tolist():
+            occupancy.place(int(state.x[other]) + shift_x, int(state.y[other]) + shift_y,
+                            int(state.width[other]), int(state.height[other]))
+        ys, xs = np.nonzero(occupancy.fits_mask(w, h))
+        
+        state.x[others] += shift_x
+        state.y[others] += shift_y
+        scores = self._calculate_placement_scores(state, room, xs, ys, (height, width))
+        if near is not None:
+            scores -= 2.0 * np.hypot(xs - (near[0] + shift_x), ys - (near[1] + shift_y))
+        state.x[others] -= shift_x
+        state.y[others] -= shift_y
+        
+        best = int(np.argmax(scores))
+        state.place(room, int(xs[best]) - shift_x, int(ys[best]) - shift_y)
+    
+    def _calculate_placement_score(self, state: LayoutState, room: int, x: int, y: int,
+                                   grid_shape: Tuple[int, int]) -> float:
         """Calculate how good a placement is based on adjacency and other factors."""
-        score = 0
-        room_id = room["id"]
-        room_w, room_h = room["width"], room["height"]
-        grid_height, grid_width = grid.shape
-        
-        # ADJACENCY SCORING
-        # ================
-        
-        # Track if required adjacencies are satisfied
-        adjacency_satisfied = {}
-        
-        # Get all rooms that should be adjacent to this one
-        required_adjacencies = []
-        for neighbor_id in graph.neighbors(room_id):
-            weight = graph.get_edge_data(room_id, neighbor_id)["weight"]
-            if weight >= 10:  # Only consider high-weight edges as required
-                required_adjacencies.append((neighbor_id, weight))
-        
-        # Check each placed room
-        for placed_room in placed_rooms:
-            placed_id = placed_room["id"]
-            px, py = placed_room["x"], placed_room["y"]
-            pw, ph = placed_room["width"], placed_room["height"]
-            
-            # Check if these rooms should be adjacent
-            edge_weight = 0
-            if graph.has_edge(room_id, placed_id):
-                edge_weight = graph.get_edge_data(room_id, placed_id)["weight"]
-                
-                # Track if this is a required adjacency
-                if edge_weight >= 10:
-                    adjacency_satisfied[placed_id] = False
-            
-            # Calculate overlap distance for each edge
-            # Horizontal adjacency (left/right)
-            if (y < py + ph and y + room_h > py):
-                # Room to the left
-                if x + room_w == px:
-                    score += edge_weight * 15  # Strong bonus for horizontal adjacency
-                    if edge_weight >= 10:
-                        adjacency_satisfied[placed_id] = True
-                # Room to the right
-                elif px + pw == x:
-                    score += edge_weight * 15  # Strong bonus for horizontal adjacency
-                    if edge_weight >= 10:
-                        adjacency_satisfied[placed_id] = True
-            
-            # Vertical adjacency (above/below)
-            if (x < px + pw and x + room_w > px):
-                # Room above
-                if y + room_h == py:
-                    score += edge_weight * 15  # Strong bonus for vertical adjacency
-                    if edge_weight >= 10:
-                        adjacency_satisfied[placed_id] = True
-                # Room below
-                elif py + ph == y:
-                    score += edge_weight * 15  # Strong bonus for vertical adjacency
-                    if edge_weight >= 10:
-                        adjacency_satisfied[placed_id] = True
-            
-            # Penalize overlapping rooms (shouldn't happen due to earlier check)
-            if (x < px + pw and x + room_w > px and
-                y < py + ph and y + room_h > py):
-                score -= 1000
+        scores = self._calculate_placement_scores(
+            state, room, np.array([x]), np.array([y]), grid_shape)
+        return float(scores[0])
+    
+    def _calculate_placement_scores(self, state: LayoutState, room: int, xs: np.ndarray, ys: np.ndarray,
+                                    grid_shape: Tuple[int, int]) -> np.ndarray:
+        """
+        Score every candidate position for a room in one pass.
+        
+        Candidates run along axis 0 and placed rooms along axis 1, so each term
+        of the placement score is an array operation instead of a Python loop
+        over positions and placed rooms.
+        
+        Args:
+            state: Current layout state; rooms with `state.placed` set are on the grid
+            room: Index of the room being placed
+            xs, ys: Candidate top-left corners (1-D integer arrays of equal length)
+            grid_shape: (height, width) of the placement grid
+            
+        Returns:
+            Array with one score per candidate
+        """
+        room_w, room_h = int(state.width[room]), int(state.height[room])
+        room_type = state.types[room]
+        grid_height, grid_width = grid_shape
+        
+        x = np.asarray(xs, dtype=float)[:, None]
+        y = np.asarray(ys, dtype=float)[:, None]
+        scores = np.zeros(len(xs))
+        
+        placed = np.array(state.placement_order, dtype=np.int64)
+        if len(placed):
+            # Placed-rooms matrix, one column per room
+            px = state.x[placed].astype(float)
+            py = state.y[placed].astype(float)
+            pw = state.width[placed].astype(float)
+            ph = state.height[placed].astype(float)
+            edge_weight = state.weights[room, placed]
+            
+            # ADJACENCY SCORING
+            # ================
+            
+            overlap_y = (y < py + ph) & (y + room_h > py)
+            overlap_x = (x < px + pw) & (x + room_w > px)
+            
+            # Horizontal adjacency (left/right) and vertical adjacency (above/below)
+            horizontal = overlap_y & ((x + room_w == px) | (px + pw == x))
+            vertical = overlap_x & ((y + room_h == py) | (py + ph == y))
+            
+            # Strong bonus for each shared wall with a desired neighbor
+            contact_bonus = (horizontal.astype(float) + vertical) * (edge_weight * 15)
+            
+            # Penalize overlapping rooms (shouldn't happen due to the free-space mask)
+            overlap_penalty = (overlap_x & overlap_y) * 1000.0
             
             # Penalize rooms that are far from desired neighbors
-            if edge_weight > 0:
-                center_dist = math.sqrt(
-                    (x + room_w/2 - (px + pw/2))**2 + 
-                    (y + room_h/2 - (py + ph/2))**2
-                )
-                score -= center_dist * edge_weight * 0.5
+            center_dist = np.sqrt(
+                (x + room_w/2 - (px + pw/2))**2 +
+                (y + room_h/2 - (py + ph/2))**2
+            )
+            distance_penalty = center_dist * (edge_weight * 0.5)
+            
+            scores += (contact_bonus - overlap_penalty - distance_penalty).sum(axis=1)
+            
+            if room_type in ["bedroom", "master bedroom"]:
+                # Major bonus for each living room whose required adjacency is satisfied
+                required_living = state.type_mask("living room")[placed] & (edge_weight >= 10)
+                satisfied = (horizontal | vertical) & required_living
+                scores += satisfied.sum(axis=1) * 100
+        
+        x = x[:, 0]
+        y = y[:, 0]
         
         # Special bonus for hallways
-        if room["type"] == "hallway":
+        if room_type == "hallway":
             # Encourage hallways to be more central
             center_x, center_y = grid_width // 2, grid_height // 2
-            distance_to_center = math.sqrt(
-                (x + room_w/2 - center_x)**2 + 
+            distance_to_center = np.sqrt(
+                (x + room_w/2 - center_x)**2 +
                 (y + room_h/2 - center_y)**2
             )
             # Bonus for being closer to center
-            score += 50 * (1 - distance_to_center / (grid_width + grid_height))
+            scores += 50 * (1 - distance_to_center / (grid_width + grid_height))
         
         # Extra bonus for living room adjacencies
-        if room["type"] == "living room":
+        if room_type == "living room":
             # Encourage living room to be more central
-            score += 30
-        elif room["type"] in ["bedroom", "master bedroom"]:
-            # Check if this bedroom has a living room adjacency 
-            # satisfied, give major bonus if yes
-            for placed_room in placed_rooms:
-                if placed_room["type"] == "living room" and adjacency_satisfied.get(placed_room["id"], False):
-                    score += 100  # Major bonus for bedroom with living room adjacency
+            scores += 30
         
         # Avoid edge of grid slightly
-        if x == 0 or y == 0 or x + room_w == grid_width or y + room_h == grid_height:
-            score -= 5
+        on_edge = (x == 0) | (y == 0) | (x + room_w == grid_width) | (y + room_h == grid_height)
+        scores -= on_edge * 5
         
-        return score
+        return scores
     
-    def _create_grid(self, room_placements: List[Dict[str, Any]], 
-                 grid_size: Tuple[int, int]) -> Tuple[np.ndarray, Dict[int, Dict]]:
-        """Create a grid representation of the floor plan."""
-        width, height = grid_size
+    def _create_grid(self, state: LayoutState) -> np.ndarray:
+        """Create a grid representation of the floor plan, sized to the placed rooms."""
+        placed = np.array(state.placement_order, dtype=np.int64)
+        max_x = int((state.x[placed] + state.width[placed]).max())
+        max_y = int((state.y[placed] + state.height[placed]).max())
         
         # Initialize grid with zeros (empty space)
-        grid = np.zeros((height, width), dtype=int)
-        
-        # Dictionary to store room positions and metadata
-        room_positions = {}
-        
-        # Place each room on the grid
-        for room in room_placements:
-            room_id = room["id"]
-            x, y = room["x"], room["y"]
-            room_width, room_height = room["width"], room["height"]
-            
-            # Mark room area in grid with room ID + 1 (0 is reserved for empty space)
-            grid[y:y+room_height, x:x+room_width] = room_id + 1
-            
-            # Store room position and info
-            room_positions[room_id] = {
-                "id": room_id,
-                "name": room["name"],
-                "type": room["type"],
-                "x": x,
-                "y": y,
-                "width": room_width,
-                "height": room_height,
-                "color": self.room_colors.get(room["type"], "#FFFFFF")
-            }
-        
-        return grid, room_positions
+        grid = np.zeros((max_y, max_x), dtype=int)
+        
+        # Mark room area in grid with room ID + 1 (0 is reserved for empty space)
+        for room in state.placement_order:
+            x, y = state.x[room], state.y[room]
+            grid[y:y+state.height[room], x:x+state.width[room]] = room + 1
+        
+        return grid
     
-    def _add_doorways(self, grid: np.ndarray, room_positions: Dict[int, Dict],
-                    adjacency_graph: nx.Graph) -> np.ndarray:
-        """Add doorways between adjacent rooms."""
-        height, width = grid.shape
+    def _add_doorways(self, grid: np.ndarray, state: LayoutState,
+                      walls: SharedWallIndex) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Add doorways between adjacent rooms.
         
+        Returns the grid with door cells set to -1 and the door metadata
+        (cell, orientation of the wall it sits on, connected room IDs).
+        """
         # Create a copy of the grid to work with
         grid_with_doors = grid.copy()
         
@@ -611,162 +869,79 @@ class LayoutGenerationModule:
         doorway_value = -1
         
         # Process each edge in the adjacency graph by order of edge weight (highest first)
-        edges = [(u, v, adjacency_graph[u][v]['weight']) for u, v in adjacency_graph.edges()]
+        edges = state.edges[np.argsort(-state.edges[:, 2], kind="stable")]
         
-        # Sort edges by weight, highest first
-        edges.sort(key=lambda x: x[2], reverse=True)
+        doors = []
         
         # Track which rooms have doorways to avoid excess doors
-        room_has_doorway = {room_id: 0 for room_id in room_positions}
+        room_has_doorway = np.zeros(len(state), dtype=np.int64)
+        hallway = state.type_mask("hallway")
         
         # Process edges in order of importance
-        for room1_id, room2_id, weight in edges:
+        for room1_id, room2_id, weight in edges.tolist():
             # Skip if weight is too low (non-physical adjacency)
             if weight < 3:  # Skip connections with very low weights
                 continue
             
-            # Get room information
-            if room1_id not in room_positions or room2_id not in room_positions:
+            # Only rooms that are physically adjacent get a door
+            wall = walls.get(room1_id, room2_id)
+            if wall is None:
                 continue
-                
-            room1 = room_positions[room1_id]
-            room2 = room_positions[room2_id]
             
-            # Check if rooms are physically adjacent
-            doorway_candidates = []
+            # Choose a point in the middle of the shared wall; the door goes on the
+            # entrance cell of the room to the right of (or below) the wall
+            mid = wall.start + (wall.end - wall.start) // 2
+            if wall.orientation == "vertical":
+                door_x, door_y = wall.coord, mid
+                before, after = (door_y, wall.coord - 1), (door_y, wall.coord)
+            else:
+                door_x, door_y = mid, wall.coord
+                before, after = (wall.coord - 1, door_x), (wall.coord, door_x)
             
-            # Room 1 to the left of Room 2
-            if room1["x"] + room1["width"] == room2["x"]:
-                # Find overlapping y-range
-                y_min = max(room1["y"], room2["y"])
-                y_max = min(room1["y"] + room1["height"], room2["y"] + room2["height"])
-                
-                if y_max > y_min:  # If there's overlap
-                    # Choose a point in the middle of the overlap
-                    door_y = y_min + (y_max - y_min) // 2
-                    
-                    # Verify this point is on the boundary between the two rooms
-                    if (grid_with_doors[door_y, room1["x"] + room1["width"] - 1] == room1_id + 1 and
-                        grid_with_doors[door_y, room2["x"]] == room2_id + 1):
-                        doorway_candidates.append((room2["x"], door_y))  # Place door at Room 2's entrance
-            
-            # Room 1 to the right of Room 2
-            elif room2["x"] + room2["width"] == room1["x"]:
-                # Find overlapping y-range
-                y_min = max(room1["y"], room2["y"])
-                y_max = min(room1["y"] + room1["height"], room2["y"] + room2["height"])
-                
-                if y_max > y_min:  # If there's overlap
-                    # Choose a point in the middle of the overlap
-                    door_y = y_min + (y_max - y_min) // 2
-                    
-                    # Verify this point is on the boundary between the two rooms
-                    if (grid_with_doors[door_y, room1["x"]] == room1_id + 1 and
-                        grid_with_doors[door_y, room2["x"] + room2["width"] - 1] == room2_id + 1):
-                        doorway_candidates.append((room1["x"], door_y))  # Place door at Room 1's entrance
-            
-            # Room 1 above Room 2
-            elif room1["y"] + room1["height"] == room2["y"]:
-                # Find overlapping x-range
-                x_min = max(room1["x"], room2["x"])
-                x_max = min(room1["x"] + room1["width"], room2["x"] + room2["width"])
-                
-                if x_max > x_min:  # If there's overlap
-                    # Choose a point in the middle of the overlap
-                    door_x = x_min + (x_max - x_min) // 2
-                    
-                    # Verify this point is on the boundary between the two rooms
-                    if (grid_with_doors[room1["y"] + room1["height"] - 1, door_x] == room1_id + 1 and
-                        grid_with_doors[room2["y"], door_x] == room2_id + 1):
-                        doorway_candidates.append((door_x, room2["y"]))  # Place door at Room 2's entrance
-            
-            # Room 1 below Room 2
-            elif room2["y"] + room2["height"] == room1["y"]:
-                # Find overlapping x-range
-                x_min = max(room1["x"], room2["x"])
-                x_max = min(room1["x"] + room1["width"], room2["x"] + room2["width"])
+            # Verify this point is on the boundary between the two rooms (not already a door)
+            if (grid_with_doors[before] != wall.first + 1 or
+                    grid_with_doors[after] != wall.second + 1):
+                continue
+            
+            # Limit number of doors per room (except for hallways)
+            if (hallway[room1_id] or hallway[room2_id] or
+                room_has_doorway[room1_id] < 3 and room_has_doorway[room2_id] < 3):
                 
-                if x_max > x_min:  # If there's overlap
-                    # Choose a point in the middle of the overlap
-                    door_x = x_min + (x_max - x_min) // 2
-                    
-                    # Verify this point is on the boundary between the two rooms
-                    if (grid_with_doors[room1["y"], door_x] == room1_id + 1 and
-                        grid_with_doors[room2["y"] + room2["height"] - 1, door_x] == room2_id + 1):
-                        doorway_candidates.append((door_x, room1["y"]))  # Place door at Room 1's entrance
-            
-            # If rooms are adjacent, place a doorway
-            if doorway_candidates:
-                # Choose the first candidate
-                door_x, door_y = doorway_candidates[0]
+                # Mark doorway on grid
+                grid_with_doors[door_y, door_x] = doorway_value
+                doors.append({
+                    "x": door_x,
+                    "y": door_y,
+                    "orientation": wall.orientation,
+                    "rooms": [room1_id, room2_id]
+                })
                 
-                # Limit number of doors per room (except for hallways)
-                if (room1["type"] == "hallway" or room2["type"] == "hallway" or
-                    room_has_doorway[room1_id] < 3 and room_has_doorway[room2_id] < 3):
-                    
-                    # Mark doorway on grid
-                    grid_with_doors[door_y, door_x] = doorway_value
-                    
-                    # Increment door counter for these rooms
-                    room_has_doorway[room1_id] += 1
-                    room_has_doorway[room2_id] += 1
-        
-        return grid_with_doors
+                # Increment door counter for these rooms
+                room_has_doorway[room1_id] += 1
+                room_has_doorway[room2_id] += 1
+        
+        return grid_with_doors, doors
     
-    def visualize_layout(self, layout_result: Dict[str, Any], save_path: Optional[str] = None, show_labels: bool = True) -> plt.Figure:
-        grid = np.array(layout_result["grid"])
-        room_positions = layout_result["room_positions"]
-
-        fig, ax = plt.subplots(figsize=(12, 10))
-        ax.set_facecolor('#F5F5F5')
-
-        # Dibujar habitaciones
-        for room_id, room_info in room_positions.items():
-            x, y = room_info["x"], room_info["y"]
-            width, height = room_info["width"], room_info["height"]
-            color = room_info["color"]
-
-            rect = plt.Rectangle((x, y), width, height, facecolor=color, edgecolor='black', linewidth=1.5)
-            ax.add_patch(rect)
-
-            # Dibujar labels
-            if show_labels:
-                ax.text(x + width/2, y + height/2, room_info["name"].upper(), 
-                        ha='center', va='center', fontsize=7, fontweight='bold', color='black')
-
-        # Dibujar puertas
-        height, width = grid.shape
-        for y in range(height):
-            for x in range(width):
-                if grid[y, x] == -1:  # Puerta
-                    left = grid[y, x-1] if x > 0 else 0
-                    right = grid[y, x+1] if x < width -1 else 0
-                    up = grid[y-1, x] if y > 0 else 0
-                    down = grid[y+1, x] if y < height -1 else 0
-
-                    if left > 0 and right > 0 and left != right:
-                        door_rect = plt.Rectangle((x - 0.05, y - 0.5), 0.1, 1.0, facecolor='white', edgecolor='black', linewidth=0.8)
-                        ax.add_patch(door_rect)
-                    elif up > 0 and down > 0 and up != down:
-                        door_rect = plt.Rectangle((x - 0.5, y - 0.05), 1.0, 0.1, facecolor='white', edgecolor='black', linewidth=0.8)
-                        ax.add_patch(door_rect)
-
-        ax.set_xlim(-1, width + 1)
-        ax.set_ylim(height + 1, -1)
-        ax.set_aspect('equal')
-        ax.axis('off')
-
-        if show_labels:
-            pass
-        else:
-            pass
-
-        ax.grid(True, color='gray', linestyle='--', linewidth=0.5, alpha=0.3)
-
+    def visualize_layout(self, layout_result: Dict[str, Any], save_path: Optional[str] = None,
+                         show_labels: bool = True, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        Render the layout with room colors, walls, doors and (optionally) labels.
+        
+        Args:
+            layout_result: The layout generated by generate_layout()
+            save_path: Optional path to also write the image to
+            show_labels: Draw room names
+            size: Optional (width, height) in pixels
+            
+        Returns:
+            RGB PIL image
+        """
+        image = self.rasterizer.render_layout(layout_result, size=size, show_labels=show_labels)
+        
         if save_path:
-            plt.savefig(save_path, dpi=150, bbox_inches='tight')
-
-        return fig
+            image.save(save_path)
+        
+        return image
 
     
     def generate_layout_json(self, layout_result: Dict[str, Any]) -> str:
@@ -777,21 +952,17 @@ class LayoutGenerationModule:
             layout_result: The layout generated by generate_layout()
             
         Returns:
-            JSON string representation
-        """
-        import json
-        
-        # Convert numpy arrays to lists
-        serializable_result = {
-            "grid": layout_result["grid"].tolist() if isinstance(layout_result["grid"], np.ndarray) 
-                    else layout_result["grid"],
-            "room_positions": layout_result["room_positions"],
-            "grid_size": layout_result["grid_size"],
-            "cell_size": layout_result["cell_size"],
-            "rooms": layout_result["rooms"]
-        }
-        
-        return json.dumps(serializable_result, indent=2)
+            JSON string in the compact, versioned layout format
+        """
+        return dumps_layout_json(layout_result)
+    
+    def write_layout_json(self, layout_result: Dict[str, Any], fp: IO[str]) -> None:
+        """Stream the layout JSON to a file-like object."""
+        write_layout_json(layout_result, fp)
+    
+    def load_layout_json(self, source: Union[str, IO[str]]) -> Dict[str, Any]:
+        """Load a layout JSON string or file back into a layout result."""
+        return read_layout_json(source)
     
     def generate_svg_representation(self, layout_result: Dict[str, Any]) -> str:
         """
@@ -803,7 +974,19 @@ class LayoutGenerationModule:
         Returns:
             SVG string representation
         """
-        grid = np.array(layout_result["grid"]) if not isinstance(layout_result["grid"], np.ndarray) else layout_result["grid"]
+        buffer = io.StringIO()
+        self.write_svg(layout_result, buffer)
+        return buffer.getvalue()
+    
+    def write_svg(self, layout_result: Dict[str, Any], fp: IO[str]) -> None:
+        """
+        Stream an SVG representation of the floor plan to a file-like object.
+        
+        Args:
+            layout_result: The layout generated by generate_layout()
+            fp: Text stream to write to
+        """
+        grid = np.asarray(layout_result["grid"])
         room_positions = layout_result["room_positions"]
         
         # SVG parameters
@@ -813,10 +996,10 @@ class LayoutGenerationModule:
         svg_height = height * cell_size
         
         # Start SVG
-        svg = [f'<svg width="{svg_width}" height="{svg_height}" viewBox="0 0 {svg_width} {svg_height}" xmlns="http://www.w3.org/2000/svg">']
+        fp.write(f'<svg width="{svg_width}" height="{svg_height}" viewBox="0 0 {svg_width} {svg_height}" xmlns="http://www.w3.org/2000/svg">\n')
         
         # Background
-        svg.append(f'<rect width="{svg_width}" height="{svg_height}" fill="#F5F5F5" />')
+        fp.write(f'<rect width="{svg_width}" height="{svg_height}" fill="#F5F5F5" />\n')
         
         # Draw rooms
         for room_id, room_info in room_positions.items():
@@ -825,45 +1008,71 @@ class LayoutGenerationModule:
             color = room_info["color"]
             
             # Convert to SVG coordinates
-            svg_x = x * cell_size
-            svg_y = y * cell_size
-            svg_width = room_width * cell_size
-            svg_height = room_height * cell_size
+            room_x = x * cell_size
+            room_y = y * cell_size
+            room_w = room_width * cell_size
+            room_h = room_height * cell_size
             
             # Add room rectangle
-            svg.append(f'<rect x="{svg_x}" y="{svg_y}" width="{svg_width}" height="{svg_height}" '
-                    f'fill="{color}" stroke="black" stroke-width="2" />')
+            fp.write(f'<rect x="{room_x}" y="{room_y}" width="{room_w}" height="{room_h}" '
+                     f'fill="{color}" stroke="black" stroke-width="2" />\n')
             
             # Add room label
-            text_x = svg_x + svg_width / 2
-            text_y = svg_y + svg_height / 2
-            svg.append(f'<text x="{text_x}" y="{text_y}" font-family="Arial" font-size="12" '
-                    f'font-weight="bold" text-anchor="middle" dominant-baseline="middle">'
-                    f'{room_info["name"]}</text>')
+            text_x = room_x + room_w / 2
+            text_y = room_y + room_h / 2
+            fp.write(f'<text x="{text_x}" y="{text_y}" font-family="Arial" font-size="12" '
+                     f'font-weight="bold" text-anchor="middle" dominant-baseline="middle">'
+                     f'{escape(room_info["name"])}</text>\n')
         
         # Draw doorways - adjust the size to better represent doors
+        doors = layout_result.get("doors")
+        if doors is None:
+            doors = extract_doors(grid)
         door_size = cell_size * 0.8  # Slightly larger door symbol
-        for y in range(height):
-            for x in range(width):
-                if grid[y, x] == -1:  # Doorway
-                    door_x = x * cell_size - door_size / 2 + cell_size / 2
-                    door_y = y * cell_size - door_size / 2 + cell_size / 2
-                    
-                    svg.append(f'<rect x="{door_x}" y="{door_y}" width="{door_size}" height="{door_size}" '
-                            f'fill="white" stroke="black" stroke-width="1.5" />')
-        
-        # Add grid lines (optional - comment out if you don't want grid lines)
-        for i in range(width + 1):
-            x = i * cell_size
-            svg.append(f'<line x1="{x}" y1="0" x2="{x}" y2="{height * cell_size}" '
-                    f'stroke="gray" stroke-width="0.5" stroke-dasharray="3,3" opacity="0.3" />')
-        
-        for i in range(height + 1):
-            y = i * cell_size
-            svg.append(f'<line x1="0" y1="{y}" x2="{width * cell_size}" y2="{y}" '
-                    f'stroke="gray" stroke-width="0.5" stroke-dasharray="3,3" opacity="0.3" />')
+        for door in doors:
+            door_x = door["x"] * cell_size - door_size / 2 + cell_size / 2
+            door_y = door["y"] * cell_size - door_size / 2 + cell_size / 2
+            
+            fp.write(f'<rect x="{door_x}" y="{door_y}" width="{door_size}" height="{door_size}" '
+                     f'fill="white" stroke="black" stroke-width="1.5" />\n')
         
-        # Close SVG
-        svg.append('</svg>')
+        # Add grid lines as one tiled pattern (optional - comment out if you don't want grid lines)
+        fp.write(f'<defs><pattern id="grid" width="{cell_size}" height="{cell_size}" patternUnits="userSpaceOnUse">'
+                 f'<path d="M {cell_size} 0 L 0 0 0 {cell_size}" fill="none" '
+                 f'stroke="gray" stroke-width="0.5" stroke-dasharray="3,3" opacity="0.3" />'
+                 f'</pattern></defs>\n')
+        fp.write(f'<rect width="{svg_width + 1}" height="{svg_height + 1}" fill="url(#grid)" />\n')
         
-        return '\n'.join(svg)
\ No newline at end of file
+        # Close SVG
+        fp.write('</svg>')
+
+
+def _run_placement_attempt(module: LayoutGenerationModule, state: LayoutState,
+                           grid_size: Tuple[int, int], seed: int,
+                           refine_iterations: int = 0,
+                           refine_time_budget: Optional[float] = None,
+                           engine: str = "greedy",
+                           deadline: Optional[float] = None,
+                           optional: bool = False) -> Optional[LayoutState]:
+    """
+    Run one seeded placement attempt on a copy of `state` (process pool entry point).
+
+    Refinement stops at the `deadline` (a `time.time()` value). An `optional`
+    attempt that only starts after the deadline is skipped and returns None.
+    """
+    if optional and deadline is not None and time.time() >= deadline:
+        return None
+    state = copy.deepcopy(state)
+    rng = random.Random(seed)
+    module._get_engine(engine).place(module, state, grid_size, rng)
+    if refine_iterations > 0:
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.time())
+            refine_time_budget = remaining if refine_time_budget is None else min(refine_time_budget, remaining)
+        module.refiner.refine(state, rng, refine_iterations, refine_time_budget)
+    return state
+
+
+def _new_seed() -> int:
+    """Draw a fresh 32-bit seed from OS entropy."""
+    return random.SystemRandom().getrandbits(32)
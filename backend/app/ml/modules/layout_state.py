@@ -0,0 +1,128 @@
+import numpy as np
+import networkx as nx
+from typing import Dict, List, Any
+
+
+class LayoutState:
+    """
+    Struct-of-arrays representation of the rooms being laid out.
+
+    Room `i` is described by `x[i]`, `y[i]`, `width[i]`, `height[i]` and
+    `type_code[i]` (an index into `type_names`), and adjacency weights live in
+    the dense `weights` matrix (0 where rooms have no edge). The placer, grid
+    builder and doorway pass work on these arrays directly; the dict format
+    used in layout results is produced only by `to_room_positions`.
+    """
+
+    def __init__(self, rooms: List[Dict[str, Any]], graph: nx.Graph):
+        n = len(rooms)
+        self.names = [room["name"] for room in rooms]
+        self.types = [room["type"] for room in rooms]
+        self.type_names = list(dict.fromkeys(self.types))
+        self.type_code = np.array([self.type_names.index(t) for t in self.types], dtype=np.int32)
+
+        self.width = np.array([room["width"] for room in rooms], dtype=np.int64)
+        self.height = np.array([room["height"] for room in rooms], dtype=np.int64)
+        self.grid_cells = self.width * self.height
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.placed = np.zeros(n, dtype=bool)
+
+        # Rooms in the order they were put on the grid
+        self.placement_order: List[int] = []
+
+        # Dense adjacency weights plus the edge list in graph order, so that
+        # passes which walk edges keep their original tie-breaking
+        self.weights = np.zeros((n, n), dtype=np.float64)
+        edges = []
+        for u, v, weight in graph.edges(data="weight"):
+            self.weights[u, v] = self.weights[v, u] = weight
+            edges.append((u, v, weight))
+        self.edges = np.array(edges, dtype=np.int64).reshape(-1, 3)
+
+    @classmethod
+    def from_layout_result(cls, layout_result: Dict[str, Any]) -> "LayoutState":
+        """
+        Rebuild the placed state of a layout result.
+
+        Uses the stored "adjacency" edges; layouts saved without them get no edges.
+        """
+        edges = layout_result.get("adjacency") or []
+        graph = nx.Graph()
+        graph.add_nodes_from(range(len(layout_result["rooms"])))
+        graph.add_weighted_edges_from(edges)
+        state = cls(layout_result["rooms"], graph)
+        # Keep the stored edge order rather than the rebuilt graph's
+        state.edges = np.array(edges, dtype=np.int64).reshape(-1, 3)
+
+        for room_id, position in layout_result["room_positions"].items():
+            state.width[room_id] = position["width"]
+            state.height[room_id] = position["height"]
+            state.place(room_id, position["x"], position["y"])
+        state.grid_cells = state.width * state.height
+        return state
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def type_mask(self, *type_names: str) -> np.ndarray:
+        """Boolean mask of rooms whose type is one of `type_names`."""
+        codes = [self.type_names.index(t) for t in type_names if t in self.type_names]
+        return np.isin(self.type_code, codes)
+
+    def place(self, room_idx: int, x: int, y: int) -> None:
+        self.x[room_idx] = x
+        self.y[room_idx] = y
+        self.placed[room_idx] = True
+        self.placement_order.append(room_idx)
+
+    def to_room_positions(self, room_colors: Dict[str, str]) -> Dict[int, Dict[str, Any]]:
+        """Convert placed rooms to the `room_positions` dict used in layout results."""
+        return {
+            i: {
+                "id": i,
+                "name": self.names[i],
+                "type": self.types[i],
+                "x": int(self.x[i]),
+                "y": int(self.y[i]),
+                "width": int(self.width[i]),
+                "height": int(self.height[i]),
+                "color": room_colors.get(self.types[i], "#FFFFFF")
+            } for i in self.placement_order
+        }
+
+
+def extract_doors(grid: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Recover door metadata from a grid whose door cells are -1.
+
+    Only needed for layouts that were stored without their "doors" list. A door
+    sits on a vertical wall when its left and right neighbors are different
+    rooms, otherwise on a horizontal wall when its upper and lower neighbors are.
+    """
+    grid = np.asarray(grid)
+    ys, xs = np.nonzero(grid == -1)
+
+    # Zero padding stands in for "outside the grid"
+    padded = np.pad(grid, 1)
+    left, right = padded[ys + 1, xs], padded[ys + 1, xs + 2]
+    up, down = padded[ys, xs + 1], padded[ys + 2, xs + 1]
+
+    vertical = (left > 0) & (right > 0) & (left != right)
+    horizontal = ~vertical & (up > 0) & (down > 0) & (up != down)
+
+    # Grid values are room ID + 1
+    room_a = np.where(vertical, left, up) - 1
+    room_b = np.where(vertical, right, down) - 1
+
+    keep = vertical | horizontal
+    return [
+        {
+            "x": x,
+            "y": y,
+            "orientation": "vertical" if is_vertical else "horizontal",
+            "rooms": [a, b]
+        }
+        for x, y, is_vertical, a, b in zip(xs[keep].tolist(), ys[keep].tolist(), vertical[keep].tolist(),
+                                           room_a[keep].tolist(), room_b[keep].tolist())
+    ]
@@ -0,0 +1,152 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+
+class SummedAreaOccupancy:
+    """
+    Occupancy grid for the room placer backed by a summed-area table.
+
+    `sat[i, j]` holds the number of occupied cells in `grid[:i, :j]`, so the
+    occupied area of any w x h window is four lookups. Free-space masks are
+    computed for a whole room size in one NumPy pass and kept up to date as
+    rooms are placed, instead of slicing the grid for every candidate.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.grid = np.zeros((height, width), dtype=np.int64)
+        self.sat = np.zeros((height + 1, width + 1), dtype=np.int64)
+
+        # Cached "fits here" masks, keyed by (room_width, room_height)
+        self._fit_masks: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def fits_mask(self, room_width: int, room_height: int) -> np.ndarray:
+        """
+        Boolean mask of shape (height - room_height + 1, width - room_width + 1)
+        where mask[y, x] is True if a room of this size fits with its top-left
+        corner at (x, y).
+        """
+        key = (room_width, room_height)
+        mask = self._fit_masks.get(key)
+        if mask is None:
+            sat = self.sat
+            window = (sat[room_height:, room_width:]
+                      - sat[:-room_height, room_width:]
+                      - sat[room_height:, :-room_width]
+                      + sat[:-room_height, :-room_width])
+            mask = window == 0
+            self._fit_masks[key] = mask
+        return mask
+
+    def is_free(self, x: int, y: int, room_width: int, room_height: int) -> bool:
+        """Check whether a single w x h window is free."""
+        sat = self.sat
+        occupied = (sat[y + room_height, x + room_width] - sat[y, x + room_width]
+                    - sat[y + room_height, x] + sat[y, x])
+        return occupied == 0
+
+    def place(self, x: int, y: int, room_width: int, room_height: int, value: int = 1) -> None:
+        """Mark a w x h rectangle as occupied and update the table and masks."""
+        self.grid[y:y+room_height, x:x+room_width] = value
+
+        # A filled rectangle adds clip(i - y, 0, h) * clip(j - x, 0, w) to sat[i, j];
+        # only the region below and to the right of (x, y) changes.
+        rows = np.clip(np.arange(1, self.height - y + 1), 0, room_height)
+        cols = np.clip(np.arange(1, self.width - x + 1), 0, room_width)
+        self.sat[y+1:, x+1:] += np.outer(rows, cols)
+
+        # Any window overlapping the new rectangle no longer fits
+        for (mask_w, mask_h), mask in self._fit_masks.items():
+            x0 = max(0, x - mask_w + 1)
+            y0 = max(0, y - mask_h + 1)
+            mask[y0:y+room_height, x0:x+room_width] = False
+
+
+class BitsetOccupancy:
+    """
+    Occupancy grid stored as one Python int bitmask per row (bit x is cell x).
+
+    Checking whether a w x h room fits is h ANDs of the row masks against a
+    shifted w-bit span, and placing it is h ORs, with no array allocation. It
+    has the same interface as `SummedAreaOccupancy` (without room values, which
+    a bitmask cannot hold), plus `remove` for search code that backtracks.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.rows = [0] * height
+
+        # Cached per-row "fits here" bitmasks, keyed by (room_width, room_height)
+        self._fit_rows: Dict[Tuple[int, int], List[int]] = {}
+
+    def fit_rows(self, room_width: int, room_height: int) -> List[int]:
+        """
+        Bitmask form of `fits_mask`: bit x of entry y is set if a room of this
+        size fits with its top-left corner at (x, y).
+        """
+        key = (room_width, room_height)
+        fit = self._fit_rows.get(key)
+        if fit is None:
+            starts = (1 << max(0, self.width - room_width + 1)) - 1
+
+            # Per row: start positions whose w-cell run is free
+            free_runs = []
+            for row in self.rows:
+                blocked = 0
+                for k in range(room_width):
+                    blocked |= row >> k
+                free_runs.append(~blocked & starts)
+
+            # Per window: AND over h consecutive rows
+            fit = []
+            for y in range(self.height - room_height + 1):
+                mask = starts
+                for run in free_runs[y:y+room_height]:
+                    mask &= run
+                fit.append(mask)
+            self._fit_rows[key] = fit
+        return fit
+
+    def fits_mask(self, room_width: int, room_height: int) -> np.ndarray:
+        """Boolean mask with the same layout as `SummedAreaOccupancy.fits_mask`."""
+        fit = self.fit_rows(room_width, room_height)
+        cols = max(0, self.width - room_width + 1)
+        if not fit or not cols:
+            return np.zeros((len(fit), cols), dtype=bool)
+        nbytes = (cols + 7) // 8
+        data = np.frombuffer(b"".join(mask.to_bytes(nbytes, "little") for mask in fit), dtype=np.uint8)
+        bits = np.unpackbits(data.reshape(len(fit), nbytes), axis=1, bitorder="little")
+        return bits[:, :cols].astype(bool)
+
+    def is_free(self, x: int, y: int, room_width: int, room_height: int) -> bool:
+        """Check whether a single w x h window is free."""
+        span = ((1 << room_width) - 1) << x
+        for row in self.rows[y:y+room_height]:
+            if row & span:
+                return False
+        return True
+
+    def place(self, x: int, y: int, room_width: int, room_height: int, value: int = 1) -> None:
+        """Mark a w x h rectangle as occupied; `value` is accepted for interface compatibility."""
+        span = ((1 << room_width) - 1) << x
+        rows = self.rows
+        for i in range(y, y + room_height):
+            rows[i] |= span
+
+        # Any window overlapping the new rectangle no longer fits
+        for (mask_w, mask_h), fit in self._fit_rows.items():
+            x0 = max(0, x - mask_w + 1)
+            clear = ~(((1 << (x + room_width - x0)) - 1) << x0)
+            for i in range(max(0, y - mask_h + 1), min(len(fit), y + room_height)):
+                fit[i] &= clear
+
+    def remove(self, x: int, y: int, room_width: int, room_height: int) -> None:
+        """Clear a previously placed w x h rectangle."""
+        clear = ~(((1 << room_width) - 1) << x)
+        rows = self.rows
+        for i in range(y, y + room_height):
+            rows[i] &= clear
+        # Windows that become free are hard to patch in; recompute on demand
+        self._fit_rows.clear()
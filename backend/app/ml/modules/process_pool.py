@@ -0,0 +1,26 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+# Process pools for the layout modules, by worker count, reused across calls
+_pools: Dict[Optional[int], Tuple[int, ProcessPoolExecutor]] = {}
+_pools_lock = threading.Lock()
+
+
+def shared_pool(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    """The shared pool for `max_workers`, created on first use (and again in a forked child)."""
+    with _pools_lock:
+        pid, executor = _pools.get(max_workers, (None, None))
+        if executor is None or pid != os.getpid():
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+            _pools[max_workers] = (os.getpid(), executor)
+        return executor
+
+
+def discard_pool(max_workers: Optional[int], executor: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next call starts a new one."""
+    with _pools_lock:
+        if _pools.get(max_workers, (None, None))[1] is executor:
+            del _pools[max_workers]
+    executor.shutdown(wait=False, cancel_futures=True)
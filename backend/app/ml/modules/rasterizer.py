@@ -0,0 +1,221 @@
+import math
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Tuple, Any, Optional
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from .layout_state import extract_doors
+
+
+@lru_cache(maxsize=32)
+def _load_font(size: int) -> ImageFont.ImageFont:
+    """Bold TrueType font at the given pixel size, falling back to PIL's default font."""
+    for name in ("DejaVuSans-Bold.ttf", "arialbd.ttf", "Arial Bold.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+class LayoutRasterizer:
+    """
+    Draws layout results straight into a NumPy image buffer.
+
+    Rooms are filled and outlined with array slicing, door gaps are cut into the
+    walls the same way and only the labels go through `ImageDraw`. Images are
+    returned in memory; nothing touches pyplot or the disk.
+    """
+
+    _background = ImageColor.getrgb("#F5F5F5")
+
+    def __init__(self, max_size: int = 1024):
+        # Longest image side when no explicit size is requested
+        self.max_size = max_size
+
+    def render_controlnet_input(self, layout_result: Dict[str, Any],
+                                size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        Clean black & white layout for ControlNet: black walls, white rooms,
+        no doors, no labels, no colors. Returns a grayscale ("L") image.
+        """
+        grid_h, grid_w = np.shape(layout_result["grid"])
+        canvas, cell, origin = self._new_canvas(grid_w, grid_h, size, channels=1, background=255)
+        self._draw_controlnet_input(canvas, layout_result, cell, origin)
+        return Image.fromarray(canvas[:, :, 0])
+
+    def render_layout(self, layout_result: Dict[str, Any],
+                      size: Optional[Tuple[int, int]] = None,
+                      show_labels: bool = True) -> Image.Image:
+        """Colored layout with walls, door gaps and optional room labels. Returns an RGB image."""
+        grid_h, grid_w = np.shape(layout_result["grid"])
+        canvas, cell, origin = self._new_canvas(grid_w, grid_h, size, channels=3, background=self._background)
+        self._draw_layout(canvas, layout_result, cell, origin)
+
+        image = Image.fromarray(canvas)
+        if show_labels:
+            self._draw_labels(image, list(layout_result["room_positions"].values()), cell, origin)
+        return image
+
+    def update_controlnet_input(self, image: Image.Image, layout_result: Dict[str, Any],
+                                region: Tuple[int, int, int, int]) -> Image.Image:
+        """
+        Redraw only `region` (x0, y0, x1, y1 in grid cells) of a ControlNet input
+        rendered for a layout with the same grid shape. The result is pixel
+        identical to a full `render_controlnet_input` at the same size.
+        """
+        canvas = np.array(image)[:, :, None]
+        cell, origin = self._geometry(layout_result, image.size)
+        clip = self._region_box(region, cell, origin, canvas.shape)
+        self._fill_rect(canvas, clip, 255)
+        self._draw_controlnet_input(canvas, layout_result, cell, origin, clip)
+        return Image.fromarray(canvas[:, :, 0])
+
+    def update_layout(self, image: Image.Image, layout_result: Dict[str, Any],
+                      region: Tuple[int, int, int, int], show_labels: bool = True) -> Image.Image:
+        """Redraw only `region` of a `render_layout` image; see `update_controlnet_input`."""
+        canvas = np.array(image)
+        cell, origin = self._geometry(layout_result, image.size)
+        clip = self._region_box(region, cell, origin, canvas.shape)
+        self._fill_rect(canvas, clip, self._background)
+        self._draw_layout(canvas, layout_result, cell, origin, clip)
+
+        updated = Image.fromarray(canvas)
+        if show_labels:
+            # Labels are drawn on a copy and only the region is pasted back, so
+            # labels outside it are not drawn twice
+            labeled = updated.copy()
+            self._draw_labels(labeled, list(layout_result["room_positions"].values()), cell, origin)
+            updated.paste(labeled.crop(clip), clip[:2])
+        return updated
+
+    def _draw_controlnet_input(self, canvas: np.ndarray, layout_result: Dict[str, Any], cell: float,
+                               origin: Tuple[float, float], clip: Optional[Tuple[int, int, int, int]] = None) -> None:
+        rooms = list(layout_result["room_positions"].values())
+        wall = max(2, int(round(cell / 8)))
+        for room in rooms:
+            self._fill_rect(canvas, self._room_box(room, cell, origin), 255, clip)
+        for room in rooms:
+            self._outline_rect(canvas, self._room_box(room, cell, origin), wall, 0, clip)
+
+    def _draw_layout(self, canvas: np.ndarray, layout_result: Dict[str, Any], cell: float,
+                     origin: Tuple[float, float], clip: Optional[Tuple[int, int, int, int]] = None) -> None:
+        rooms = list(layout_result["room_positions"].values())
+        wall = max(2, int(round(cell / 12)))
+        for room in rooms:
+            self._fill_rect(canvas, self._room_box(room, cell, origin), ImageColor.getrgb(room["color"]), clip)
+        for room in rooms:
+            self._outline_rect(canvas, self._room_box(room, cell, origin), wall, (0, 0, 0), clip)
+
+        doors = layout_result.get("doors")
+        if doors is None:
+            doors = extract_doors(layout_result["grid"])
+        for door in doors:
+            self._cut_door(canvas, door, cell, origin, wall, clip)
+
+    def _new_canvas(self, grid_w: int, grid_h: int, size: Optional[Tuple[int, int]],
+                    channels: int, background) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+        """Allocate the image buffer; the layout is centered with a one-cell margin."""
+        if size is None:
+            cell = float(max(1, self.max_size // (max(grid_w, grid_h) + 2)))
+            size = (int(cell * (grid_w + 2)), int(cell * (grid_h + 2)))
+        else:
+            cell = min(size[0] / (grid_w + 2), size[1] / (grid_h + 2))
+
+        origin = ((size[0] - cell * grid_w) / 2, (size[1] - cell * grid_h) / 2)
+        canvas = np.empty((size[1], size[0], channels), dtype=np.uint8)
+        canvas[:] = background
+        return canvas, cell, origin
+
+    @staticmethod
+    def _geometry(layout_result: Dict[str, Any], size: Tuple[int, int]) -> Tuple[float, Tuple[float, float]]:
+        """Cell size and origin of an image of `size` rendered for this layout's grid."""
+        grid_h, grid_w = np.shape(layout_result["grid"])
+        cell = min(size[0] / (grid_w + 2), size[1] / (grid_h + 2))
+        return cell, ((size[0] - cell * grid_w) / 2, (size[1] - cell * grid_h) / 2)
+
+    @staticmethod
+    def _region_box(region: Tuple[int, int, int, int], cell: float, origin: Tuple[float, float],
+                    shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+        """Pixel box of a cell region, widened by half a cell so walls and door jambs are included."""
+        ox, oy = origin
+        x0, y0, x1, y1 = region
+        pad = cell / 2
+        return (max(0, int(ox + x0 * cell - pad)), max(0, int(oy + y0 * cell - pad)),
+                min(shape[1], int(math.ceil(ox + x1 * cell + pad))),
+                min(shape[0], int(math.ceil(oy + y1 * cell + pad))))
+
+    @staticmethod
+    def _room_box(room: Dict[str, Any], cell: float, origin: Tuple[float, float]) -> Tuple[int, int, int, int]:
+        """Pixel box (x0, y0, x1, y1) of a room."""
+        ox, oy = origin
+        return (int(round(ox + room["x"] * cell)),
+                int(round(oy + room["y"] * cell)),
+                int(round(ox + (room["x"] + room["width"]) * cell)),
+                int(round(oy + (room["y"] + room["height"]) * cell)))
+
+    @staticmethod
+    def _fill_rect(canvas: np.ndarray, box: Tuple[int, int, int, int], color,
+                   clip: Optional[Tuple[int, int, int, int]] = None) -> None:
+        x0, y0, x1, y1 = box
+        if clip is not None:
+            x0, y0 = max(x0, clip[0]), max(y0, clip[1])
+            x1, y1 = min(x1, clip[2]), min(y1, clip[3])
+        canvas[max(0, y0):max(0, y1), max(0, x0):max(0, x1)] = color
+
+    def _outline_rect(self, canvas: np.ndarray, box: Tuple[int, int, int, int], thickness: int, color,
+                      clip: Optional[Tuple[int, int, int, int]] = None) -> None:
+        """Draw a rectangle outline centered on the box edges."""
+        x0, y0, x1, y1 = box
+        lo, hi = thickness // 2, thickness - thickness // 2
+        self._fill_rect(canvas, (x0 - lo, y0 - lo, x1 + hi, y0 + hi), color, clip)  # top
+        self._fill_rect(canvas, (x0 - lo, y1 - lo, x1 + hi, y1 + hi), color, clip)  # bottom
+        self._fill_rect(canvas, (x0 - lo, y0 - lo, x0 + hi, y1 + hi), color, clip)  # left
+        self._fill_rect(canvas, (x1 - lo, y0 - lo, x1 + hi, y1 + hi), color, clip)  # right
+
+    def _cut_door(self, canvas: np.ndarray, door: Dict[str, Any], cell: float,
+                  origin: Tuple[float, float], wall: int,
+                  clip: Optional[Tuple[int, int, int, int]] = None) -> None:
+        """Open a gap in the wall on the door cell's leading edge and draw the jambs."""
+        ox, oy = origin
+        inset = max(1, int(round(cell * 0.15)))
+        lo, hi = wall // 2 + 1, wall - wall // 2 + 1
+        jamb = max(1, wall // 2)
+        if door["orientation"] == "vertical":
+            # Wall runs vertically along the left edge of the door cell
+            wx = int(round(ox + door["x"] * cell))
+            y0 = int(round(oy + door["y"] * cell)) + inset
+            y1 = int(round(oy + (door["y"] + 1) * cell)) - inset
+            self._fill_rect(canvas, (wx - lo, y0, wx + hi, y1), 255, clip)
+            self._fill_rect(canvas, (wx - lo, y0 - jamb, wx + hi, y0), 0, clip)
+            self._fill_rect(canvas, (wx - lo, y1, wx + hi, y1 + jamb), 0, clip)
+        else:
+            # Wall runs horizontally along the top edge of the door cell
+            wy = int(round(oy + door["y"] * cell))
+            x0 = int(round(ox + door["x"] * cell)) + inset
+            x1 = int(round(ox + (door["x"] + 1) * cell)) - inset
+            self._fill_rect(canvas, (x0, wy - lo, x1, wy + hi), 255, clip)
+            self._fill_rect(canvas, (x0 - jamb, wy - lo, x0, wy + hi), 0, clip)
+            self._fill_rect(canvas, (x1, wy - lo, x1 + jamb, wy + hi), 0, clip)
+
+    def _draw_labels(self, image: Image.Image, rooms: List[Dict[str, Any]], cell: float,
+                     origin: Tuple[float, float]) -> None:
+        draw = ImageDraw.Draw(image)
+        for room in rooms:
+            x0, y0, x1, y1 = self._room_box(room, cell, origin)
+            label = room["name"].upper()
+
+            # Shrink the font until the label fits inside the room
+            font_size = max(6, int(cell * 0.35))
+            font = _load_font(font_size)
+            while font_size > 6 and draw.textlength(label, font=font) > (x1 - x0) * 0.9:
+                font_size -= 1
+                font = _load_font(font_size)
+
+            left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+            text_x = (x0 + x1 - (right - left)) / 2 - left
+            text_y = (y0 + y1 - (bottom - top)) / 2 - top
+            draw.text((text_x, text_y), label, fill=(0, 0, 0), font=font)
@@ -0,0 +1,229 @@
+import math
+import time
+import random
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from .layout_state import LayoutState
+
+
+class LayoutRefiner:
+    """
+    Simulated-annealing refinement of a placed layout.
+
+    The energy is a sum of pair terms over weighted room pairs (a reward for
+    sharing a wall, a penalty proportional to center distance otherwise) plus a
+    bounding-box area term for compactness. Moves swap two rooms, slide one room
+    by a cell or rotate its dimensions. Each move is scored from the pair terms
+    of the rooms that moved and the bounding box only, so a move costs O(n)
+    array work regardless of how many edges the layout has.
+    """
+
+    def __init__(self,
+                 contact_reward: float = 15.0,
+                 distance_penalty: float = 0.5,
+                 area_weight: float = 1.0,
+                 initial_temperature: float = 50.0,
+                 final_temperature: float = 0.1):
+        self.contact_reward = contact_reward
+        self.distance_penalty = distance_penalty
+        self.area_weight = area_weight
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+
+    def refine(self, state: LayoutState, rng: random.Random,
+               iterations: int = 2000, time_budget: Optional[float] = None) -> Dict[str, float]:
+        """
+        Improve the placement of `state` in place.
+
+        Args:
+            state: Placed layout state; only placed rooms are moved
+            rng: Random stream for move selection and acceptance
+            iterations: Maximum number of proposed moves
+            time_budget: Optional wall-clock limit in seconds
+
+        Returns:
+            Energy before and after refinement, and the number of moves tried and accepted
+        """
+        movable = np.nonzero(state.placed)[0]
+        if len(movable) < 2 or iterations <= 0:
+            energy = self.energy(state) if len(movable) else 0.0
+            return {"initial_energy": energy, "final_energy": energy, "iterations": 0, "accepted": 0}
+
+        start = time.perf_counter()
+        energy = self.energy(state)
+        initial_energy = energy
+        best_energy = energy
+        best = self._snapshot(state)
+        cooling = (self.final_temperature / self.initial_temperature) ** (1.0 / iterations)
+        temperature = self.initial_temperature
+
+        accepted = 0
+        tried = 0
+        for tried in range(1, iterations + 1):
+            if time_budget is not None and time.perf_counter() - start >= time_budget:
+                break
+
+            move = self._propose(state, movable, rng)
+            if move is not None:
+                moved, new_rects = move
+                delta = self._move_delta(state, moved, new_rects)
+                if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                    self._apply(state, moved, new_rects)
+                    energy += delta
+                    accepted += 1
+                    if energy < best_energy - 1e-9:
+                        best_energy = energy
+                        best = self._snapshot(state)
+
+            temperature *= cooling
+
+        self._restore(state, best)
+
+        # Shift back so the layout starts at (0, 0)
+        placed = state.placed
+        state.x[placed] -= state.x[placed].min()
+        state.y[placed] -= state.y[placed].min()
+
+        return {"initial_energy": initial_energy, "final_energy": best_energy,
+                "iterations": tried, "accepted": accepted}
+
+    def energy(self, state: LayoutState) -> float:
+        """Full energy of the placed rooms."""
+        placed = np.nonzero(state.placed)[0]
+        pair_total = sum(self._room_terms(state, room, self._rect(state, room), placed).sum()
+                         for room in placed) / 2
+        rects = [self._rect(state, room) for room in placed]
+        return float(pair_total + self.area_weight * self._bbox_area(rects))
+
+    @staticmethod
+    def _rect(state: LayoutState, room: int) -> Tuple[int, int, int, int]:
+        return int(state.x[room]), int(state.y[room]), int(state.width[room]), int(state.height[room])
+
+    def _room_terms(self, state: LayoutState, room: int, rect: Tuple[int, int, int, int],
+                    others: np.ndarray) -> np.ndarray:
+        """Pair terms between `room` placed at `rect` and each room in `others`."""
+        x, y, w, h = rect
+        ox, oy = state.x[others], state.y[others]
+        ow, oh = state.width[others], state.height[others]
+        weights = state.weights[room, others]
+
+        overlap_y = (y < oy + oh) & (y + h > oy)
+        overlap_x = (x < ox + ow) & (x + w > ox)
+        touching = ((overlap_y & ((x + w == ox) | (ox + ow == x))) |
+                    (overlap_x & ((y + h == oy) | (oy + oh == y))))
+        distance = np.sqrt((x + w / 2 - (ox + ow / 2)) ** 2 + (y + h / 2 - (oy + oh / 2)) ** 2)
+
+        terms = weights * np.where(touching, -self.contact_reward, self.distance_penalty * distance)
+        terms[others == room] = 0.0
+        return terms
+
+    def _pair_term(self, weight: float, rect_a: Tuple[int, int, int, int],
+                   rect_b: Tuple[int, int, int, int]) -> float:
+        """Pair term between two rooms at the given rects."""
+        if not weight:
+            return 0.0
+        xa, ya, wa, ha = rect_a
+        xb, yb, wb, hb = rect_b
+        overlap_y = ya < yb + hb and ya + ha > yb
+        overlap_x = xa < xb + wb and xa + wa > xb
+        touching = ((overlap_y and (xa + wa == xb or xb + wb == xa)) or
+                    (overlap_x and (ya + ha == yb or yb + hb == ya)))
+        if touching:
+            return -weight * self.contact_reward
+        distance = math.hypot(xa + wa / 2 - (xb + wb / 2), ya + ha / 2 - (yb + hb / 2))
+        return weight * self.distance_penalty * distance
+
+    @staticmethod
+    def _bbox_area(rects) -> int:
+        x0 = min(x for x, _, _, _ in rects)
+        y0 = min(y for _, y, _, _ in rects)
+        x1 = max(x + w for x, _, w, _ in rects)
+        y1 = max(y + h for _, y, _, h in rects)
+        return (x1 - x0) * (y1 - y0)
+
+    def _propose(self, state: LayoutState, movable: np.ndarray, rng: random.Random):
+        """Pick a random move; returns (moved rooms, their new rects) or None if invalid."""
+        kind = rng.random()
+        if kind < 0.3:
+            # Swap the positions of two rooms
+            a, b = rng.sample(list(movable), 2)
+            moved = (int(a), int(b))
+            new_rects = ((int(state.x[b]), int(state.y[b]), int(state.width[a]), int(state.height[a])),
+                         (int(state.x[a]), int(state.y[a]), int(state.width[b]), int(state.height[b])))
+        elif kind < 0.85:
+            # Slide one room by a single cell
+            room = int(rng.choice(movable))
+            dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+            moved = (room,)
+            new_rects = ((int(state.x[room]) + dx, int(state.y[room]) + dy,
+                          int(state.width[room]), int(state.height[room])),)
+        else:
+            # Rotate one room's dimensions in place
+            room = int(rng.choice(movable))
+            if state.width[room] == state.height[room]:
+                return None
+            moved = (room,)
+            new_rects = ((int(state.x[room]), int(state.y[room]),
+                          int(state.height[room]), int(state.width[room])),)
+
+        if not self._is_free(state, moved, new_rects):
+            return None
+        return moved, new_rects
+
+    @staticmethod
+    def _is_free(state: LayoutState, moved: Tuple[int, ...], new_rects) -> bool:
+        """Check that the moved rooms overlap neither each other nor any other placed room."""
+        others = state.placed.copy()
+        others[list(moved)] = False
+        ox, oy = state.x[others], state.y[others]
+        ow, oh = state.width[others], state.height[others]
+        for x, y, w, h in new_rects:
+            if np.any((x < ox + ow) & (x + w > ox) & (y < oy + oh) & (y + h > oy)):
+                return False
+        if len(new_rects) == 2:
+            (x1, y1, w1, h1), (x2, y2, w2, h2) = new_rects
+            if x1 < x2 + w2 and x1 + w1 > x2 and y1 < y2 + h2 and y1 + h1 > y2:
+                return False
+        return True
+
+    def _move_delta(self, state: LayoutState, moved: Tuple[int, ...], new_rects) -> float:
+        """Energy change of a move, from the moved rooms' pair terms and the bounding box."""
+        placed = np.nonzero(state.placed)[0]
+        still = placed[~np.isin(placed, moved)]
+        old_rects = [self._rect(state, room) for room in moved]
+
+        # Pair terms between moved rooms and the rooms that stay put
+        before = sum(self._room_terms(state, room, rect, still).sum() for room, rect in zip(moved, old_rects))
+        after = sum(self._room_terms(state, room, rect, still).sum() for room, rect in zip(moved, new_rects))
+
+        # Pair term between the two rooms of a swap
+        if len(moved) == 2:
+            weight = state.weights[moved[0], moved[1]]
+            before += self._pair_term(weight, old_rects[0], old_rects[1])
+            after += self._pair_term(weight, new_rects[0], new_rects[1])
+
+        # Bounding box of the rooms that stay put, extended by the moved rooms
+        if len(still):
+            fixed = [(int(state.x[still].min()), int(state.y[still].min()),
+                      int((state.x[still] + state.width[still]).max() - state.x[still].min()),
+                      int((state.y[still] + state.height[still]).max() - state.y[still].min()))]
+        else:
+            fixed = []
+        area_delta = self._bbox_area(fixed + list(new_rects)) - self._bbox_area(fixed + old_rects)
+
+        return float(after - before + self.area_weight * area_delta)
+
+    @staticmethod
+    def _apply(state: LayoutState, moved: Tuple[int, ...], new_rects) -> None:
+        for room, (x, y, w, h) in zip(moved, new_rects):
+            state.x[room], state.y[room] = x, y
+            state.width[room], state.height[room] = w, h
+
+    @staticmethod
+    def _snapshot(state: LayoutState):
+        return state.x.copy(), state.y.copy(), state.width.copy(), state.height.copy()
+
+    @staticmethod
+    def _restore(state: LayoutState, snapshot) -> None:
+        state.x[:], state.y[:], state.width[:], state.height[:] = snapshot
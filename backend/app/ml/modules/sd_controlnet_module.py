@@ -1,10 +1,106 @@
 import torch
 import numpy as np
 from PIL import Image
-from diffusers import StableDiffusionControlNetPipeline, ControlNetModel, UniPCMultistepScheduler
+from diffusers import (StableDiffusionControlNetPipeline, ControlNetModel, UniPCMultistepScheduler,
+                       DPMSolverMultistepScheduler)
 from diffusers.utils import load_image
-from typing import Optional
+from typing import ClassVar, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+from contextlib import nullcontext
+from collections import OrderedDict
 import os
+import threading
+import json
+import struct
+
+
+# Schedulers selectable per render, built from the pipeline's scheduler config
+SCHEDULERS = {
+    "unipc": (UniPCMultistepScheduler, {}),
+    "dpmpp_2m_karras": (DPMSolverMultistepScheduler, {"use_karras_sigmas": True}),
+}
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    """Steps, resolution and scheduler of an SD render."""
+    name: str
+    num_inference_steps: int
+    width: int
+    height: int
+    scheduler: str = "unipc"
+
+
+QUALITY_TIERS = {
+    # Fast preview: UniPC converges in few steps, and 512 is SD 1.5's native size
+    "draft": QualityTier("draft", num_inference_steps=12, width=512, height=512),
+    "standard": QualityTier("standard", num_inference_steps=40, width=768, height=768),
+    "high": QualityTier("high", num_inference_steps=50, width=768, height=768, scheduler="dpmpp_2m_karras"),
+}
+
+
+class PromptEmbeddingCache:
+    """
+    LRU cache of CLIP text embeddings, keyed by the model identity (base
+    model, ControlNet, LoRA file, device and precision) and the prompt text.
+    One instance is shared by every module in the process, so re-creating a
+    module with the same weights keeps the embeddings.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], torch.Tensor]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, identity: str, text: str, encode) -> torch.Tensor:
+        key = (identity, text)
+        with self._lock:
+            embeds = self._entries.get(key)
+            if embeds is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embeds
+            self.misses += 1
+        embeds = encode(text)
+        with self._lock:
+            self._entries[key] = embeds
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embeds
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Shared by every StableDiffusionControlNetModule in the process
+prompt_embedding_cache = PromptEmbeddingCache()
+
+
+@dataclass
+class CPUInferenceProfile:
+    """
+    How to run the pipeline on CPU. `precision` is "fp32", "bf16" (bfloat16
+    autocast; fast on CPUs with AVX-512 BF16 or AMX) or "int8" (dynamic int8
+    quantization of the UNet and ControlNet linear layers, weights only).
+    `compile` wraps the UNet and ControlNet in `torch.compile`, which makes
+    the first render much slower. The thread counts apply to the whole process.
+    `channels_last` converts the conv-heavy models to channels-last layout,
+    which is faster but makes a private copy of their weights, so it is only
+    applied to models whose weights are not memory-mapped (see `mmap_weights`).
+    """
+    precision: str = "fp32"
+    channels_last: bool = False
+    compile: bool = False
+    num_threads: Optional[int] = None
+    num_interop_threads: Optional[int] = None
+
+    PRECISIONS: ClassVar[Tuple[str, ...]] = ("fp32", "bf16", "int8")
+
+    def __post_init__(self):
+        if self.precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown precision {self.precision!r} (expected one of {', '.join(self.PRECISIONS)})")
 
 
 class StableDiffusionControlNetModule:
@@ -12,17 +108,30 @@ class StableDiffusionControlNetModule:
                  sd_model_path: str = "runwayml/stable-diffusion-v1-5",
                  controlnet_model_path: str = "lllyasviel/sd-controlnet-scribble",
                  lora_path: Optional[str] = None,
-                 device: str = "cuda" if torch.cuda.is_available() else "cpu"):
+                 device: str = "cuda" if torch.cuda.is_available() else "cpu",
+                 mmap_weights: bool = True,
+                 cpu_profile: Optional[CPUInferenceProfile] = None,
+                 prompt_cache: Optional[PromptEmbeddingCache] = None):
         """
         Initialize the Stable Diffusion + ControlNet (+ LoRA) module.
+
+        With `mmap_weights` on CPU, the weights that are used as stored are
+        re-pointed at private memory maps of the safetensors files, so worker
+        processes on one host share a single page-cache copy of them.
+        `cpu_profile` tunes inference when running on CPU (default: plain
+        fp32). Prompt embeddings are cached in `prompt_cache`
+        (default: the process-wide `prompt_embedding_cache`).
         """
         self.device = device
         self.dtype = torch.float16 if device == "cuda" else torch.float32
+        self.cpu_profile = (cpu_profile or CPUInferenceProfile()) if device == "cpu" else None
 
         # Load ControlNet model
         controlnet = ControlNetModel.from_pretrained(
             controlnet_model_path,
-            torch_dtype=self.dtype
+            torch_dtype=self.dtype,
+            use_safetensors=True,
+            low_cpu_mem_usage=True
         ).to(self.device)
 
         # Load pipeline
@@ -30,13 +139,18 @@ class StableDiffusionControlNetModule:
             sd_model_path,
             controlnet=controlnet,
             torch_dtype=self.dtype,
+            use_safetensors=True,
+            low_cpu_mem_usage=True,
             safety_checker=None  # We'll handle safety checking manually
         ).to(self.device)
 
-        # Use a faster scheduler
-        self.pipeline.scheduler = UniPCMultistepScheduler.from_config(self.pipeline.scheduler.config)
+        # Use a faster scheduler by default; the others are picked per render
+        self.schedulers = {name: scheduler_class.from_config(self.pipeline.scheduler.config, **options)
+                           for name, (scheduler_class, options) in SCHEDULERS.items()}
+        self.pipeline.scheduler = self.schedulers["unipc"]
 
         # Load LoRA weights if provided
+        lora_fused = False
         if lora_path:
             print(f"Loading LoRA weights from {lora_path}")
             try:
@@ -47,11 +161,104 @@ class StableDiffusionControlNetModule:
                 # Cargar los pesos LoRA
                 self.pipeline.load_lora_weights(lora_path)
                 self.pipeline.fuse_lora()
+                lora_fused = True
                 print("LoRA loaded and fused successfully.")
             except Exception as e:
                 print(f"Warning: Could not load LoRA weights: {e}")
                 print("Continuing without LoRA weights.")
 
+        self.mapped_components: List[str] = []
+        if mmap_weights and self.device == "cpu":
+            self._map_weights(sd_model_path, controlnet_model_path, lora_fused=lora_fused)
+        if self.cpu_profile is not None:
+            self._apply_cpu_profile(self.cpu_profile)
+
+        self.prompt_cache = prompt_cache if prompt_cache is not None else prompt_embedding_cache
+        self.identity = _model_identity(sd_model_path, controlnet_model_path, lora_path if lora_fused else None,
+                                        self.device, self.precision)
+
+    @property
+    def precision(self) -> str:
+        """Compute precision: "fp16" on CUDA, else the CPU profile's."""
+        return "fp16" if self.cpu_profile is None else self.cpu_profile.precision
+
+    def _apply_cpu_profile(self, profile: CPUInferenceProfile) -> None:
+        if profile.num_threads:
+            torch.set_num_threads(profile.num_threads)
+        if profile.num_interop_threads:
+            try:
+                torch.set_num_interop_threads(profile.num_interop_threads)
+            except RuntimeError as e:
+                # Only possible before the first inter-op parallel work in the process
+                print(f"Warning: Could not set inter-op threads: {e}")
+
+        channels_last = []
+        if profile.channels_last:
+            # Converting a memory-mapped model would copy its weights out of the shared page cache
+            for name in ("unet", "controlnet", "vae"):
+                if name not in self.mapped_components:
+                    getattr(self.pipeline, name).to(memory_format=torch.channels_last)
+                    channels_last.append(name)
+
+        if profile.precision == "int8":
+            for module in (self.pipeline.unet, self.pipeline.controlnet):
+                torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+        if profile.compile:
+            self.pipeline.unet = torch.compile(self.pipeline.unet)
+            self.pipeline.controlnet = torch.compile(self.pipeline.controlnet)
+
+        print(f"CPU inference profile: {profile.precision}"
+              f"{', channels-last ' + '/'.join(channels_last) if channels_last else ''}"
+              f"{', compiled' if profile.compile else ''}, {torch.get_num_threads()} threads")
+
+    def _autocast(self):
+        if self.cpu_profile is None:
+            return torch.autocast(device_type=self.device, dtype=self.dtype)
+        if self.cpu_profile.precision == "bf16":
+            return torch.autocast(device_type="cpu", dtype=torch.bfloat16)
+        # fp32 autocast is a no-op on CPU, and int8 layers quantize their own inputs
+        return nullcontext()
+
+    def _map_weights(self, sd_model_path: str, controlnet_model_path: str, lora_fused: bool) -> None:
+        """
+        Replace the loaded copies of the weights with tensors backed by the
+        safetensors files. The UNet and text encoder are skipped when a LoRA
+        was fused into them, since their weights then differ from the files,
+        and so is any component whose file does not match it key for key.
+        """
+        components = [
+            ("controlnet", controlnet_model_path, "diffusion_pytorch_model.safetensors"),
+            ("vae", sd_model_path, "vae/diffusion_pytorch_model.safetensors"),
+        ]
+        if not lora_fused:
+            components += [
+                ("text_encoder", sd_model_path, "text_encoder/model.safetensors"),
+                ("unet", sd_model_path, "unet/diffusion_pytorch_model.safetensors"),
+            ]
+
+        for name, model_path, filename in components:
+            module = getattr(self.pipeline, name)
+            path = _resolve_weights_file(model_path, filename)
+            if path is None:
+                continue
+            try:
+                state_dict = load_safetensors_mmap(path)
+                if any(t.is_floating_point() and t.dtype != self.dtype for t in state_dict.values()):
+                    continue
+                expected = set(module.state_dict())
+                if set(state_dict) != expected:
+                    missing, unexpected = expected - set(state_dict), set(state_dict) - expected
+                    print(f"Warning: Not memory-mapping {path}: {len(missing)} missing and "
+                          f"{len(unexpected)} unexpected keys")
+                    continue
+                module.load_state_dict(state_dict, strict=True, assign=True)
+                self.mapped_components.append(name)
+            except Exception as e:
+                print(f"Warning: Could not memory-map {path}: {e}")
+        if self.mapped_components:
+            print(f"Memory-mapped weights: {', '.join(self.mapped_components)}")
+
     def generate_from_layout(self, 
                              layout_image: Image.Image,
                              prompt: str = "A black and white architectural floor plan, technical 2D blueprint drawing, no furniture, no textures, no colors, just walls and room labels, clean lines, top-down view.",
@@ -66,27 +273,138 @@ class StableDiffusionControlNetModule:
         Generate a refined floor plan following the layout structure.
         """
 
-        # Resize layout image to match SD input size
-        layout_image = layout_image.resize((width, height))
+        image = self.generate_batch(
+            [(layout_image, prompt, None)],
+            negative_prompt=negative_prompt,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            controlnet_conditioning_scale=controlnet_conditioning_scale,
+            width=width,
+            height=height
+        )[0]
+        image.save(output_path)
+        print(f"Saved generated floor plan to {output_path}")
+
+        return image
+
+    def generate_batch(self,
+                       items: Sequence[Tuple[Image.Image, str, Optional[int]]],
+                       negative_prompt: str = "blurry, distorted, messy, bad proportions",
+                       num_inference_steps: int = 50,
+                       guidance_scale: float = 5.0,
+                       controlnet_conditioning_scale: float = 1.0,
+                       width: int = 768,
+                       height: int = 768,
+                       num_images_per_prompt: int = 1,
+                       scheduler: str = "unipc") -> List[Image.Image]:
+        """
+        Generate floor plans for several (layout_image, prompt, seed) items in
+        one batched denoising pass. Returns `num_images_per_prompt` images per
+        item, grouped by item. A seed makes an item's images reproducible
+        (image i uses seed + i) regardless of what it is batched with; None
+        draws a random one. `scheduler` is a key of SCHEDULERS.
+        """
+        if scheduler not in self.schedulers:
+            raise ValueError(f"Unknown scheduler {scheduler!r} (expected one of {', '.join(self.schedulers)})")
+        self.pipeline.scheduler = self.schedulers[scheduler]
+
+        # Resize layout images to match SD input size, in RGB (ControlNet expects 3 channels)
+        layout_images = [layout_image.resize((width, height)).convert("RGB") for layout_image, _, _ in items]
+        generators = [self._generator(None if seed is None else seed + i)
+                      for _, _, seed in items
+                      for i in range(num_images_per_prompt)]
 
-        # Convert to RGB (ControlNet expects 3 channels)
-        layout_image = layout_image.convert("RGB")
+        # The prompts are nearly always the same few strings: reuse their embeddings
+        prompt_embeds = torch.cat([self.encode_prompt(prompt) for _, prompt, _ in items])
+        negative_prompt_embeds = self.encode_prompt(negative_prompt).expand(len(items), -1, -1)
 
         # Run pipeline
-        with torch.autocast(device_type=self.device, dtype=self.dtype):
+        with self._autocast():
             output = self.pipeline(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
-                image=layout_image,
+                prompt_embeds=prompt_embeds,
+                negative_prompt_embeds=negative_prompt_embeds,
+                image=layout_images,
                 num_inference_steps=num_inference_steps,
                 guidance_scale=guidance_scale,
                 controlnet_conditioning_scale=controlnet_conditioning_scale,
                 width=width,
-                height=height
+                height=height,
+                num_images_per_prompt=num_images_per_prompt,
+                generator=generators
             )
 
-        image = output.images[0]
-        image.save(output_path)
-        print(f"Saved generated floor plan to {output_path}")
+        return list(output.images)
+
+    def encode_prompt(self, text: str) -> torch.Tensor:
+        """CLIP embedding of `text` (batch of one), from the prompt cache when possible."""
+        def encode(text: str) -> torch.Tensor:
+            with torch.no_grad():
+                embeds, _ = self.pipeline.encode_prompt(text, self.device, num_images_per_prompt=1,
+                                                        do_classifier_free_guidance=False)
+            return embeds
+
+        return self.prompt_cache.get(self.identity, text, encode)
+
+    def _generator(self, seed: Optional[int]) -> torch.Generator:
+        generator = torch.Generator(device=self.device)
+        if seed is None:
+            generator.seed()
+        else:
+            generator.manual_seed(seed)
+        return generator
+
+
+def _model_identity(sd_model_path: str, controlnet_model_path: str, lora_path: Optional[str],
+                    device: str, precision: str) -> str:
+    """Identifies the weights behind an embedding; a changed LoRA file changes it."""
+    lora = "none"
+    if lora_path is not None:
+        stat = os.stat(lora_path)
+        lora = f"{lora_path}:{stat.st_size}:{stat.st_mtime_ns}"
+    return "|".join((sd_model_path, controlnet_model_path, lora, device, precision))
+
+
+_SAFETENSORS_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+
+def load_safetensors_mmap(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Read a safetensors file as tensors that view a private (copy-on-write)
+    memory map of it, instead of copies in process memory. Pages stay shared
+    with every other process mapping the same file until written to.
+    """
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    data_start = 8 + header_size
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    file_bytes = torch.empty(0, dtype=torch.uint8).set_(storage)
+
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        raw = file_bytes[data_start + begin:data_start + end]
+        if (data_start + begin) % torch.empty(0, dtype=dtype).element_size():
+            raw = raw.clone()  # misaligned for a view; fall back to a copy
+        tensors[name] = raw.view(dtype).reshape(info["shape"])
+    return tensors
+
 
-        return image
\ No newline at end of file
+def _resolve_weights_file(model_path: str, filename: str) -> Optional[str]:
+    """Local path of `filename` in a model directory or an already downloaded Hub repo."""
+    if os.path.isdir(model_path):
+        path = os.path.join(model_path, filename)
+        return path if os.path.isfile(path) else None
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return None
+    path = try_to_load_from_cache(model_path, filename)
+    return path if isinstance(path, str) else None
@@ -0,0 +1,108 @@
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class SharedWall(NamedTuple):
+    """
+    Wall segment shared by two rooms.
+
+    `first` is the room on the left (vertical wall) or on top (horizontal wall),
+    `coord` is the wall's x (vertical) or y (horizontal) grid line and the
+    overlap runs over [start, end) along the other axis.
+    """
+    first: int
+    second: int
+    orientation: str
+    coord: int
+    start: int
+    end: int
+
+
+class SharedWallIndex:
+    """
+    Index of every pair of placed rooms that share a wall.
+
+    Built with a sweep over room edges sorted by coordinate: rooms whose right
+    edge and rooms whose left edge lie on the same x line are merged by their
+    y intervals (and likewise for bottom/top edges on y lines). Rooms never
+    overlap, so the intervals on each side of a line are disjoint and the merge
+    is linear; the whole build is O(n log n + k) for k shared walls.
+    """
+
+    def __init__(self, room_ids: np.ndarray, xs: np.ndarray, ys: np.ndarray,
+                 widths: np.ndarray, heights: np.ndarray):
+        self._walls: Dict[Tuple[int, int], SharedWall] = {}
+        self._neighbors: Dict[int, List[int]] = {int(room): [] for room in room_ids}
+
+        room_ids = np.asarray(room_ids)
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        widths, heights = np.asarray(widths), np.asarray(heights)
+
+        # Vertical walls: right edges of one room against left edges of another
+        self._sweep(room_ids, xs + widths, xs, ys, ys + heights, "vertical")
+        # Horizontal walls: bottom edges against top edges
+        self._sweep(room_ids, ys + heights, ys, xs, xs + widths, "horizontal")
+
+    @classmethod
+    def from_state(cls, state) -> "SharedWallIndex":
+        """Index the placed rooms of a `LayoutState`."""
+        placed = np.nonzero(state.placed)[0]
+        return cls(placed, state.x[placed], state.y[placed], state.width[placed], state.height[placed])
+
+    def _sweep(self, room_ids: np.ndarray, closing: np.ndarray, opening: np.ndarray,
+               span_start: np.ndarray, span_end: np.ndarray, orientation: str) -> None:
+        # Sort both edge sets by (line, span start)
+        close_order = np.lexsort((span_start, closing))
+        open_order = np.lexsort((span_start, opening))
+
+        i, j = 0, 0
+        n = len(room_ids)
+        while i < n and j < n:
+            a, b = close_order[i], open_order[j]
+            line_a, line_b = closing[a], opening[b]
+            if line_a < line_b:
+                i += 1
+            elif line_b < line_a:
+                j += 1
+            else:
+                # Same grid line: intersect the two sorted runs of disjoint intervals
+                i_end = i
+                while i_end < n and closing[close_order[i_end]] == line_a:
+                    i_end += 1
+                j_end = j
+                while j_end < n and opening[open_order[j_end]] == line_a:
+                    j_end += 1
+
+                while i < i_end and j < j_end:
+                    a, b = close_order[i], open_order[j]
+                    start = max(span_start[a], span_start[b])
+                    end = min(span_end[a], span_end[b])
+                    if end > start:
+                        self._add(SharedWall(int(room_ids[a]), int(room_ids[b]), orientation,
+                                             int(line_a), int(start), int(end)))
+                    if span_end[a] <= span_end[b]:
+                        i += 1
+                    else:
+                        j += 1
+                i, j = i_end, j_end
+
+    def _add(self, wall: SharedWall) -> None:
+        self._walls[(wall.first, wall.second)] = wall
+        self._walls[(wall.second, wall.first)] = wall
+        self._neighbors[wall.first].append(wall.second)
+        self._neighbors[wall.second].append(wall.first)
+
+    def get(self, room_a: int, room_b: int) -> Optional[SharedWall]:
+        """Shared wall between two rooms, or None if they do not touch."""
+        return self._walls.get((room_a, room_b))
+
+    def neighbors(self, room: int) -> List[int]:
+        """Rooms sharing a wall with `room`."""
+        return self._neighbors.get(room, [])
+
+    def walls(self) -> List[SharedWall]:
+        """Every shared wall, once per room pair."""
+        return [wall for (a, b), wall in self._walls.items() if a == wall.first]
+
+    def __len__(self) -> int:
+        return len(self._walls) // 2
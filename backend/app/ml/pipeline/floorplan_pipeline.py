@@ -1,104 +1,190 @@
 import os
+import io
 import json
-import matplotlib.pyplot as plt
+import random
 from typing import Dict, Any, Optional, Union
 from PIL import Image, ImageDraw, ImageFont
 
 # Import our modules
 from ..modules.text_module import TextUnderstandingModule
 from ..modules.layout_module import LayoutGenerationModule
-from ..modules.sd_controlnet_module import StableDiffusionControlNetModule  # ✅ Usamos tu módulo corregido
+from ..modules.sd_controlnet_module import StableDiffusionControlNetModule, CPUInferenceProfile, QUALITY_TIERS  # ✅ Usamos tu módulo corregido
+from .layout_cache import LayoutCache, CacheEntry
+from .model_registry import ModelRegistry, model_registry
+from .micro_batcher import MicroBatcher
+from ...core.tracing import tracer
 
 
 class FloorPlanGenerator:
-    def __init__(self, use_stable_diffusion: bool = True):
+    SD_MODEL = "sd_controlnet"
+
+    def __init__(self, use_stable_diffusion: bool = True, cache: Optional[LayoutCache] = None,
+                 registry: Optional[ModelRegistry] = None, sd_batcher: Optional[MicroBatcher] = None,
+                 cpu_profile: Optional[CPUInferenceProfile] = None, pin_unseeded: bool = False):
         """
         Initialize the floor plan generator pipeline.
+        
+        Args:
+            use_stable_diffusion: Use the SD + ControlNet module for refined renders
+            cache: Optional cache for layouts and renders of repeated requirements
+            registry: Where the SD module is loaded, on first use or by a warm-up
+                (default: the process-wide `model_registry`, shared by all generators)
+            sd_batcher: Batches SD renders with those of other generators in the
+                process (see `make_sd_batcher`); required when several generators
+                render concurrently, since the SD pipeline is not thread-safe
+            cpu_profile: How the SD module runs when it is loaded on CPU
+            pin_unseeded: With a cache, derive the seed of unseeded requests from
+                the requirements, so a repeated prompt always returns the same
+                (cached) plan instead of a new one
         """
+        self.cache = cache
+        self.pin_unseeded = pin_unseeded
         self.text_module = TextUnderstandingModule()
         self.layout_module = LayoutGenerationModule()
 
         self.use_stable_diffusion = use_stable_diffusion
+        self.registry = registry if registry is not None else model_registry
+        self.sd_batcher = sd_batcher
         if self.use_stable_diffusion:
-            try:
-                # Obtener la ruta del directorio actual del pipeline
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                lora_path = os.path.join(current_dir, "..", "lora", "floorplan_lora_weights.safetensors")
-                
-                self.sd_module = StableDiffusionControlNetModule(
-                    lora_path=lora_path
-                )
-                print("✅ Stable Diffusion + ControlNet + LoRA module initialized successfully.")
-            except Exception as e:
-                print(f"Could not initialize Stable Diffusion ControlNet module: {e}")
-                print("Falling back to layout-only mode.")
-                self.use_stable_diffusion = False
+            # Obtener la ruta del directorio actual del pipeline
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            lora_path = os.path.join(current_dir, "..", "lora", "floorplan_lora_weights.safetensors")
+            self.registry.register(self.SD_MODEL, lambda: StableDiffusionControlNetModule(
+                lora_path=lora_path,
+                cpu_profile=cpu_profile
+            ))
 
         self.current_requirements = None
         self.current_layout = None
         self.current_controlnet_input_image = None
         self.current_labeled_layout_image = None
         self.current_sd_image = None
+        self.current_base_filename = None
+        self.current_seed = None
+        self.current_quality = "standard"
 
         os.makedirs("output", exist_ok=True)
         os.makedirs("output/images", exist_ok=True)
 
     def generate_from_prompt(self, prompt: str, 
                               output_path: Optional[str] = "output",
-                              generate_sd_image: Optional[bool] = None) -> Dict[str, Any]:
+                              generate_sd_image: Optional[bool] = None,
+                              seed: Optional[int] = None,
+                              quality: str = "standard") -> Dict[str, Any]:
+        """
+        Generate the layout, its renders and (optionally) the SD image for a prompt.
+
+        `quality` is a tier of QUALITY_TIERS (steps, resolution and scheduler of
+        the SD render). The seed used for both the layout and the SD noise is
+        returned as "seed": passing it back with another tier re-renders the
+        same layout, e.g. a "high" render of a "draft" preview.
+        """
+        if quality not in QUALITY_TIERS:
+            raise ValueError(f"Unknown quality tier {quality!r} (expected one of {', '.join(QUALITY_TIERS)})")
+        with tracer.span("generate_from_prompt", prompt_chars=len(prompt), quality=quality) as root:
+            result = self._generate_from_prompt(prompt, output_path, generate_sd_image, seed, quality)
+        result["timings"] = root.timings()
+        return result
+
+    def _generate_from_prompt(self, prompt: str, output_path: Optional[str],
+                              generate_sd_image: Optional[bool], seed: Optional[int],
+                              quality: str) -> Dict[str, Any]:
         print(f"Analyzing prompt: '{prompt}'")
 
-        self.current_requirements = self.text_module.parse_prompt(prompt)
-        report = self.text_module.generate_report(self.current_requirements)
+        with tracer.span("parse") as span:
+            self.current_requirements = self.text_module.parse_prompt(prompt)
+            report = self.text_module.generate_report(self.current_requirements)
+            span.set_attributes(rooms=sum(room.get("count", 1) for room in self.current_requirements["rooms"]),
+                                adjacency=len(self.current_requirements.get("adjacency", [])))
         print("\nRequirements Report:")
         print(report)
 
-        print("\nGenerating layout...")
-        self.current_layout = self.layout_module.generate_layout(self.current_requirements)
-
-        # ✅ Genera imagen limpia (binaria) para ControlNet
-        self.current_controlnet_input_image = self._save_controlnet_input_image("output/images/layout_for_controlnet.png")
-
-        # ✅ Genera imagen con labels para usuario
-        self.current_labeled_layout_image = self._save_labeled_layout_image("output/images/layout_with_labels.png")
-
         use_sd = self.use_stable_diffusion
         if generate_sd_image is not None:
             use_sd = generate_sd_image
-
         if use_sd:
-            print("\nGenerating ControlNet + LoRA floor plan...")
-            self.generate_sd_image()
+            use_sd = self._sd_available()
+
+        cache_key = None
+        cache_hit = False
+        self.current_sd_image = None
+        if seed is None and not (self.cache is not None and self.pin_unseeded):
+            # Pick the seed here rather than in the layout module, so it can be reported
+            seed = random.randrange(2 ** 31)
+        if self.cache is not None:
+            with tracer.span("cache_lookup") as span:
+                # Pinned: without an explicit seed, derive one from the requirements
+                # so that repeated prompts map to the same cache entry
+                if seed is None and self.pin_unseeded:
+                    seed = int(LayoutCache.make_key(self.current_requirements, 0)[:8], 16)
+                extra = {"sd": use_sd, "quality": quality} if use_sd else {"sd": use_sd}
+                cache_key = LayoutCache.make_key(self.current_requirements, seed, extra)
+                cache_hit = self._load_from_cache(cache_key)
+                span.set_attribute("hit", cache_hit)
+        self.current_seed = seed
+        self.current_quality = quality
+
+        if cache_hit:
+            print("\nLayout and renders loaded from cache.")
+        else:
+            print("\nGenerating layout...")
+            with tracer.span("layout", seed=seed) as span:
+                self.current_layout = self.layout_module.generate_layout(self.current_requirements, seed=seed)
+                span.set_attributes(rooms=len(self.current_layout["rooms"]),
+                                    grid_size=list(self.current_layout["grid_size"]),
+                                    doors=len(self.current_layout["doors"]))
+
+            # ✅ Genera imagen limpia (binaria) para ControlNet
+            with tracer.span("render.controlnet_input") as span:
+                self.current_controlnet_input_image = self._render_controlnet_input_image()
+                span.set_attribute("size", list(self.current_controlnet_input_image.size))
+
+            # ✅ Genera imagen con labels para usuario
+            with tracer.span("render.labeled_layout") as span:
+                self.current_labeled_layout_image = self._render_labeled_layout_image()
+                span.set_attribute("size", list(self.current_labeled_layout_image.size))
+
+            if use_sd:
+                print("\nGenerating ControlNet + LoRA floor plan...")
+                self.generate_sd_image(quality=quality, seed=seed)
+
+            if cache_key is not None:
+                with tracer.span("cache_store"):
+                    self._store_in_cache(cache_key)
+
+        base_filename = "_".join(prompt.split()[:5]).lower()
+        base_filename = ''.join(c if c.isalnum() or c == '_' else '_' for c in base_filename)
+        self.current_base_filename = base_filename
 
         output_files = {}
         if output_path:
-            base_filename = "_".join(prompt.split()[:5]).lower()
-            base_filename = ''.join(c if c.isalnum() or c == '_' else '_' for c in base_filename)
-
-            req_path = os.path.join(output_path, f"{base_filename}_requirements.json")
-            with open(req_path, 'w') as f:
-                json.dump(self.current_requirements, f, indent=2)
-            output_files["requirements_json"] = req_path
-
-            layout_path = os.path.join(output_path, f"{base_filename}_layout.json")
-            with open(layout_path, 'w') as f:
-                f.write(self.layout_module.generate_layout_json(self.current_layout))
-            output_files["layout_json"] = layout_path
-
-            # ✅ Guarda imagen CON labels
-            vis_path = os.path.join(output_path, "images", f"{base_filename}_floorplan_with_labels.png")
-            self.current_labeled_layout_image.save(vis_path)
-            output_files["visualization"] = vis_path
-
-            # ✅ Guarda imagen SIN puertas ni labels (para SD)
-            controlnet_vis_path = os.path.join(output_path, "images", f"{base_filename}_floorplan_for_controlnet.png")
-            self.current_controlnet_input_image.save(controlnet_vis_path)
-            output_files["controlnet_input_image"] = controlnet_vis_path
-
-            if self.current_sd_image:
-                sd_path = os.path.join(output_path, "images", f"{base_filename}_sd_floorplan.png")
-                self.current_sd_image.save(sd_path)
-                output_files["sd_image"] = sd_path
+            with tracer.span("write_outputs") as span:
+                req_path = os.path.join(output_path, f"{base_filename}_requirements.json")
+                with open(req_path, 'w') as f:
+                    json.dump(self.current_requirements, f, indent=2)
+                output_files["requirements_json"] = req_path
+
+                layout_path = os.path.join(output_path, f"{base_filename}_layout.json")
+                with open(layout_path, 'w') as f:
+                    self.layout_module.write_layout_json(self.current_layout, f)
+                output_files["layout_json"] = layout_path
+
+                # ✅ Guarda imagen CON labels
+                vis_path = os.path.join(output_path, "images", f"{base_filename}_floorplan_with_labels.png")
+                self.current_labeled_layout_image.save(vis_path)
+                output_files["visualization"] = vis_path
+
+                # ✅ Guarda imagen SIN puertas ni labels (para SD)
+                controlnet_vis_path = os.path.join(output_path, "images", f"{base_filename}_floorplan_for_controlnet.png")
+                self.current_controlnet_input_image.save(controlnet_vis_path)
+                output_files["controlnet_input_image"] = controlnet_vis_path
+
+                if self.current_sd_image:
+                    sd_path = os.path.join(output_path, "images", f"{base_filename}_sd_floorplan.png")
+                    self.current_sd_image.save(sd_path)
+                    output_files["sd_image"] = sd_path
+
+                span.set_attribute("files", len(output_files))
 
             print(f"\nOutputs saved to {output_path}:")
             for key, path in output_files.items():
@@ -108,32 +194,182 @@ class FloorPlanGenerator:
             "requirements": self.current_requirements,
             "layout": self.current_layout,
             "report": report,
-            "output_files": output_files
+            "output_files": output_files,
+            "cache_hit": cache_hit,
+            "seed": seed,
+            "quality": quality
+        }
+
+    def edit_layout(self, edit: Dict[str, Any],
+                    output_path: Optional[str] = "output",
+                    generate_sd_image: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Apply an edit (see `LayoutGenerationModule.edit_layout`) to the current layout.
+
+        Only the dirty region of the renders is redrawn, and the SD image is
+        regenerated only if the ControlNet input changed. Only changed artifacts
+        are written to `output_path`; "changed_artifacts" lists their keys so
+        callers can skip uploading the others.
+        """
+        if self.current_layout is None:
+            raise ValueError("No layout has been generated yet")
+
+        with tracer.span("edit_layout", op=edit.get("op")) as root:
+            result = self._edit_layout(edit, output_path, generate_sd_image)
+        result["timings"] = root.timings()
+        return result
+
+    def _edit_layout(self, edit: Dict[str, Any], output_path: Optional[str],
+                     generate_sd_image: Optional[bool]) -> Dict[str, Any]:
+        use_sd = self.use_stable_diffusion
+        if generate_sd_image is not None:
+            use_sd = generate_sd_image
+        if use_sd:
+            use_sd = self._sd_available()
+
+        with tracer.span("layout") as span:
+            self.current_layout = self.layout_module.edit_layout(self.current_layout, edit)
+            report = self.current_layout["edit"]
+            artifacts = report["artifacts"]
+            span.set_attributes(rooms=len(self.current_layout["rooms"]),
+                                grid_size=list(self.current_layout["grid_size"]),
+                                changed_rooms=len(report["changed_rooms"]),
+                                dirty_region=report["dirty_region"])
+
+        with tracer.span("render.controlnet_input"):
+            self.current_controlnet_input_image = self.layout_module.refresh_controlnet_input(
+                self.current_layout, self.current_controlnet_input_image)
+        with tracer.span("render.labeled_layout"):
+            self.current_labeled_layout_image = self.layout_module.refresh_visualization(
+                self.current_layout, self.current_labeled_layout_image)
+
+        changed = {
+            "layout_json": artifacts["layout"],
+            "visualization": artifacts["labeled_layout"],
+            "controlnet_input_image": artifacts["controlnet_input"],
+            "sd_image": use_sd and (artifacts["controlnet_input"] or self.current_sd_image is None)
         }
+        if changed["sd_image"]:
+            print("\nRegenerating ControlNet + LoRA floor plan...")
+            # Same tier and seed as the original render, so only the edited part changes much
+            self.generate_sd_image(quality=self.current_quality, seed=self.current_seed)
+
+        output_files = {}
+        if output_path:
+            with tracer.span("write_outputs") as span:
+                base_filename = self.current_base_filename or "edited"
+                paths = {
+                    "layout_json": os.path.join(output_path, f"{base_filename}_layout.json"),
+                    "visualization": os.path.join(output_path, "images", f"{base_filename}_floorplan_with_labels.png"),
+                    "controlnet_input_image": os.path.join(output_path, "images",
+                                                           f"{base_filename}_floorplan_for_controlnet.png"),
+                    "sd_image": os.path.join(output_path, "images", f"{base_filename}_sd_floorplan.png")
+                }
+                for key, path in paths.items():
+                    if not changed[key]:
+                        if os.path.exists(path):
+                            output_files[key] = path
+                        continue
+                    if key == "layout_json":
+                        with open(path, 'w') as f:
+                            self.layout_module.write_layout_json(self.current_layout, f)
+                    elif key == "visualization":
+                        self.current_labeled_layout_image.save(path)
+                    elif key == "controlnet_input_image":
+                        self.current_controlnet_input_image.save(path)
+                    elif self.current_sd_image is not None:
+                        self.current_sd_image.save(path)
+                    else:
+                        continue
+                    output_files[key] = path
+
+        return {
+            "requirements": self.current_requirements,
+            "layout": self.current_layout,
+            "edit": report,
+            "output_files": output_files,
+            "changed_artifacts": [key for key, was_changed in changed.items() if was_changed]
+        }
+
+    @classmethod
+    def make_sd_batcher(cls, registry: Optional[ModelRegistry] = None,
+                        max_batch_size: int = 4, max_wait_ms: float = 50.0) -> MicroBatcher:
+        """A micro-batcher running concurrent SD renders as one `generate_batch` pass."""
+        registry = registry if registry is not None else model_registry
 
-    def _save_controlnet_input_image(self, save_path: str) -> Image.Image:
+        def run_batch(params, items):
+            return registry.get(cls.SD_MODEL).generate_batch(items, **dict(params))
+
+        return MicroBatcher(run_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name="sd_batch")
+
+    @property
+    def sd_module(self) -> StableDiffusionControlNetModule:
+        """The shared SD + ControlNet module, loaded on first access."""
+        return self.registry.get(self.SD_MODEL)
+
+    def _sd_available(self) -> bool:
+        """Load the SD module if needed; fall back to layout-only mode if it cannot be loaded."""
+        if not self.use_stable_diffusion:
+            return False
+        try:
+            self.sd_module
+        except Exception as e:
+            print(f"Could not initialize Stable Diffusion ControlNet module: {e}")
+            print("Falling back to layout-only mode.")
+            self.use_stable_diffusion = False
+            return False
+        return True
+
+    def _load_from_cache(self, cache_key: str) -> bool:
+        """Restore layout and renders from the cache. Returns False on a miss."""
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return False
+
+        self.current_layout = self.layout_module.load_layout_json(entry.layout_json)
+
+        images = {name: Image.open(io.BytesIO(data)) for name, data in entry.images.items()}
+        self.current_controlnet_input_image = images["controlnet_input"]
+        self.current_labeled_layout_image = images["labeled_layout"]
+        self.current_sd_image = images.get("sd_image")
+        return True
+
+    def _store_in_cache(self, cache_key: str) -> None:
+        images = {
+            "controlnet_input": self.current_controlnet_input_image,
+            "labeled_layout": self.current_labeled_layout_image,
+        }
+        if self.current_sd_image is not None:
+            images["sd_image"] = self.current_sd_image
+
+        encoded = {}
+        for name, image in images.items():
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            encoded[name] = buffer.getvalue()
+
+        layout_json = self.layout_module.generate_layout_json(self.current_layout)
+        self.cache.put(cache_key, CacheEntry(layout_json=layout_json, images=encoded))
+
+    def _render_controlnet_input_image(self) -> Image.Image:
         """
-        ✅ Guarda la imagen limpia (blanco/negro) sin puertas ni texto para ControlNet.
+        ✅ Imagen limpia (blanco/negro) sin puertas ni texto para ControlNet, renderizada en memoria.
         """
         if self.current_layout is None:
             raise ValueError("No layout has been generated yet")
 
-        self.layout_module.generate_controlnet_input(self.current_layout, save_path=save_path)
-        layout_img = Image.open(save_path).convert("L")  # Convert to grayscale
-        return layout_img
+        return self.layout_module.generate_controlnet_input(self.current_layout)
 
-    def _save_labeled_layout_image(self, save_path: str) -> Image.Image:
+    def _render_labeled_layout_image(self) -> Image.Image:
         """
-        ✅ Guarda la imagen CON labels, colores y puertas para mostrar al usuario.
+        ✅ Imagen CON labels, colores y puertas para mostrar al usuario, renderizada en memoria.
         """
         if self.current_layout is None:
             raise ValueError("No layout has been generated yet")
 
-        self.layout_module.visualize_layout(self.current_layout, save_path=save_path, show_labels=True)
-        layout_img = Image.open(save_path)
-        return layout_img
+        return self.layout_module.visualize_layout(self.current_layout, show_labels=True)
 
-    def generate_layout_image(self) -> plt.Figure:
+    def generate_layout_image(self) -> Image.Image:
         if self.current_layout is None:
             raise ValueError("No layout has been generated yet")
 
@@ -141,8 +377,16 @@ class FloorPlanGenerator:
 
     def generate_sd_image(self, 
                           custom_prompt: Optional[str] = None, 
-                          width: int = 768, 
-                          height: int = 768) -> Image.Image:
+                          width: Optional[int] = None, 
+                          height: Optional[int] = None,
+                          quality: str = "standard",
+                          seed: Optional[int] = None) -> Image.Image:
+        """
+        Render the current layout with SD + ControlNet at the given quality tier
+        (`width`/`height` override the tier's resolution). With a seed, the
+        render is reproducible, also when batched with other requests.
+        """
+        tier = QUALITY_TIERS[quality]
         if not self.use_stable_diffusion:
             raise ValueError("Stable Diffusion is not enabled")
 
@@ -153,16 +397,25 @@ class FloorPlanGenerator:
             "2D architectural floor plan, black and white blueprint, clean lines, accurate room proportions, doors clearly marked, no furniture, no textures, no tiles, no duplicate rooms, top-down view, technical drawing, CAD style, precise, minimal, draw all doors"
         )
 
-        image = self.sd_module.generate_from_layout(
-            layout_image=self.current_controlnet_input_image,
-            prompt=prompt,
+        params = dict(
             negative_prompt="blurry, distorted, messy, bad proportions, duplicate rooms, duplicate labels, colorful, textured floor, 3D, perspective view, shadows, rendered, photorealistic, grass, tiles, carpet, wood floor, wrong room placement, wrong layout",
-            num_inference_steps=40,
+            num_inference_steps=tier.num_inference_steps,
             guidance_scale=9.5,
             controlnet_conditioning_scale=1.8,
-            width=width,
-            height=height
+            width=width or tier.width,
+            height=height or tier.height,
+            scheduler=tier.scheduler
         )
+        item = (self.current_controlnet_input_image, prompt, seed)
+        with tracer.span("sd_inference", quality=quality, steps=params["num_inference_steps"],
+                         width=params["width"], height=params["height"], scheduler=tier.scheduler,
+                         device=self.sd_module.device, batched=self.sd_batcher is not None):
+            if self.sd_batcher is not None:
+                # Renders with the same parameters can share a denoising pass
+                key = tuple(sorted(params.items()))
+                image = self.sd_batcher.submit(item, key).result()
+            else:
+                image = self.sd_module.generate_batch([item], **params)[0]
 
         self.current_sd_image = image
         return image
\ No newline at end of file
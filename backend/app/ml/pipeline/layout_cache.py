@@ -0,0 +1,209 @@
+import os
+import json
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+
+
+@dataclass
+class CacheEntry:
+    """Cached output of one pipeline run: the layout JSON and rendered PNGs by name."""
+    layout_json: str
+    images: Dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.layout_json.encode("utf-8")) + sum(len(data) for data in self.images.values())
+
+
+class LayoutCache:
+    """
+    Two-tier cache for generated layouts and renders.
+
+    Entries are keyed by a hash of the normalized requirements, the seed and the
+    render parameters (see `make_key`). The memory tier is an LRU bounded by
+    entry count; the optional disk tier stores one directory per key and evicts
+    the least recently used entries once it grows past `max_disk_bytes`.
+
+    The disk tier may be shared by several processes (the inference workers):
+    entries written by another process are picked up on lookup, a key stored
+    concurrently by two processes is kept once, and eviction rescans the
+    directory, so `max_disk_bytes` bounds the directory rather than each process.
+    """
+
+    def __init__(self,
+                 max_memory_entries: int = 128,
+                 disk_dir: Optional[str] = None,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.max_memory_entries = max_memory_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Disk index: key -> size in bytes, least recently used first
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(requirements: Dict[str, Any], seed: int,
+                 render_params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Canonical hash of the parsed requirements, seed and render parameters.
+
+        The original prompt text is left out, so prompts that parse to the same
+        requirements share an entry.
+        """
+        normalized = {k: v for k, v in requirements.items() if k != "original_prompt"}
+        payload = json.dumps(
+            {"requirements": normalized, "seed": seed, "render": render_params or {}},
+            sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+
+            entry = self._read_disk(key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._remember(key, entry)
+            if self.disk_dir:
+                self._write_disk(key, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": sum(self._disk_index.values()),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            for key in list(self._disk_index):
+                self._remove_disk(key)
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key)
+
+    def _load_disk_index(self) -> None:
+        """(Re)build the index from the directory, least recently used first."""
+        entries = []
+        for key in os.listdir(self.disk_dir):
+            path = self._entry_dir(key)
+            if key.endswith(".tmp") or not os.path.isfile(os.path.join(path, "layout.json")):
+                continue
+            try:
+                entries.append((os.path.getmtime(path), key, self._entry_size(path)))
+            except OSError:
+                continue  # removed by another process meanwhile
+        self._disk_index.clear()
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+
+    @staticmethod
+    def _entry_size(path: str) -> int:
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+    def _read_disk(self, key: str) -> Optional[CacheEntry]:
+        if not self.disk_dir:
+            return None
+        path = self._entry_dir(key)
+        if key not in self._disk_index:
+            # Possibly stored by another process since the index was built
+            if not os.path.isfile(os.path.join(path, "layout.json")):
+                return None
+            try:
+                self._disk_index[key] = self._entry_size(path)
+            except OSError:
+                return None
+        try:
+            with open(os.path.join(path, "layout.json"), "r") as f:
+                layout_json = f.read()
+            images = {}
+            for name in os.listdir(path):
+                if name.endswith(".png"):
+                    with open(os.path.join(path, name), "rb") as f:
+                        images[name[:-len(".png")]] = f.read()
+        except OSError:
+            self._disk_index.pop(key, None)
+            return None
+
+        # Touch so the on-disk order survives restarts
+        os.utime(path, None)
+        self._disk_index.move_to_end(key)
+        return CacheEntry(layout_json=layout_json, images=images)
+
+    def _write_disk(self, key: str, entry: CacheEntry) -> None:
+        path = self._entry_dir(key)
+        if os.path.isfile(os.path.join(path, "layout.json")):
+            # Already stored (e.g. by another worker): entries for a key are interchangeable
+            os.utime(path, None)
+            self._disk_index[key] = entry.size
+            self._disk_index.move_to_end(key)
+            return
+
+        # Per-process temp dir, as several worker processes may share the disk tier
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, "layout.json"), "w") as f:
+            f.write(entry.layout_json)
+        for name, data in entry.images.items():
+            with open(os.path.join(tmp_path, f"{name}.png"), "wb") as f:
+                f.write(data)
+
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # Another process stored the same key in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        # Size-based eviction over the whole directory, least recently used first
+        self._load_disk_index()
+        total = sum(self._disk_index.values())
+        while total > self.max_disk_bytes and len(self._disk_index) > 1:
+            oldest = next(iter(self._disk_index))
+            total -= self._disk_index[oldest]
+            self._remove_disk(oldest)
+
+    def _remove_disk(self, key: str) -> None:
+        self._disk_index.pop(key, None)
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
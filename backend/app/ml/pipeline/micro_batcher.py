@@ -0,0 +1,77 @@
+import time
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from ...core.tracing import tracer
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent calls into batches for a function that is cheaper per
+    item when run on several at once (e.g. one batched denoising pass).
+
+    `submit(item, key)` returns a future. Items with the same key can share a
+    batch. A batch runs as soon as it has `max_batch_size` items or its oldest
+    item has waited `max_wait_ms` (full batches first, then by age), as
+    `run_batch(key, items)`, which returns one result per item in order. If it
+    raises, every item of the batch fails with that error. Batches run one at a
+    time on the batcher's thread, so the function is never called concurrently.
+    """
+
+    def __init__(self, run_batch: Callable[[Hashable, List[Any]], Sequence[Any]],
+                 max_batch_size: int = 4, max_wait_ms: float = 50.0, name: str = "micro_batch"):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+
+        # key -> [(item, future, enqueued at)]
+        self._pending: Dict[Hashable, List[Tuple[Any, Future, float]]] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, item: Any, key: Hashable = None) -> Future:
+        future: Future = Future()
+        with self._condition:
+            self._pending.setdefault(key, []).append((item, future, time.monotonic()))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def _loop(self) -> None:
+        while True:
+            key, batch = self._next_batch()
+            try:
+                with tracer.span(self.name, batch_size=len(batch)):
+                    results = list(self.run_batch(key, [item for item, _, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: expected {len(batch)} results, got {len(results)}")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _next_batch(self) -> Tuple[Hashable, List[Tuple[Any, Future, float]]]:
+        with self._condition:
+            while True:
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                full = [key for key, waiting in self._pending.items() if len(waiting) >= self.max_batch_size]
+                key, waiting = min(self._pending.items(), key=lambda pending: pending[1][0][2])
+                remaining = waiting[0][2] + self.max_wait - time.monotonic()
+                if full or remaining <= 0:
+                    key = full[0] if full and remaining > 0 else key
+                    waiting = self._pending[key]
+                    batch, rest = waiting[:self.max_batch_size], waiting[self.max_batch_size:]
+                    if rest:
+                        self._pending[key] = rest
+                    else:
+                        del self._pending[key]
+                    return key, batch
+                self._condition.wait(remaining)
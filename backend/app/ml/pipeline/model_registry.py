@@ -0,0 +1,113 @@
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from ...core.tracing import tracer
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.state = NOT_LOADED
+        self.model: Any = None
+        self.error: Optional[BaseException] = None
+        self.load_seconds: Optional[float] = None
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of heavy models, loaded once on first use.
+
+    Loaders are registered by name and only run when the model is first
+    requested with `get` or by `warm_up`, which loads in a background thread so
+    the caller (e.g. a worker process starting up) is not blocked. Concurrent
+    `get` calls wait for the one load in progress. A failed load is remembered
+    and re-raised instead of being retried on every request. `status` reports
+    the state of every model for readiness checks.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        """Register a loader; a name that is already registered keeps its loader and model."""
+        with self._lock:
+            self._entries.setdefault(name, _Entry(loader))
+
+    def get(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"No model registered as {name!r}")
+        if entry.state == READY:
+            return entry.model
+        with entry.lock:
+            if entry.state == FAILED:
+                raise RuntimeError(f"Model {name!r} failed to load: {entry.error}") from entry.error
+            if entry.state != READY:
+                self._load(name, entry)
+        if entry.state == FAILED:
+            raise RuntimeError(f"Model {name!r} failed to load: {entry.error}") from entry.error
+        return entry.model
+
+    def is_ready(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.state == READY
+
+    def warm_up(self, names: Optional[Iterable[str]] = None,
+                on_done: Optional[Callable[[Dict[str, Dict[str, Any]]], None]] = None) -> threading.Thread:
+        """Load the given (default: all) models in a background thread, then call `on_done(status)`."""
+        names = list(self._entries) if names is None else list(names)
+        for name in names:
+            entry = self._entries[name]
+            if entry.state == NOT_LOADED:
+                entry.state = LOADING
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # recorded in the entry's status
+            if on_done is not None:
+                on_done(self.status())
+
+        thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        status = {}
+        for name, entry in list(self._entries.items()):
+            info: Dict[str, Any] = {"state": entry.state, "load_seconds": entry.load_seconds}
+            if entry.error is not None:
+                info["error"] = str(entry.error)
+            for attribute in ("device", "dtype", "precision"):
+                if entry.model is not None and hasattr(entry.model, attribute):
+                    info[attribute] = str(getattr(entry.model, attribute)).replace("torch.", "")
+            status[name] = info
+        return status
+
+    @staticmethod
+    def _load(name: str, entry: _Entry) -> None:
+        entry.state = LOADING
+        start = time.perf_counter()
+        try:
+            with tracer.span("model_load", model=name):
+                entry.model = entry.loader()
+        except Exception as e:
+            entry.error = e
+            entry.state = FAILED
+        else:
+            entry.state = READY
+        entry.load_seconds = time.perf_counter() - start
+
+
+# Shared by every pipeline in the process
+model_registry = ModelRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -7,10 +7,16 @@ class Generation(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     prompt = Column(Text, nullable=False)
-    layout_image_url = Column(String(255), nullable=False)
+    # Null until the generation job has finished
+    layout_image_url = Column(String(255), nullable=True)
     sd_image_url = Column(String(255), nullable=True)
+    # queued -> running -> success | failed
     status = Column(String(50), nullable=False, default="success")
     error_message = Column(Text, nullable=True)
+    # SD quality tier (draft/standard/high), and the seed of the layout and SD
+    # render (chosen by the pipeline unless requested), to re-render at another tier
+    quality = Column(String(20), nullable=False, default="standard")
+    seed = Column(BigInteger, nullable=True)
     created_at = Column(DateTime, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
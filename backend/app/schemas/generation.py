@@ -1,26 +1,40 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class GenerationBase(BaseModel):
-    layout_image_url: str
+    layout_image_url: Optional[str] = None
     sd_image_url: Optional[str] = None
     prompt: Optional[str] = None
 
 class GenerationCreate(GenerationBase):
     user_id: int
 
+QualityTier = Literal["draft", "standard", "high"]
+
 class GenerationRequest(BaseModel):
     prompt: str = Field(..., description="The prompt to generate the floor plan from")
+    quality: QualityTier = Field("standard", description="SD render tier: draft (fast 512px preview), standard or high")
+    seed: Optional[int] = Field(None, ge=0, description="Seed for the layout and SD render; pass the seed of a "
+                                                        "previous generation to re-render it at another tier")
+
+class RefineRequest(BaseModel):
+    quality: QualityTier = Field("high", description="Tier to re-render the generation at")
 
 class GenerationResponse(BaseModel):
     id: int = Field(..., description="Unique identifier for the generation")
     prompt: str = Field(..., description="The prompt used for generation")
-    layout_image_url: str = Field(..., description="URL to the layout image in GCS")
+    layout_image_url: Optional[str] = Field(None, description="URL to the layout image in GCS")
     sd_image_url: Optional[str] = Field(None, description="URL to the SD image in GCS")
     created_at: datetime = Field(..., description="When the generation was created")
-    status: str = Field(..., description="Status of the generation (success/failed)")
+    status: str = Field(..., description="Status of the generation (queued/running/success/failed)")
     error_message: Optional[str] = Field(None, description="Error message if generation failed")
+    quality: str = Field("standard", description="SD render tier")
+    seed: Optional[int] = Field(None, description="Seed used, once the generation has run")
+
+class GenerationJobResponse(GenerationResponse):
+    stage: Optional[str] = Field(None, description="Pipeline stage currently running, while the job is running")
+    events_url: str = Field(..., description="Server-sent events stream with stage-by-stage progress")
 
 class GenerationOut(GenerationBase):
     id: int
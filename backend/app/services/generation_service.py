@@ -1,28 +1,51 @@
 from sqlalchemy.orm import Session
-from app.ml.pipeline.floorplan_pipeline import FloorPlanGenerator
-from app.core.gcs import upload_to_gcs
+from app.core.config import settings
+from app.core import metrics
 from app.db import crud
-from app.schemas.generation import GenerationResponse
+from app.db.session import SessionLocal
+from app.schemas.generation import GenerationResponse, GenerationJobResponse
+from app.services.job_service import GenerationJobManager
+from app.services.worker_pool import InferenceWorkerPool
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
-generator = FloorPlanGenerator(use_stable_diffusion=True)
 
-def generate_floorplan(db: Session, user_id: int, prompt: str) -> GenerationResponse:
+# Every worker process builds its own pipeline (and loads the models); see InferenceWorkerPool
+worker_pool = InferenceWorkerPool(
+    workers=settings.GENERATION_WORKERS,
+    max_queue=settings.GENERATION_QUEUE_SIZE,
+    max_rss_mb=settings.GENERATION_WORKER_MAX_RSS_MB,
+    warm_up=settings.GENERATION_WARM_UP,
+    threads=settings.GENERATION_WORKER_THREADS
+)
+job_manager = GenerationJobManager(worker_pool, SessionLocal, history=settings.GENERATION_JOB_HISTORY)
+
+metrics.GENERATIONS_IN_FLIGHT.set_function(worker_pool.running_count)
+metrics.GENERATION_QUEUE_DEPTH.set_function(worker_pool.queued_count)
+
+def _cache_lookups():
+    stats = worker_pool.cache_stats()
+    return {"memory_hit": stats["memory_hits"], "disk_hit": stats["disk_hits"], "miss": stats["misses"]}
+
+def _cache_hit_ratio():
+    stats = worker_pool.cache_stats()
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    return (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+
+metrics.LAYOUT_CACHE_LOOKUPS.set_function(_cache_lookups)
+metrics.LAYOUT_CACHE_HIT_RATIO.set_function(_cache_hit_ratio)
+
+def generate_floorplan(db: Session, user_id: int, prompt: str, quality: str = "standard",
+                       seed: Optional[int] = None) -> GenerationResponse:
     if not prompt or len(prompt.strip()) == 0:
         raise ValueError("Prompt cannot be empty")
 
     logger.info(f"🚀 Generating floor plan for user {user_id} with prompt: {prompt}")
-    result = generator.generate_from_prompt(prompt)
-
-    # Subir imágenes a GCS
-    layout_url = upload_to_gcs(result["output_files"]["visualization"])
-    sd_url = None
-    if "sd_image" in result["output_files"]:
-        sd_url = upload_to_gcs(result["output_files"]["sd_image"])
+    layout_url, sd_url, seed = worker_pool.submit(user_id, prompt, quality=quality, seed=seed).result()
 
     # Guardar en base de datos
-    generation = crud.save_generation_to_db(db, user_id, prompt, layout_url, sd_url)
+    generation = crud.save_generation_to_db(db, user_id, prompt, layout_url, sd_url, quality, seed)
 
     logger.info(f"✅ Floor plan generated and saved (id={generation.id})")
 
@@ -33,7 +56,46 @@ def generate_floorplan(db: Session, user_id: int, prompt: str) -> GenerationResp
         sd_image_url=sd_url,
         created_at=generation.created_at,
         status=generation.status,
-        error_message=generation.error_message
+        error_message=generation.error_message,
+        quality=generation.quality,
+        seed=generation.seed
+    )
+
+def enqueue_floorplan(db: Session, user_id: int, prompt: str, quality: str = "standard",
+                      seed: Optional[int] = None) -> GenerationJobResponse:
+    generation = job_manager.submit(db, user_id, prompt, quality, seed)
+    return _job_response(generation)
+
+def refine_floorplan(db: Session, user_id: int, generation_id: int,
+                     quality: str = "high") -> Optional[GenerationJobResponse]:
+    """Queue a new generation with the prompt and seed of a finished one, at another quality tier."""
+    source = crud.get_generation(db, generation_id)
+    if source is None or source.user_id != user_id:
+        return None
+    if source.seed is None:
+        raise ValueError("The generation has not finished yet, so its seed is not known")
+    return enqueue_floorplan(db, user_id, source.prompt, quality, source.seed)
+
+def get_floorplan_job(db: Session, user_id: int, generation_id: int) -> Optional[GenerationJobResponse]:
+    generation = crud.get_generation(db, generation_id)
+    if generation is None or generation.user_id != user_id:
+        return None
+    return _job_response(generation)
+
+def _job_response(generation) -> GenerationJobResponse:
+    state = job_manager.get_state(generation.id)
+    return GenerationJobResponse(
+        id=generation.id,
+        prompt=generation.prompt,
+        layout_image_url=generation.layout_image_url,
+        sd_image_url=generation.sd_image_url,
+        created_at=generation.created_at,
+        status=generation.status,
+        error_message=generation.error_message,
+        quality=generation.quality,
+        seed=generation.seed,
+        stage=state.stage if state is not None and generation.status == "running" else None,
+        events_url=f"{settings.API_V1_STR}/generate/jobs/{generation.id}/events"
     )
 
 def get_all_floorplans(db: Session, page: int = 1, limit: int = 10):
@@ -48,7 +110,9 @@ def get_all_floorplans(db: Session, page: int = 1, limit: int = 10):
             sd_image_url=g.sd_image_url,
             created_at=g.created_at,
             status=g.status,
-            error_message=g.error_message
+            error_message=g.error_message,
+            quality=g.quality,
+            seed=g.seed
         )
         for g in generations
     ]
@@ -0,0 +1,147 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db import crud
+from app.models.generation import Generation
+from app.services.worker_pool import InferenceWorkerPool, WorkerPoolUnavailable
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("success", "failed")
+
+
+@dataclass
+class JobState:
+    """In-memory progress of one generation job; the status of record is the Generation row."""
+    generation_id: int
+    status: str = "queued"
+    stage: Optional[str] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class GenerationJobManager:
+    """
+    Tracks generation jobs run by an `InferenceWorkerPool`.
+
+    `submit` stores a Generation row in the "queued" state and returns at once
+    (or raises `WorkerPoolSaturated` when the pool's queue is full). When a
+    worker picks the job up it is marked "running", and when it finishes
+    "success" with the image URLs or "failed" with the error message. Jobs cut
+    short by a shutdown go back to "queued" and are re-run by `start`. Every
+    pipeline span start/end inside the job is recorded as a progress event, so
+    clients can follow it stage by stage. Events of the last `history`
+    finished jobs are kept in memory.
+    """
+
+    def __init__(self, pool: InferenceWorkerPool, session_factory: Callable[[], Session], history: int = 1000):
+        self.pool = pool
+        self.session_factory = session_factory
+        self.history = history
+
+        self._jobs: "OrderedDict[int, JobState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the pool and pick up jobs left over from a previous run."""
+        self.pool.start()
+        db = self.session_factory()
+        try:
+            for generation in db.query(Generation).filter(Generation.status.in_(("queued", "running"))):
+                if generation.status == "running":
+                    crud.update_generation_status(db, generation.id, "failed",
+                                                  error_message="Interrupted by a server restart")
+                else:
+                    self._run(generation.id, generation.user_id, generation.prompt, generation.quality,
+                              generation.seed, force=True)
+        finally:
+            db.close()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self.pool.stop(timeout)
+
+    def submit(self, db: Session, user_id: int, prompt: str, quality: str = "standard",
+               seed: Optional[int] = None) -> Generation:
+        if not prompt or len(prompt.strip()) == 0:
+            raise ValueError("Prompt cannot be empty")
+        # Refuse before creating the row; a race past this check only overfills the queue slightly
+        self.pool.ensure_capacity()
+        generation = crud.create_generation_job(db, user_id, prompt, quality, seed)
+        self._run(generation.id, user_id, prompt, quality, seed, force=True)
+        logger.info(f"📥 Queued {quality} generation {generation.id} for user {user_id}")
+        return generation
+
+    def get_state(self, generation_id: int) -> Optional[JobState]:
+        return self._jobs.get(generation_id)
+
+    def events_since(self, generation_id: int, index: int) -> List[Dict[str, Any]]:
+        state = self._jobs.get(generation_id)
+        if state is None:
+            return []
+        with self._lock:
+            return state.events[index:]
+
+    def _run(self, generation_id: int, user_id: int, prompt: str, quality: str, seed: Optional[int],
+             force: bool = False) -> None:
+        with self._lock:
+            self._jobs[generation_id] = JobState(generation_id)
+            self._forget_finished()
+        self._publish(generation_id, status="queued")
+
+        def on_event(event: Dict[str, Any]) -> None:
+            if event.get("status") == "running":
+                self._update(generation_id, "running")
+            self._publish(generation_id, **event)
+
+        future = self.pool.submit(user_id, prompt, on_event, force=force, quality=quality, seed=seed)
+        future.add_done_callback(lambda f: self._finish(generation_id, f))
+
+    def _finish(self, generation_id: int, future: Future) -> None:
+        error = future.exception()
+        if isinstance(error, WorkerPoolUnavailable):
+            # Shut down before the job finished: keep it queued so the next start() re-runs it
+            logger.info(f"⏸️ Generation {generation_id} left queued for the next start")
+            self._update(generation_id, "queued")
+            self._publish(generation_id, status="queued")
+            return
+        if error is not None:
+            logger.error(f"❌ Generation {generation_id} failed: {error}")
+            self._update(generation_id, "failed", error_message=str(error))
+            self._publish(generation_id, status="failed", error_message=str(error))
+            return
+        layout_url, sd_url, seed = future.result()
+        self._update(generation_id, "success", layout_url=layout_url, sd_url=sd_url, seed=seed)
+        self._publish(generation_id, status="success", layout_image_url=layout_url, sd_image_url=sd_url,
+                      seed=seed)
+
+    def _update(self, generation_id: int, status: str, **fields: Any) -> None:
+        db = self.session_factory()
+        try:
+            crud.update_generation_status(db, generation_id, status, **fields)
+        except Exception:
+            logger.exception(f"Could not store status {status!r} for generation {generation_id}")
+        finally:
+            db.close()
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, state in self._jobs.items() if state.status in TERMINAL_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _publish(self, generation_id: int, **event: Any) -> None:
+        state = self._jobs.get(generation_id)
+        if state is None:
+            return
+        with self._lock:
+            if "status" in event:
+                state.status = event["status"]
+            if event.get("event") == "start":
+                state.stage = event["stage"]
+            event.update(job_id=generation_id, status=state.status, timestamp=time.time())
+            state.events.append(event)
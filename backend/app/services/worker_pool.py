@@ -0,0 +1,463 @@
+import os
+import math
+import time
+import queue
+import logging
+import resource
+import tempfile
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.tracing import tracer, Span, SpanSink
+
+logger = logging.getLogger(__name__)
+
+EventCallback = Callable[[Dict[str, Any]], None]
+
+# FloorPlanGenerator.SD_MODEL; not imported here, the pipeline pulls in torch
+SD_MODEL = "sd_controlnet"
+
+
+class WorkerPoolSaturated(Exception):
+    """The queue is full; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Generation queue is full, retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+class WorkerPoolUnavailable(Exception):
+    """The pool is not running (not started yet, or shutting down)."""
+
+    def __init__(self, retry_after: int = 30):
+        super().__init__("Generation workers are not available")
+        self.retry_after = retry_after
+
+
+class InferenceWorkerPool:
+    """
+    Worker processes that each own a `FloorPlanGenerator` (and its models).
+
+    Tasks go through one shared queue. Each worker runs up to `threads` of them
+    at once, each on its own pipeline instance that no other request touches;
+    the pipelines of a worker share its models, and their SD renders are
+    micro-batched into one denoising pass. At most `max_queue` more may wait; beyond that `submit` raises
+    `WorkerPoolSaturated` with a Retry-After estimate from recent task
+    durations. A worker whose resident memory exceeds `max_rss_mb` after a task
+    exits and is replaced, as is a worker that crashed (its task fails).
+
+    Workers load their models through the process's model registry: with
+    `warm_up` in a background thread as soon as they start (tasks that need a
+    model wait for it), otherwise on first use. `readiness` reports the model
+    states each worker last sent.
+
+    Pipeline spans from the workers are forwarded to this process's tracer, so
+    /metrics and the logs see them, and progress is reported per task through
+    the `on_event` callback passed to `submit`.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 8, max_rss_mb: int = 0,
+                 warm_up: bool = True, threads: int = 1, start_method: str = "spawn"):
+        self.workers = workers
+        self.threads = max(1, threads)
+        self.max_queue = max_queue
+        self.max_rss_mb = max_rss_mb
+        self.warm_up = warm_up
+        # Spawn rather than fork: CUDA and the model threads do not survive a fork
+        self._context = mp.get_context(start_method)
+
+        self._tasks = None
+        self._results = None
+        self._processes: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._next_task_id = 0
+        # task id -> (future, on_event)
+        self._pending: Dict[int, Tuple[Future, Optional[EventCallback]]] = {}
+        # task id -> worker id running it
+        self._running: Dict[int, int] = {}
+        self._recycling = set()
+        # worker id -> model registry status it last reported
+        self._models: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._cache_stats: Dict[int, Dict[str, int]] = {}
+        self._retired_cache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._started_at: Dict[int, float] = {}
+        self._average_seconds: Optional[float] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        # Stopping: no new tasks or worker restarts; closed: the dispatcher exits
+        self._stopping = False
+        self._closed = False
+
+    # Lifecycle
+
+    def start(self) -> None:
+        self._stopping = False
+        self._closed = False
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="inference-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop after the running tasks; unfinished tasks fail with `WorkerPoolUnavailable`."""
+        if self._dispatcher is None:
+            return
+        self._stopping = True
+        for _ in range(self.slots):
+            self._tasks.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self._closed = True
+        self._dispatcher.join(timeout)
+        self._dispatcher = None
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(WorkerPoolUnavailable())
+
+    def _spawn(self, worker_id: int) -> None:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self._tasks, self._results, self.max_rss_mb * 1024 * 1024, self.warm_up,
+                  self.threads),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._models.pop(worker_id, None)
+        logger.info(f"Started inference worker {worker_id} (pid {process.pid})")
+
+    # Submission
+
+    def submit(self, user_id: int, prompt: str, on_event: Optional[EventCallback] = None,
+               force: bool = False, quality: str = "standard",
+               seed: Optional[int] = None) -> "Future[Tuple[str, Optional[str], int]]":
+        """
+        Queue a generation; the future resolves to (layout_url, sd_url, seed). Raises
+        `WorkerPoolSaturated` when the queue is full, unless `force` is set
+        (used to re-queue jobs at startup).
+        """
+        if self._dispatcher is None or self._stopping:
+            raise WorkerPoolUnavailable()
+        future: Future = Future()
+        with self._lock:
+            if not force:
+                self._check_capacity()
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._pending[task_id] = (future, on_event)
+        self._tasks.put((task_id, user_id, prompt, quality, seed))
+        return future
+
+    def ensure_capacity(self) -> None:
+        """Raise like `submit` would, without queuing anything."""
+        if self._dispatcher is None or self._stopping:
+            raise WorkerPoolUnavailable()
+        with self._lock:
+            self._check_capacity()
+
+    @property
+    def slots(self) -> int:
+        """Generations that can run at once."""
+        return self.workers * self.threads
+
+    def _check_capacity(self) -> None:
+        if len(self._pending) >= self.slots + self.max_queue:
+            raise WorkerPoolSaturated(self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        average = self._average_seconds or 30.0
+        waiting = max(0, len(self._pending) - self.slots) + 1
+        return max(1, math.ceil(average * waiting / self.slots))
+
+    def running_count(self) -> int:
+        return len(self._running)
+
+    def queued_count(self) -> int:
+        return max(0, len(self._pending) - len(self._running))
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Layout cache counters summed over the current and retired workers."""
+        with self._lock:
+            totals = dict(self._retired_cache_stats)
+            for stats in self._cache_stats.values():
+                for key in totals:
+                    totals[key] += stats.get(key, 0)
+        return totals
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Whether some live worker can take a generation now: it has started and
+        none of its models is still loading. A model that failed to load still
+        counts (the pipeline falls back to layout-only) but marks it "degraded".
+        """
+        workers = {}
+        for worker_id, process in list(self._processes.items()):
+            models = self._models.get(worker_id)
+            states = [model["state"] for model in (models or {}).values()]
+            workers[str(worker_id)] = {
+                "ready": process.is_alive() and models is not None and "loading" not in states,
+                "degraded": "failed" in states,
+                "pid": process.pid,
+                "models": models or {}
+            }
+        running = self._dispatcher is not None and not self._stopping
+        return {
+            "ready": running and any(worker["ready"] for worker in workers.values()),
+            "workers": workers
+        }
+
+    # Dispatcher thread: results, progress and worker supervision
+
+    def _dispatch(self) -> None:
+        while not self._closed:
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                message = None
+            if message is not None:
+                self._handle(message)
+            self._supervise()
+
+    def _handle(self, message: Tuple) -> None:
+        kind, *payload = message
+        try:
+            if kind == "ready":
+                worker_id, models = payload
+                self._models[worker_id] = models
+                logger.info(f"Inference worker {worker_id} started; models: "
+                            + ", ".join(f"{name} {model['state']}" for name, model in models.items()))
+
+            elif kind == "models":
+                worker_id, models = payload
+                self._models[worker_id] = models
+                self._record_sd_model(models.get(SD_MODEL))
+                logger.info(f"Inference worker {worker_id} models: "
+                            + ", ".join(f"{name} {model['state']}" for name, model in models.items()))
+
+            elif kind == "started":
+                task_id, worker_id = payload
+                self._running[task_id] = worker_id
+                self._started_at[task_id] = time.monotonic()
+                self._emit(task_id, {"status": "running", "worker": worker_id})
+
+            elif kind == "progress":
+                task_id, event, stage, duration_ms = payload
+                progress = {"event": event, "stage": stage}
+                if duration_ms is not None:
+                    progress["duration_ms"] = round(duration_ms, 1)
+                self._emit(task_id, progress)
+
+            elif kind == "trace":
+                tracer.export(payload[0])
+
+            elif kind in ("done", "failed"):
+                task_id, worker_id, result, cache_stats = payload
+                self._running.pop(task_id, None)
+                with self._lock:
+                    self._cache_stats[worker_id] = cache_stats
+                    future, _ = self._pending.pop(task_id, (None, None))
+                started = self._started_at.pop(task_id, None)
+                if started is not None:
+                    seconds = time.monotonic() - started
+                    self._average_seconds = seconds if self._average_seconds is None \
+                        else 0.8 * self._average_seconds + 0.2 * seconds
+                metrics.GENERATIONS.inc(outcome="success" if kind == "done" else "error")
+                if future is not None:
+                    if kind == "done":
+                        future.set_result(tuple(result))
+                    else:
+                        future.set_exception(RuntimeError(result))
+
+            elif kind == "recycle":
+                worker_id, rss = payload
+                self._recycling.add(worker_id)
+                logger.info(f"Recycling inference worker {worker_id}: {rss / 2**20:.0f} MiB resident "
+                            f"(limit {self.max_rss_mb} MiB)")
+        except Exception:
+            logger.exception(f"Failed to handle worker message {kind!r}")
+
+    @staticmethod
+    def _record_sd_model(model: Optional[Dict[str, Any]]) -> None:
+        if model is None or model["state"] not in ("ready", "failed"):
+            return
+        metrics.SD_MODEL_LOAD_SECONDS.set(model["load_seconds"] or 0.0)
+        # The compute precision (e.g. bf16 autocast over fp32 weights) rather than the weights' dtype
+        metrics.SD_MODEL_INFO.set(1, device=model.get("device", "none"),
+                                  dtype=model.get("precision", model.get("dtype", "none")),
+                                  enabled=str(model["state"] == "ready").lower())
+
+    def _emit(self, task_id: int, event: Dict[str, Any]) -> None:
+        entry = self._pending.get(task_id)
+        if entry is not None and entry[1] is not None:
+            try:
+                entry[1](event)
+            except Exception:
+                logger.exception("Task event callback failed")
+
+    def _supervise(self) -> None:
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive() or self._stopping:
+                continue
+            # Handle whatever the worker sent before exiting first
+            while True:
+                try:
+                    self._handle(self._results.get_nowait())
+                except queue.Empty:
+                    break
+
+            for task_id in [task for task, worker in self._running.items() if worker == worker_id]:
+                del self._running[task_id]
+                with self._lock:
+                    future, _ = self._pending.pop(task_id, (None, None))
+                self._started_at.pop(task_id, None)
+                metrics.GENERATIONS.inc(outcome="error")
+                if future is not None:
+                    future.set_exception(RuntimeError(
+                        f"Inference worker exited unexpectedly (exit code {process.exitcode})"))
+
+            if worker_id not in self._recycling:
+                logger.error(f"Inference worker {worker_id} died (exit code {process.exitcode}); restarting")
+            self._recycling.discard(worker_id)
+            with self._lock:
+                stats = self._cache_stats.pop(worker_id, {})
+                for key in self._retired_cache_stats:
+                    self._retired_cache_stats[key] += stats.get(key, 0)
+            self._spawn(worker_id)
+
+
+class _ForwardingSink(SpanSink):
+    """Sends finished traces from a worker process to the pool's process."""
+
+    def __init__(self, results):
+        self.results = results
+
+    def export(self, root: Span) -> None:
+        self.results.put(("trace", root))
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # Peak rather than current RSS: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def _worker_main(worker_id: int, tasks, results, max_rss_bytes: int, warm_up: bool, threads: int) -> None:
+    """Worker process entry point: build private pipelines, then run tasks until told to stop."""
+    from app.core.config import settings
+    from app.ml.pipeline.floorplan_pipeline import FloorPlanGenerator
+    from app.ml.pipeline.layout_cache import LayoutCache
+    from app.ml.pipeline.model_registry import model_registry
+    from app.ml.modules.sd_controlnet_module import CPUInferenceProfile
+
+    logging.basicConfig(level=logging.INFO)
+    tracer.sinks = [_ForwardingSink(results)]
+
+    cache = LayoutCache(
+        max_memory_entries=settings.LAYOUT_CACHE_MEMORY_ENTRIES,
+        disk_dir=settings.LAYOUT_CACHE_DIR,
+        max_disk_bytes=settings.LAYOUT_CACHE_MAX_BYTES
+    )
+    # A batch can hold at most one render per task thread; waiting only pays off with several
+    sd_batcher = FloorPlanGenerator.make_sd_batcher(
+        max_batch_size=min(settings.SD_BATCH_SIZE, threads),
+        max_wait_ms=settings.SD_BATCH_WAIT_MS if threads > 1 else 0.0
+    )
+    # Split the cores between the workers instead of letting each use all of them
+    cpu_profile = CPUInferenceProfile(
+        precision=settings.SD_CPU_PRECISION,
+        channels_last=settings.SD_CPU_CHANNELS_LAST,
+        compile=settings.SD_CPU_COMPILE,
+        num_threads=settings.SD_CPU_THREADS or max(1, (os.cpu_count() or 1) // settings.GENERATION_WORKERS)
+    )
+    generators = [FloorPlanGenerator(use_stable_diffusion=True, cache=cache, sd_batcher=sd_batcher,
+                                     cpu_profile=cpu_profile, pin_unseeded=settings.LAYOUT_CACHE_PIN_UNSEEDED)
+                  for _ in range(threads)]
+    if warm_up:
+        model_registry.warm_up(on_done=lambda models: results.put(("models", worker_id, models)))
+    state = {"models": model_registry.status()}
+    results.put(("ready", worker_id, state["models"]))
+
+    recycle = threading.Event()
+    lock = threading.Lock()
+
+    def run_tasks(generator) -> None:
+        while not recycle.is_set():
+            try:
+                task = tasks.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if task is None:
+                return
+            _run_task(worker_id, task, generator, cache, results)
+
+            with lock:
+                # Models loaded on first use rather than by the warm-up
+                models = model_registry.status()
+                if models != state["models"]:
+                    state["models"] = models
+                    results.put(("models", worker_id, models))
+
+                rss = _rss_bytes()
+                if max_rss_bytes and rss > max_rss_bytes and not recycle.is_set():
+                    # The other threads finish their current task, then the process exits
+                    recycle.set()
+                    results.put(("recycle", worker_id, rss))
+
+    task_threads = [threading.Thread(target=run_tasks, args=(generator,), name=f"task-{i}")
+                    for i, generator in enumerate(generators)]
+    for thread in task_threads:
+        thread.start()
+    for thread in task_threads:
+        thread.join()
+
+
+def _run_task(worker_id: int, task: Tuple, generator, cache, results) -> None:
+    from app.core.gcs import upload_to_gcs
+
+    task_id, user_id, prompt, quality, seed = task
+    results.put(("started", task_id, worker_id))
+
+    def on_span(event: str, span: Span) -> None:
+        results.put(("progress", task_id, event, span.name, span.duration_ms if event == "end" else None))
+
+    try:
+        # Files go to a private directory, removed after the upload: tasks running at
+        # the same time may share a prompt and so the pipeline's output file names
+        with tracer.observe(on_span), tempfile.TemporaryDirectory(prefix=f"task-{task_id}-") as output_path:
+            os.makedirs(os.path.join(output_path, "images"))
+            with tracer.span("generate_floorplan", user_id=user_id, worker=worker_id):
+                result = generator.generate_from_prompt(prompt, output_path=output_path, seed=seed,
+                                                        quality=quality)
+
+                # Subir imágenes a GCS
+                with tracer.span("upload.visualization"):
+                    layout_url = upload_to_gcs(result["output_files"]["visualization"])
+                sd_url = None
+                if "sd_image" in result["output_files"]:
+                    with tracer.span("upload.sd_image"):
+                        sd_url = upload_to_gcs(result["output_files"]["sd_image"])
+        results.put(("done", task_id, worker_id, (layout_url, sd_url, result["seed"]), _cache_counts(cache)))
+    except Exception as e:
+        results.put(("failed", task_id, worker_id, str(e), _cache_counts(cache)))
+
+
+def _cache_counts(cache) -> Dict[str, int]:
+    stats = cache.stats()
+    return {key: stats[key] for key in ("memory_hits", "disk_hits", "misses")}
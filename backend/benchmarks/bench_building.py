@@ -0,0 +1,67 @@
+"""
+Runtime of large-building layouts as the room count grows.
+
+Generates synthetic apartment-block requirements (living room, kitchen, two
+bedrooms, bathroom and hallway per unit) and times the hierarchical mode
+(`generate_building_layout`) against the flat greedy placer
+(`generate_layout`, skipped above `--flat-limit` rooms where it gets slow).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_building [--rooms 30 60 120 240 480] [--rooms-per-floor 100]
+"""
+import argparse
+import time
+
+from app.ml.modules.layout_module import LayoutGenerationModule
+
+UNIT = (("living room", 1, 220), ("kitchen", 1, 110), ("bedroom", 2, 130),
+        ("bathroom", 1, 50), ("hallway", 1, 60))
+ROOMS_PER_UNIT = sum(count for _, count, _ in UNIT)
+
+
+def _requirements(units):
+    return {
+        "rooms": [{"type": t, "count": count * units, "approximate_sqft": sqft} for t, count, sqft in UNIT],
+        "adjacency": []
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rooms", type=int, nargs="+", default=[30, 60, 120, 240, 480])
+    parser.add_argument("--rooms-per-floor", type=int, default=100)
+    parser.add_argument("--flat-limit", type=int, default=120, help="Largest room count timed in flat mode")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for zone layouts")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    module = LayoutGenerationModule()
+    header = (f"{'rooms':>6} {'floors':>6} {'zones':>6} {'hier s':>8} {'unplaced':>9} "
+              f"{'flat s':>8} {'unplaced':>9}")
+    print(header)
+    print("-" * len(header))
+
+    for rooms in args.rooms:
+        units = max(1, rooms // ROOMS_PER_UNIT)
+        requirements = _requirements(units)
+        num_rooms = units * ROOMS_PER_UNIT
+        num_floors = max(1, -(-num_rooms // args.rooms_per_floor))
+
+        start = time.perf_counter()
+        building = module.generate_building_layout(requirements, seed=args.seed, num_floors=num_floors,
+                                                   max_workers=args.workers)
+        hierarchical_s = time.perf_counter() - start
+
+        flat = f"{'-':>8} {'-':>9}"
+        if num_rooms <= args.flat_limit:
+            start = time.perf_counter()
+            layout = module.generate_layout(requirements, seed=args.seed)
+            flat_s = time.perf_counter() - start
+            flat = f"{flat_s:>8.2f} {num_rooms - len(layout['room_positions']):>9}"
+
+        print(f"{num_rooms:>6} {num_floors:>6} {len(building['zones']):>6} {hierarchical_s:>8.2f} "
+              f"{building['unplaced_rooms']:>9} {flat}")
+
+
+if __name__ == "__main__":
+    main()
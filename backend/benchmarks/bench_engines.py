@@ -0,0 +1,72 @@
+"""
+Compare layout placement engines on a fixed set of requirements.
+
+Reports placement time-to-solution (median) and the `_score_layout` metrics (adjacency
+satisfaction, compactness, empty ratio) for each engine, averaged over seeds.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_engines [--seeds 5] [--engines greedy solver]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.ml.modules.layout_module import LayoutGenerationModule
+
+
+def _requirements(rooms, adjacency=()):
+    return {
+        "rooms": [{"type": t, "count": c, "approximate_sqft": sqft} for t, c, sqft in rooms],
+        "adjacency": [{"room1": a, "room2": b} for a, b in adjacency]
+    }
+
+
+CASES = {
+    "studio": _requirements([("living room", 1, 200), ("bathroom", 1, 50), ("kitchen", 1, 80)]),
+    "two_bed": _requirements([("living room", 1, 200), ("kitchen", 1, 100), ("bedroom", 2, 120),
+                              ("bathroom", 1, 50)]),
+    "three_bed": _requirements([("living room", 1, 260), ("kitchen", 1, 130), ("dining room", 1, 120),
+                                ("bedroom", 3, 120), ("bathroom", 2, 50), ("garage", 1, 240)],
+                               [("kitchen", "dining room")]),
+    "four_bed": _requirements([("living room", 1, 300), ("kitchen", 1, 150), ("bedroom", 4, 150),
+                               ("bathroom", 3, 60), ("dining room", 1, 140), ("laundry room", 1, 50),
+                               ("entryway", 1, 40), ("garage", 1, 260)],
+                              [("bedroom", "bathroom")]),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seeds", type=int, default=5, help="Seeds per case")
+    parser.add_argument("--engines", nargs="+", default=["greedy", "solver"])
+    args = parser.parse_args()
+
+    module = LayoutGenerationModule()
+    header = f"{'case':<10} {'engine':<8} {'ms':>9} {'adjacency':>10} {'compact':>8} {'empty':>7} {'unplaced':>9}"
+    print(header)
+    print("-" * len(header))
+
+    for case, requirements in CASES.items():
+        for engine in args.engines:
+            placement_engine = module.engines[engine]
+            timings, metrics = [], []
+            for seed in range(args.seeds):
+                rng = random.Random(seed)
+                _, state, grid_size = module._prepare_layout(requirements, rng)
+
+                start = time.perf_counter()
+                placement_engine.place(module, state, grid_size, rng)
+                timings.append((time.perf_counter() - start) * 1000)
+                metrics.append(module._score_layout(state))
+
+            def mean(key):
+                return statistics.mean(m[key] for m in metrics)
+
+            print(f"{case:<10} {engine:<8} {statistics.median(timings):>9.1f} "
+                  f"{mean('adjacency_satisfaction'):>10.3f} {mean('compactness'):>8.3f} "
+                  f"{mean('empty_ratio'):>7.3f} {mean('unplaced_rooms'):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Micro-benchmark of occupancy structures for the placement hot loop.
+
+For each grid size, replays the same random sequence of fit checks and
+placements against a plain NumPy grid (slice + compare per check, as the
+placer originally did), `SummedAreaOccupancy` and `BitsetOccupancy`, and
+reports microseconds per fit check and per placement.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_occupancy [--sizes 12 25 50 100 200] [--checks 20000]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.ml.modules.occupancy import SummedAreaOccupancy, BitsetOccupancy
+
+
+class NumpySliceOccupancy:
+    """The original approach: an int grid sliced for every check."""
+
+    def __init__(self, width, height):
+        self.grid = np.zeros((height, width), dtype=int)
+
+    def is_free(self, x, y, room_width, room_height):
+        return not np.any(self.grid[y:y+room_height, x:x+room_width])
+
+    def place(self, x, y, room_width, room_height, value=1):
+        self.grid[y:y+room_height, x:x+room_width] = value
+
+
+IMPLEMENTATIONS = {
+    "numpy-slice": NumpySliceOccupancy,
+    "summed-area": SummedAreaOccupancy,
+    "bitset": BitsetOccupancy,
+}
+
+
+def _workload(size, checks, seed):
+    """Random (x, y, w, h) probes; every 50th free probe becomes a placement."""
+    rng = random.Random(seed)
+    max_room = max(2, size // 6)
+    probes = []
+    for _ in range(checks):
+        w, h = rng.randint(1, max_room), rng.randint(1, max_room)
+        probes.append((rng.randint(0, size - w), rng.randint(0, size - h), w, h))
+    return probes
+
+
+def _run(cls, size, probes):
+    occupancy = cls(size, size)
+    check_time = place_time = 0.0
+    places = 0
+    for i, (x, y, w, h) in enumerate(probes):
+        start = time.perf_counter()
+        free = occupancy.is_free(x, y, w, h)
+        check_time += time.perf_counter() - start
+        if free and i % 50 == 0:
+            start = time.perf_counter()
+            occupancy.place(x, y, w, h, 1)
+            place_time += time.perf_counter() - start
+            places += 1
+    return check_time / len(probes) * 1e6, place_time / max(places, 1) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[12, 25, 50, 100, 200])
+    parser.add_argument("--checks", type=int, default=20000, help="Fit checks per grid size")
+    args = parser.parse_args()
+
+    header = f"{'grid':>9} {'structure':<12} {'check us':>9} {'place us':>9}"
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        probes = _workload(size, args.checks, seed=size)
+        for name, cls in IMPLEMENTATIONS.items():
+            check_us, place_us = _run(cls, size, probes)
+            print(f"{size:>4}x{size:<4} {name:<12} {check_us:>9.2f} {place_us:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
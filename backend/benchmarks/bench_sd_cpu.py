@@ -0,0 +1,144 @@
+"""
+Compare CPU inference profiles of the SD + ControlNet module against fp32.
+
+Renders the first prompts of the layout corpus (ControlNet input from the
+layout module, fixed seeds) with the plain fp32 baseline and each profile,
+and reports per profile:
+  - load time and seconds per denoising step (median over the timed renders,
+    after one untimed render that also absorbs torch.compile)
+  - similarity of each render to the fp32 render of the same prompt and seed:
+    PSNR, mean absolute pixel difference, and IoU of the dark (wall/line)
+    pixels, which is what matters for a black-and-white floor plan
+
+Profiles are written as precision[+cl][+compile], e.g. "bf16+cl" or
+"int8+cl+compile"; the baseline is "fp32" (no channels-last, not compiled).
+Weights are memory-mapped as in the workers, except for "+cl" profiles, where
+mapping is turned off so that channels-last applies to every model.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_sd_cpu [--profiles fp32+cl bf16 bf16+cl int8] [--prompts 2]
+                                      [--steps 20] [--size 512] [--repeat 2] [--threads N]
+                                      [--lora app/ml/lora/floorplan_lora_weights.safetensors]
+                                      [--output sd_cpu_results.json]
+"""
+import argparse
+import gc
+import json
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.layout_suite import DEFAULT_CORPUS, load_corpus
+
+BASELINE = "fp32"
+
+
+def parse_profile(spec: str, threads=None):
+    from app.ml.modules.sd_controlnet_module import CPUInferenceProfile
+
+    precision, *flags = spec.split("+")
+    unknown = set(flags) - {"cl", "compile"}
+    if unknown:
+        raise ValueError(f"Unknown profile flags in {spec!r}: {', '.join(sorted(unknown))}")
+    return CPUInferenceProfile(precision=precision, channels_last="cl" in flags,
+                               compile="compile" in flags, num_threads=threads)
+
+
+def controlnet_inputs(corpus, count: int, seed: int):
+    from app.ml.modules.text_module import TextUnderstandingModule
+    from app.ml.modules.layout_module import LayoutGenerationModule
+
+    text_module = TextUnderstandingModule()
+    layout_module = LayoutGenerationModule()
+    inputs = []
+    for entry in corpus["prompts"][:count]:
+        requirements = text_module.parse_prompt(entry["prompt"])
+        layout = layout_module.generate_layout(requirements, seed=seed)
+        inputs.append((entry["id"], layout_module.generate_controlnet_input(layout)))
+    return inputs
+
+
+def similarity(image, reference) -> dict:
+    a = np.asarray(image.convert("L"), dtype=np.float64)
+    b = np.asarray(reference.convert("L"), dtype=np.float64)
+    mse = float(np.mean((a - b) ** 2))
+    dark_a, dark_b = a < 128, b < 128
+    union = np.logical_or(dark_a, dark_b).sum()
+    return {
+        "psnr_db": float("inf") if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse)),
+        "mean_abs_diff": float(np.mean(np.abs(a - b))),
+        "dark_iou": float(np.logical_and(dark_a, dark_b).sum() / union) if union else 1.0,
+    }
+
+
+def run_profile(spec: str, inputs, args):
+    from app.ml.modules.sd_controlnet_module import StableDiffusionControlNetModule
+
+    profile = parse_profile(spec, args.threads)
+    start = time.perf_counter()
+    module = StableDiffusionControlNetModule(lora_path=args.lora, device="cpu", cpu_profile=profile,
+                                             mmap_weights=not profile.channels_last)
+    load_seconds = time.perf_counter() - start
+
+    def render(layout_image):
+        return module.generate_batch([(layout_image, args.prompt, args.seed)],
+                                     num_inference_steps=args.steps, width=args.size, height=args.size)[0]
+
+    render(inputs[0][1])  # warm-up (and compilation)
+    step_seconds, images = [], {}
+    for prompt_id, layout_image in inputs:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            images[prompt_id] = render(layout_image)
+            step_seconds.append((time.perf_counter() - start) / args.steps)
+
+    del module
+    gc.collect()
+    return {"load_seconds": round(load_seconds, 2),
+            "seconds_per_step": round(statistics.median(step_seconds), 4)}, images
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=["fp32+cl", "bf16", "bf16+cl", "int8"])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--prompts", type=int, default=2, help="Corpus prompts to render")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--size", type=int, default=512, help="Width and height of the renders")
+    parser.add_argument("--repeat", type=int, default=2, help="Timed renders per prompt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, help="Intra-op threads (default: torch's)")
+    parser.add_argument("--lora", help="LoRA weights to fuse, as the pipeline does")
+    parser.add_argument("--prompt", default="2D architectural floor plan, black and white blueprint, "
+                                            "clean lines, top-down view, technical drawing")
+    parser.add_argument("--output", default="sd_cpu_results.json")
+    args = parser.parse_args(argv)
+
+    inputs = controlnet_inputs(load_corpus(args.corpus), args.prompts, args.seed)
+    results = {}
+    stats, reference = run_profile(BASELINE, inputs, args)
+    results[BASELINE] = stats
+    for spec in args.profiles:
+        if spec == BASELINE:
+            continue
+        stats, images = run_profile(spec, inputs, args)
+        scores = [similarity(images[prompt_id], reference[prompt_id]) for prompt_id, _ in inputs]
+        stats.update({key: round(statistics.mean(score[key] for score in scores), 3) for key in scores[0]})
+        stats["speedup"] = round(results[BASELINE]["seconds_per_step"] / stats["seconds_per_step"], 2)
+        results[spec] = stats
+
+    print(f"{'profile':<20} {'load s':>7} {'s/step':>8} {'speedup':>8} {'PSNR dB':>8} {'|diff|':>7} {'dark IoU':>9}")
+    for spec, stats in results.items():
+        print(f"{spec:<20} {stats['load_seconds']:>7.1f} {stats['seconds_per_step']:>8.3f} "
+              f"{stats.get('speedup', 1.0):>8.2f} {stats.get('psnr_db', float('inf')):>8.1f} "
+              f"{stats.get('mean_abs_diff', 0.0):>7.2f} {stats.get('dark_iou', 1.0):>9.3f}")
+
+    with open(args.output, "w") as f:
+        json.dump({"steps": args.steps, "size": args.size, "prompts": [prompt_id for prompt_id, _ in inputs],
+                   "profiles": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Layout generation benchmark suite with regression thresholds.
+
+Runs every prompt of a versioned corpus through the text module, the layout
+module and both renderers with fixed seeds, and writes a JSON report with:
+  - per-stage latency percentiles (timed with tracemalloc off)
+  - per-stage peak traced memory (from a separate tracemalloc pass)
+  - layout quality metrics (`LayoutGenerationModule.evaluate_layout`)
+
+The report can be compared against a stored baseline; the command exits with
+status 1 if any metric regresses past its threshold.
+
+Usage (from the backend directory):
+    python -m benchmarks.layout_suite run [--seeds 0 1 2] [--repeat 3] [--output results.json]
+                                          [--baseline baseline.json] [--thresholds thresholds.json]
+    python -m benchmarks.layout_suite compare results.json baseline.json [--thresholds thresholds.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "corpus", "layout_prompts_v1.json")
+
+STAGES = ("parse", "layout", "render_controlnet", "render_labeled")
+
+QUALITY_METRICS = ("score", "adjacency_satisfaction", "compactness", "empty_ratio", "unplaced_rooms")
+
+# Latency and memory thresholds are relative increases over the baseline (a
+# latency change must also exceed latency_min_delta_ms, to ignore timer noise
+# on sub-millisecond stages); quality thresholds are absolute changes in the
+# metric's bad direction
+DEFAULT_THRESHOLDS = {
+    "latency_p50": 0.25,
+    "latency_p95": 0.50,
+    "latency_min_delta_ms": 1.0,
+    "peak_memory": 0.20,
+    "score": 2.0,
+    "adjacency_satisfaction": 0.02,
+    "compactness": 0.05,
+    "empty_ratio": 0.02,
+    "unplaced_rooms": 0.0,
+}
+
+# Direction in which each quality metric gets worse
+_WORSE_WHEN_LOWER = {"score", "adjacency_satisfaction", "compactness"}
+
+
+def load_corpus(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        raw = f.read()
+    corpus = json.loads(raw)
+    corpus["path"] = os.path.relpath(path)
+    corpus["sha256"] = hashlib.sha256(raw).hexdigest()
+    return corpus
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _timed(timings: Dict[str, List[float]], stage: str, fn: Callable[[], Any]) -> Any:
+    start = time.perf_counter()
+    result = fn()
+    timings[stage].append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def _traced(peaks: Dict[str, int], stage: str, fn: Callable[[], Any]) -> Any:
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    peaks[stage] = max(peaks.get(stage, 0), peak - baseline)
+    return result
+
+
+def run_suite(corpus: Dict[str, Any], seeds: List[int], repeat: int = 3, warmup: int = 1) -> Dict[str, Any]:
+    """Run the corpus and return the report dict."""
+    from app.ml.modules.text_module import TextUnderstandingModule
+    from app.ml.modules.layout_module import LayoutGenerationModule
+
+    text_module = TextUnderstandingModule()
+    layout_module = LayoutGenerationModule()
+
+    def stages_for(prompt: str, seed: int):
+        requirements = {}
+        layout = {}
+        return [
+            ("parse", lambda: requirements.update(text_module.parse_prompt(prompt))),
+            ("layout", lambda: layout.update(layout_module.generate_layout(requirements, seed=seed))),
+            ("render_controlnet", lambda: layout_module.generate_controlnet_input(layout)),
+            ("render_labeled", lambda: layout_module.visualize_layout(layout, show_labels=True)),
+        ], requirements, layout
+
+    # Warm-up: model loading, font caches, first-call allocations
+    for entry in corpus["prompts"][:warmup]:
+        for _, fn in stages_for(entry["prompt"], seeds[0])[0]:
+            fn()
+
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    peaks: Dict[str, int] = {}
+    per_prompt = []
+
+    for entry in corpus["prompts"]:
+        for seed in seeds:
+            # Timed passes, tracemalloc off
+            for _ in range(repeat):
+                stages, requirements, layout = stages_for(entry["prompt"], seed)
+                for stage, fn in stages:
+                    _timed(timings, stage, fn)
+
+            # One traced pass for peak memory
+            tracemalloc.start()
+            try:
+                for stage, fn in stages_for(entry["prompt"], seed)[0]:
+                    _traced(peaks, stage, fn)
+            finally:
+                tracemalloc.stop()
+
+            quality = layout_module.evaluate_layout(layout)
+            per_prompt.append({
+                "id": entry["id"],
+                "seed": seed,
+                "rooms": len(layout["rooms"]),
+                "doors": len(layout["doors"]),
+                "grid_size": list(layout["grid_size"]),
+                "quality": quality
+            })
+
+    return {
+        "suite": "layout",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "corpus": {key: corpus[key] for key in ("name", "version", "path", "sha256")},
+        "config": {"seeds": seeds, "repeat": repeat, "warmup": warmup},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__
+        },
+        "stages": {
+            stage: {
+                "count": len(values),
+                "mean_ms": statistics.mean(values) if values else 0.0,
+                "p50_ms": _percentile(values, 50),
+                "p95_ms": _percentile(values, 95),
+                "p99_ms": _percentile(values, 99),
+                "max_ms": max(values) if values else 0.0,
+                "peak_kib": peaks.get(stage, 0) / 1024
+            } for stage, values in timings.items()
+        },
+        "quality": {
+            metric: statistics.mean(p["quality"][metric] for p in per_prompt) for metric in QUALITY_METRICS
+        },
+        "prompts": per_prompt
+    }
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any],
+                    thresholds: Optional[Dict[str, float]] = None) -> List[str]:
+    """Return one message per metric that regressed past its threshold."""
+    limits = dict(DEFAULT_THRESHOLDS)
+    limits.update(thresholds or {})
+    regressions = []
+
+    if current["corpus"]["sha256"] != baseline["corpus"]["sha256"]:
+        regressions.append(f"corpus differs from the baseline's "
+                           f"({current['corpus']['name']} v{current['corpus']['version']} vs "
+                           f"v{baseline['corpus']['version']}); results are not comparable")
+        return regressions
+
+    for stage, stats in current["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            continue
+        for key, limit_key in (("p50_ms", "latency_p50"), ("p95_ms", "latency_p95"), ("peak_kib", "peak_memory")):
+            min_delta = limits["latency_min_delta_ms"] if key.endswith("_ms") else 0.0
+            if (base[key] > 0 and stats[key] > base[key] * (1 + limits[limit_key])
+                    and stats[key] - base[key] > min_delta):
+                regressions.append(f"{stage} {key}: {stats[key]:.2f} vs baseline {base[key]:.2f} "
+                                   f"(+{(stats[key] / base[key] - 1) * 100:.0f}%, limit "
+                                   f"+{limits[limit_key] * 100:.0f}%)")
+
+    for metric, value in current["quality"].items():
+        base = baseline["quality"].get(metric)
+        if base is None:
+            continue
+        worse_by = base - value if metric in _WORSE_WHEN_LOWER else value - base
+        if worse_by > limits[metric] + 1e-9:
+            regressions.append(f"quality {metric}: {value:.4f} vs baseline {base:.4f} "
+                               f"(limit {limits[metric]})")
+
+    return regressions
+
+
+def _print_summary(report: Dict[str, Any]) -> None:
+    print(f"corpus {report['corpus']['name']} v{report['corpus']['version']}, "
+          f"{len(report['prompts'])} runs")
+    print(f"{'stage':<18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<18} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+              f"{stats['peak_kib']:>10.1f}")
+    print("quality: " + ", ".join(f"{k}={v:.3f}" for k, v in report["quality"].items()))
+
+
+def _load_json(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _report_regressions(regressions: List[str]) -> int:
+    if regressions:
+        print("\nREGRESSIONS:")
+        for message in regressions:
+            print(f"- {message}")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the corpus and write a report")
+    run.add_argument("--corpus", default=DEFAULT_CORPUS)
+    run.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    run.add_argument("--repeat", type=int, default=3, help="Timed passes per prompt and seed")
+    run.add_argument("--warmup", type=int, default=1, help="Untimed prompts run first")
+    run.add_argument("--output", default="benchmark_results.json")
+    run.add_argument("--baseline", help="Report to compare against")
+    run.add_argument("--thresholds", help="JSON file overriding DEFAULT_THRESHOLDS")
+
+    compare = commands.add_parser("compare", help="Compare two existing reports")
+    compare.add_argument("current")
+    compare.add_argument("baseline")
+    compare.add_argument("--thresholds", help="JSON file overriding DEFAULT_THRESHOLDS")
+
+    args = parser.parse_args(argv)
+    thresholds = _load_json(args.thresholds)
+
+    if args.command == "compare":
+        return _report_regressions(compare_reports(_load_json(args.current), _load_json(args.baseline),
+                                                   thresholds))
+
+    report = run_suite(load_corpus(args.corpus), args.seeds, args.repeat, args.warmup)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    _print_summary(report)
+    print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        return _report_regressions(compare_reports(report, _load_json(args.baseline), thresholds))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())